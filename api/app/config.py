@@ -12,12 +12,119 @@ class Settings(BaseSettings):
     
     # Redis
     redis_url: str = "redis://localhost:6379"
+    redis_cache_enabled: bool = True
+    redis_retry_seconds: int = 30  # Back-off before retrying an unreachable Redis
     
     # OpenAI
     openai_api_key: str = ""
     openai_model: str = "gpt-4o"
     embedding_model: str = "text-embedding-3-small"
+    # Shared client connection pool (one per process)
+    openai_http2: bool = True
+    openai_max_connections: int = 100
+    openai_max_keepalive_connections: int = 20
+    openai_keepalive_expiry_seconds: float = 60
+    openai_timeout_seconds: float = 60
+    openai_max_retries: int = 0  # Retries are owned by llm_scheduler
     
+    # Shared RPM/TPM limits and priority queues for OpenAI calls (Redis-backed)
+    llm_scheduler_enabled: bool = True
+    llm_max_attempts: int = 4
+    # Per model; set to your OpenAI tier. Models not listed are not rate limited
+    llm_rate_limits: dict[str, dict[str, int]] = {
+        "gpt-4o": {"rpm": 5000, "tpm": 800000},
+        "gpt-4o-mini": {"rpm": 5000, "tpm": 4000000},
+        "text-embedding-3-small": {"rpm": 5000, "tpm": 5000000},
+    }
+    
+    # Query embedding cache (in-process LRU backed by Redis)
+    embedding_cache_size: int = 2048
+    embedding_cache_ttl_seconds: int = 7 * 24 * 3600
+    
+    # Temperature-0 completion cache (classification, fact extraction, lender detection)
+    llm_cache_enabled: bool = True
+    llm_cache_size: int = 1024
+    llm_cache_ttl_seconds: int = 24 * 3600
+    
+    # Specialist results by lender, canonical scenario and corpus generation
+    specialist_cache_enabled: bool = True
+    specialist_cache_size: int = 512
+    specialist_cache_ttl_seconds: int = 24 * 3600
+    
+    # Leader picks lenders from structured rules; LLM triage only below this many covered lenders
+    leader_rules_prefilter: bool = True
+    leader_min_rule_candidates: int = 3
+    
+    # What-if follow-ups reuse the last analysis; above this many changed facts, rerun everything
+    incremental_analysis_enabled: bool = True
+    incremental_max_changed_fields: int = 2
+    
+    # Evaluate once this many specialists answered, plus a grace period for the rest
+    specialist_quorum: int = 3
+    specialist_grace_seconds: float = 3
+    evaluator_timeout_seconds: float = 20  # Also capped by the request deadline
+    
+    # One LLM call for intent + facts (False: classify, then extract_facts separately)
+    combined_understanding: bool = True
+    # Local rule-based intent fast path; shadow_rate = share of local hits re-checked by the LLM
+    local_intent_enabled: bool = True
+    local_intent_shadow_rate: float = 0.0
+    # Prompt context budgets in tokens (chunks packed by relevance, trimmed at rows/sentences)
+    specialist_context_tokens: int = 1200
+    leader_context_tokens: int = 800
+    qa_context_tokens: int = 1000
+    rules_context_tokens: int = 400
+    max_chunk_tokens: int = 300
+    # Chat turn latency budget (stage timeouts are capped by the time left)
+    chat_deadline_seconds: float = 20
+    retrieval_timeout_seconds: float = 8  # Chunk search; answers fall back to rules alone
+    # Stage budgets from observed latency (the p50 of later stages is reserved for them)
+    latency_window: int = 200  # Recent samples kept per stage
+    latency_min_samples: int = 20  # Fewer samples: fixed stage timeouts only
+    deadline_min_stage_share: float = 0.3  # A stage always gets this share of the time left
+    degraded_max_specialists: int = 2  # New specialists to run when the p90s no longer fit
+    # Search chunks for the message while the intent is classified (used by product/eligibility turns)
+    speculative_retrieval_enabled: bool = True
+    speculative_top_k: int = 8
+    # Regex fact extraction (FICO, LTV, state, amounts, enums); LLM only for unresolved fields
+    local_fact_parser_enabled: bool = True
+    
+    # Bulk embedding during ingestion
+    embedding_batch_max_tokens: int = 100_000  # API limit: 300k tokens per request
+    embedding_batch_max_inputs: int = 512  # API limit: 2048 inputs per request
+    embedding_concurrency: int = 4
+    embedding_max_retries: int = 5
+    
+    # Query embedding micro-batching: queries arriving within the window share one API call (0 disables)
+    embedding_batch_window_ms: float = 5
+    embedding_batch_size: int = 64
+    
+    # Vector index (ANN on chunks.embedding)
+    vector_index_type: str = "hnsw"  # hnsw | ivfflat
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int = 40  # Higher = better recall, slower queries
+    ivfflat_lists: int = 100  # ~rows/1000 up to 1M rows
+    ivfflat_probes: int = 10  # Higher = better recall, slower queries
+    # Filtered searches: iterative index scans on pgvector >= 0.8 (auto = relaxed_order);
+    # older pgvector, or off, scans the filtered rows exactly. auto | strict_order | relaxed_order | off
+    vector_iterative_scan: str = "auto"
+    
+    # Retrieval
+    retrieval_mode: str = "hybrid"  # hybrid | vector
+    hybrid_candidate_multiplier: int = 3  # Each leg fetches top_k * multiplier before fusion
+    rrf_k: int = 60
+    leader_top_k: int = 8
+    specialist_top_k: int = 8
+    # Vector queries on raw asyncpg with a binary vector codec and prepared statements
+    retrieval_fast_path: bool = True
+    vector_pool_min_size: int = 1
+    vector_pool_max_size: int = 10
+    # pgvector | local (memory-mapped matrix in-process, for dev/CI/small deployments)
+    retrieval_backend: str = "pgvector"
+    local_index_dir: str = "data/vector_index"
+    local_index_dtype: str = "float32"  # float16 halves memory at a small precision cost
+
     # Auth
     jwt_secret: str = "change-me-in-production"
     jwt_algorithm: str = "HS256"
@@ -1,24 +1,183 @@
+import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy import text
 from pgvector.sqlalchemy import Vector
+from pgvector.asyncpg import register_vector
+import asyncpg
 
 from app.config import settings
 
 engine = create_async_engine(settings.database_url, echo=settings.debug)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Raw asyncpg pool for the retrieval fast path (binary vector codec, no ORM)
+_vector_pool: asyncpg.Pool | None = None
+_vector_pool_lock = asyncio.Lock()
+
+
+# ANN index on chunks.embedding (cosine distance, matches the <=> operator used in search)
+VECTOR_INDEX_NAME = "ix_chunks_embedding_ann"
+
+# Full-text index on chunks.content for the lexical leg of hybrid search.
+# Queries must use the exact same expression for the planner to pick the index.
+TEXT_SEARCH_CONFIG = "english"
+CHUNK_TSVECTOR = f"to_tsvector('{TEXT_SEARCH_CONFIG}', c.content)"
+TEXT_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_chunks_content_fts "
+    f"ON chunks USING gin (to_tsvector('{TEXT_SEARCH_CONFIG}', content))"
+)
+
 
 class Base(DeclarativeBase):
     pass
 
 
+def vector_index_ddl(name: str = VECTOR_INDEX_NAME, concurrently: bool = False) -> str:
+    """Build the CREATE INDEX statement for the configured index type."""
+    if settings.vector_index_type == "ivfflat":
+        method = "ivfflat"
+        params = f"lists = {int(settings.ivfflat_lists)}"
+    else:
+        method = "hnsw"
+        params = f"m = {int(settings.hnsw_m)}, ef_construction = {int(settings.hnsw_ef_construction)}"
+    
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON chunks USING {method} (embedding vector_cosine_ops) WITH ({params})"
+    )
+
+
+PGVECTOR_VERSION_SQL = "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+
+# Installed pgvector version, read when the first connection is set up (None until then)
+pgvector_version: tuple[int, ...] | None = None
+ITERATIVE_SCAN_MIN_VERSION = (0, 8)
+
+
+def _parse_version(extversion: str | None) -> tuple[int, ...]:
+    return tuple(int(part) for part in (extversion or "0").split(".") if part.isdigit())
+
+
+def vector_search_params(top_k: int = 10, filtered: bool = False) -> dict[str, str]:
+    """
+    Per-query recall knobs for the ANN index.
+    
+    A filtered ANN scan only post-filters the first ef_search/probes
+    candidates, so a small lender can get too few chunks. Filtered queries
+    therefore use iterative index scans on pgvector >= 0.8, and an exact
+    scan (index scans off) on older versions or with iterative scans off.
+    """
+    params = {}
+    iterative = settings.vector_iterative_scan
+    if iterative == "auto":
+        iterative = "relaxed_order"
+    supported = pgvector_version is not None and pgvector_version >= ITERATIVE_SCAN_MIN_VERSION
+    
+    if settings.vector_index_type == "ivfflat":
+        params["ivfflat.probes"] = str(int(settings.ivfflat_probes))
+        if filtered and supported and iterative != "off":
+            # IVFFlat only supports relaxed ordering; callers re-sort the top-k
+            params["ivfflat.iterative_scan"] = "relaxed_order"
+    else:
+        # ef_search below top_k would cap the number of rows returned
+        params["hnsw.ef_search"] = str(max(int(settings.hnsw_ef_search), top_k))
+        if filtered and supported and iterative != "off":
+            # Keep scanning the graph until enough rows pass the filter
+            params["hnsw.iterative_scan"] = iterative
+    
+    if filtered and not (supported and iterative != "off"):
+        # Exact top-k: sequential scan of the filtered rows, sorted by distance
+        params["enable_indexscan"] = "off"
+    
+    return params
+
+
+async def _detect_pgvector_version(fetch_version) -> None:
+    """Record the installed pgvector version once; fetch_version returns extversion."""
+    global pgvector_version
+    
+    if pgvector_version is None:
+        try:
+            pgvector_version = _parse_version(await fetch_version())
+        except Exception as e:
+            print(f"pgvector version check failed, using exact filtered scans: {e}")
+            pgvector_version = ()
+
+
+async def apply_vector_search_params(
+    session: AsyncSession,
+    top_k: int = 10,
+    filtered: bool = False
+) -> None:
+    """Set the ANN recall knobs, scoped to the current transaction (one round trip)."""
+    await _detect_pgvector_version(
+        lambda: session.scalar(text(PGVECTOR_VERSION_SQL))
+    )
+    params = vector_search_params(top_k, filtered)
+    calls = ", ".join(f"set_config('{name}', :p{i}, true)" for i, name in enumerate(params))
+    await session.execute(
+        text(f"SELECT {calls}"),
+        {f"p{i}": value for i, value in enumerate(params.values())}
+    )
+
+
+async def set_vector_search_params(
+    conn: asyncpg.Connection,
+    top_k: int = 10,
+    filtered: bool = False
+) -> None:
+    """apply_vector_search_params for a fast-path connection; call inside conn.transaction()."""
+    params = vector_search_params(top_k, filtered)
+    calls = ", ".join(f"set_config(${2 * i + 1}, ${2 * i + 2}, true)" for i in range(len(params)))
+    await conn.execute(f"SELECT {calls}", *(arg for item in params.items() for arg in item))
+
+
+def asyncpg_dsn() -> str:
+    """database_url without the SQLAlchemy driver suffix, for asyncpg.connect/create_pool."""
+    return settings.database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def _init_vector_connection(conn: asyncpg.Connection) -> None:
+    """Per-connection setup: binary pgvector codec (ANN knobs are set per query)."""
+    await register_vector(conn)
+    await _detect_pgvector_version(lambda: conn.fetchval(PGVECTOR_VERSION_SQL))
+
+
+async def get_vector_pool() -> asyncpg.Pool:
+    """Get (lazily creating) the asyncpg pool used by the retrieval fast path."""
+    global _vector_pool
+    
+    if _vector_pool is None:
+        async with _vector_pool_lock:
+            if _vector_pool is None:
+                _vector_pool = await asyncpg.create_pool(
+                    asyncpg_dsn(),
+                    min_size=settings.vector_pool_min_size,
+                    max_size=settings.vector_pool_max_size,
+                    init=_init_vector_connection
+                )
+    return _vector_pool
+
+
+async def close_vector_pool() -> None:
+    """Close the fast-path pool (called on app shutdown)."""
+    global _vector_pool
+    
+    if _vector_pool is not None:
+        await _vector_pool.close()
+        _vector_pool = None
+
+
 async def init_db():
     """Initialize database - create tables if they don't exist."""
     async with engine.begin() as conn:
         # Enable pgvector extension
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         await conn.run_sync(Base.metadata.create_all)
+        # Build the ANN index once; rebuilds go through /api/admin/index/rebuild
+        await conn.execute(text(vector_index_ddl()))
+        await conn.execute(text(TEXT_INDEX_DDL))
 
 
 async def get_db():
@@ -0,0 +1,45 @@
+"""
+Shared OpenAI client used by every service and agent.
+
+One AsyncOpenAI per process means one pooled httpx connection pool: TLS
+handshakes and connection setup are paid once, not per service/agent per
+request. Created in the FastAPI lifespan and closed on shutdown; scripts
+and tests get it lazily on first use.
+"""
+import httpx
+from openai import AsyncOpenAI
+
+from app.config import settings
+
+_client: AsyncOpenAI | None = None
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Get the process-wide OpenAI client (created on first use)."""
+    global _client
+
+    if _client is None:
+        http_client = httpx.AsyncClient(
+            http2=settings.openai_http2,
+            limits=httpx.Limits(
+                max_connections=settings.openai_max_connections,
+                max_keepalive_connections=settings.openai_max_keepalive_connections,
+                keepalive_expiry=settings.openai_keepalive_expiry_seconds
+            ),
+            timeout=httpx.Timeout(settings.openai_timeout_seconds, connect=5.0)
+        )
+        _client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=http_client,
+            max_retries=settings.openai_max_retries
+        )
+    return _client
+
+
+async def close_openai_client() -> None:
+    """Close the shared client and its connection pool (called on app shutdown)."""
+    global _client
+
+    if _client is not None:
+        await _client.close()
+        _client = None
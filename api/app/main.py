@@ -3,7 +3,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.db import init_db
+from app.db import init_db, close_vector_pool
+from app.redis_client import close_redis
+from app.llm_client import get_openai_client, close_openai_client
 from app.routers import auth, chat, admin, feedback
 
 
@@ -11,9 +13,12 @@ from app.routers import auth, chat, admin, feedback
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
+    get_openai_client()
     yield
     # Shutdown
-    pass
+    await close_openai_client()
+    await close_vector_pool()
+    await close_redis()
 
 
 app = FastAPI(
@@ -31,6 +31,9 @@ class Conversation(Base):
     # Context Carryover: remember the last lender mentioned for follow-up questions
     # IMPORTANT: This is only used for PRODUCT_SEARCH and GENERAL_QUESTION, NOT for ELIGIBILITY_CHECK
     last_mentioned_lender = Column(String(255), nullable=True)
+    # Last full analysis (scenario, Leader candidates, per-lender specialist results)
+    # so a what-if follow-up re-runs only the specialists the changed fact affects
+    analysis_state = Column(JSONB, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -44,7 +44,7 @@ class Chunk(Base):
     __tablename__ = "chunks"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
     document = relationship("Document", backref="chunks")
     content = Column(Text, nullable=False)
     section_path = Column(Text)
@@ -0,0 +1,48 @@
+"""
+Shared Redis connection used by the cache tiers.
+
+Redis is an optimization, never a dependency: when it is disabled or
+unreachable, callers get None and fall back to their in-process tier.
+"""
+import time
+
+import redis.asyncio as redis
+
+from app.config import settings
+
+_client: redis.Redis | None = None
+_disabled_until: float = 0.0
+
+
+def get_redis() -> redis.Redis | None:
+    """Get the shared Redis client, or None while Redis is disabled/unavailable."""
+    global _client
+
+    if not settings.redis_cache_enabled or time.monotonic() < _disabled_until:
+        return None
+
+    if _client is None:
+        _client = redis.from_url(
+            settings.redis_url,
+            socket_connect_timeout=0.5,
+            socket_timeout=0.5
+        )
+    return _client
+
+
+def mark_redis_unavailable(error: Exception) -> None:
+    """Skip Redis for a while after a connection/command failure."""
+    global _disabled_until
+
+    if time.monotonic() >= _disabled_until:
+        print(f"Redis unavailable, using in-process cache only: {error}")
+    _disabled_until = time.monotonic() + settings.redis_retry_seconds
+
+
+async def close_redis() -> None:
+    """Close the shared client (called on app shutdown)."""
+    global _client
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from pydantic import BaseModel
@@ -6,11 +6,25 @@ from uuid import UUID
 from typing import Optional
 import hashlib
 
+from app.config import settings
 from app.db import get_db
 from app.models.document import Document, DocumentStatus, DocumentArchetype, Chunk, Rule
 from app.models.conversation import Conversation
 from app.models.feedback import Feedback, ThumbsRating
 from app.services.ingestion_service import IngestionService
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_batcher import embedding_batcher
+from app.services.llm_cache import llm_cache
+from app.services.local_intent_classifier import local_intent_classifier
+from app.services.speculative_retrieval import speculative_retrieval
+from app.services.pipeline import pipeline_stats
+from app.services.prompt_packer import packing_stats
+from app.services.llm_scheduler import llm_scheduler
+from app.services.specialist_cache import specialist_cache
+from app.services.incremental_analysis import incremental_analysis
+from app.services.deadline import stage_latency
+from app.services.vector_index_service import VectorIndexService
+from app.services.local_vector_index import local_vector_index
 
 router = APIRouter()
 
@@ -100,6 +114,7 @@ async def detect_lender(
 
 @router.post("/documents", response_model=DocumentResponse)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     lender: str = Form(None),
     program: str = Form(None),
@@ -151,6 +166,10 @@ async def upload_document(
     
     # Process document (extract text, chunk, embed)
     await ingestion_service.process_document(doc.id, content)
+    if settings.retrieval_backend == "local":
+        # After get_db commits, so a failed upload leaves no vectors behind
+        background_tasks.add_task(local_vector_index.append_document, doc.id)
+    _invalidate_specialists(background_tasks, doc.lender)
     
     # Get counts after processing
     chunks_result = await db.execute(
@@ -180,6 +199,7 @@ async def upload_document(
 async def update_document(
     document_id: UUID,
     update: DocumentUpdate,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """Update document metadata or status."""
@@ -191,8 +211,10 @@ async def update_document(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    changed_lenders = [doc.lender]
     if update.lender is not None:
         doc.lender = update.lender
+        changed_lenders.append(doc.lender)
     if update.program is not None:
         doc.program = update.program
     if update.archetype is not None:
@@ -201,6 +223,8 @@ async def update_document(
         doc.status = DocumentStatus(update.status)
     
     await db.flush()
+    _refresh_local_index(background_tasks)
+    _invalidate_specialists(background_tasks, *changed_lenders)
     
     return DocumentResponse(
         id=str(doc.id),
@@ -216,7 +240,11 @@ async def update_document(
 
 
 @router.delete("/documents/{document_id}")
-async def delete_document(document_id: UUID, db: AsyncSession = Depends(get_db)):
+async def delete_document(
+    document_id: UUID,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
     """Delete a document and its chunks/rules."""
     from sqlalchemy import delete as sql_delete
     
@@ -240,10 +268,27 @@ async def delete_document(document_id: UUID, db: AsyncSession = Depends(get_db))
     
     # Now delete the document
     await db.delete(doc)
+    _refresh_local_index(background_tasks)
+    _invalidate_specialists(background_tasks, doc.lender)
     
     return {"status": "deleted", "document_id": str(document_id)}
 
 
+def _refresh_local_index(background_tasks: BackgroundTasks) -> None:
+    """
+    The local index only stores active chunks with their lender/archetype,
+    so rebuild it after the change is committed (background tasks run
+    after get_db has committed).
+    """
+    if settings.retrieval_backend == "local":
+        background_tasks.add_task(local_vector_index.rebuild)
+
+
+def _invalidate_specialists(background_tasks: BackgroundTasks, *lenders: str | None) -> None:
+    """Bump the corpus generation of changed lenders once the change is committed."""
+    background_tasks.add_task(specialist_cache.bump_generation, *lenders)
+
+
 # --- Rules ---
 
 class RuleResponse(BaseModel):
@@ -321,6 +366,7 @@ async def list_rules(
 async def update_rule(
     rule_id: UUID,
     update: RuleUpdate,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """Update a rule's thresholds or status."""
@@ -337,6 +383,7 @@ async def update_rule(
             setattr(rule, field, value)
     
     await db.flush()
+    _invalidate_specialists(background_tasks, rule.lender)
     
     return RuleResponse(
         id=str(rule.id),
@@ -412,3 +459,52 @@ async def get_stats(db: AsyncSession = Depends(get_db)):
         thumbs_down=thumbs_down,
         feedback_rate=round(feedback_rate, 1)
     )
+
+
+# --- Vector Index ---
+
+class VectorIndexResponse(BaseModel):
+    name: str
+    method: str | None
+    exists: bool
+    definition: str | None
+    size_bytes: int
+    size: str
+    chunks_count: int
+    build_seconds: float | None
+
+
+@router.get("/index", response_model=VectorIndexResponse)
+async def get_vector_index():
+    """Get the status and size of the chunk embedding index."""
+    return VectorIndexResponse(**await VectorIndexService().status())
+
+
+@router.post("/index/rebuild", response_model=VectorIndexResponse)
+async def rebuild_vector_index():
+    """Rebuild the chunk embedding index concurrently with the current settings."""
+    try:
+        result = await VectorIndexService().rebuild()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Index rebuild failed: {e}")
+    return VectorIndexResponse(**result)
+
+
+# --- Metrics ---
+
+@router.get("/metrics")
+async def get_metrics():
+    """Get in-process performance counters (caches, queues) for this worker."""
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batcher": embedding_batcher.stats(),
+        "llm_cache": llm_cache.stats(),
+        "local_intent": local_intent_classifier.stats(),
+        "speculative_retrieval": speculative_retrieval.stats(),
+        "pipeline": pipeline_stats.stats(),
+        "prompt_packing": packing_stats.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "specialist_cache": specialist_cache.stats(),
+        "incremental_analysis": incremental_analysis.stats(),
+        "stage_latency": stage_latency.stats()
+    }
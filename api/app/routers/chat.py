@@ -1,16 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from pydantic import BaseModel
 from uuid import UUID
+import asyncio
+import json
 
-from app.db import get_db
+from app.config import settings
+from app.db import get_db, async_session
 from app.models.conversation import Conversation, Message, MessageRole, ConversationStatus
 from app.services.chat_service import ChatService
+from app.services.deadline import Deadline
 
 router = APIRouter()
 
+# How often a running turn checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
 
 class ChatRequest(BaseModel):
     message: str
@@ -35,7 +43,7 @@ class ConversationResponse(BaseModel):
 
 
 @router.post("", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)):
+async def chat(request: ChatRequest, http_request: Request, db: AsyncSession = Depends(get_db)):
     """
     Main chat endpoint. Handles:
     1. Create/get conversation
@@ -43,42 +51,19 @@ async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)):
     3. Check required fields
     4. If complete: run eligibility check
     5. If incomplete: ask follow-up
+    
+    The turn runs against a settings.chat_deadline_seconds deadline and is
+    cancelled (LLM calls included) if the client disconnects.
     """
+    deadline = Deadline(settings.chat_deadline_seconds)
     try:
         chat_service = ChatService(db)
-        result = await chat_service.process_message(
+        result = await _cancel_on_disconnect(http_request, chat_service.process_message(
             message=request.message,
-            conversation_id=request.conversation_id
-        )
-        
-        # Ensure facts is always a dict
-        facts = result.get("facts", {})
-        if not isinstance(facts, dict):
-            facts = {}
-        
-        # Ensure missing_fields is always a list
-        missing_fields = result.get("missing_fields", [])
-        if not isinstance(missing_fields, list):
-            missing_fields = []
-        
-        # Ensure citations is a list of dicts
-        citations = result.get("citations", [])
-        if not isinstance(citations, list):
-            citations = []
-        # Convert any string citations to dicts
-        citations = [
-            c if isinstance(c, dict) else {"source": str(c)}
-            for c in citations
-        ]
-        
-        return ChatResponse(
-            message=result.get("response", "I couldn't process your request."),
-            conversation_id=str(result.get("conversation_id", "")),
-            facts=facts,
-            missing_fields=missing_fields,
-            confidence=result.get("confidence", 0),
-            citations=citations
-        )
+            conversation_id=request.conversation_id,
+            deadline=deadline
+        ))
+        return _build_chat_response(result)
     except Exception as e:
         # Log the error and return a helpful message
         import traceback
@@ -86,14 +71,124 @@ async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)):
         print(f"Chat error: {error_detail}")
         
         # Return a fallback response instead of 500
-        return ChatResponse(
-            message="Sorry, I encountered an error processing your request. Please try again or rephrase your question.",
-            conversation_id=str(request.conversation_id) if request.conversation_id else "",
-            facts={},
-            missing_fields=[],
-            confidence=0,
-            citations=[]
-        )
+        return _error_response(request)
+
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of POST /api/chat (Server-Sent Events).
+    
+    Events, in order: intent, candidates, specialist (one per lender, as each
+    completes), token (evaluator output as it is generated), and finally
+    done (same payload as ChatResponse) or error.
+    """
+    return StreamingResponse(
+        _chat_events(request, Deadline(settings.chat_deadline_seconds)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _cancel_on_disconnect(http_request: Request, turn):
+    """Await the turn, cancelling it if the client goes away first."""
+    task = asyncio.ensure_future(turn)
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if not task.done() and await http_request.is_disconnected():
+                print("Chat: client disconnected, cancelling the turn")
+                task.cancel()
+                break
+        return await task
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def _chat_events(request: ChatRequest, deadline: Deadline | None = None):
+    """Run the turn in a task and relay its progress events as SSE."""
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def emit(event: str, data: dict):
+        await queue.put((event, data))
+    
+    async def run():
+        # Own session: yield dependencies are closed before a streaming body runs
+        async with async_session() as db:
+            try:
+                result = await ChatService(db).process_message(
+                    message=request.message,
+                    conversation_id=request.conversation_id,
+                    emit=emit,
+                    deadline=deadline
+                )
+                await db.commit()
+                await emit("done", _build_chat_response(result).model_dump())
+            except Exception:
+                import traceback
+                print(f"Chat stream error: {traceback.format_exc()}")
+                await db.rollback()
+                await emit("error", _error_response(request).model_dump())
+            finally:
+                await queue.put(None)
+    
+    task = asyncio.create_task(run())
+    try:
+        while (item := await queue.get()) is not None:
+            yield format_sse(*item)
+    finally:
+        # Client went away: stop the agents instead of finishing for nobody
+        if not task.done():
+            task.cancel()
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _build_chat_response(result: dict) -> ChatResponse:
+    """Normalize a ChatService result into the API response."""
+    # Ensure facts is always a dict
+    facts = result.get("facts", {})
+    if not isinstance(facts, dict):
+        facts = {}
+    
+    # Ensure missing_fields is always a list
+    missing_fields = result.get("missing_fields", [])
+    if not isinstance(missing_fields, list):
+        missing_fields = []
+    
+    # Ensure citations is a list of dicts
+    citations = result.get("citations", [])
+    if not isinstance(citations, list):
+        citations = []
+    # Convert any string citations to dicts
+    citations = [
+        c if isinstance(c, dict) else {"source": str(c)}
+        for c in citations
+    ]
+    
+    return ChatResponse(
+        message=result.get("response", "I couldn't process your request."),
+        conversation_id=str(result.get("conversation_id", "")),
+        facts=facts,
+        missing_fields=missing_fields,
+        confidence=result.get("confidence", 0),
+        citations=citations
+    )
+
+
+def _error_response(request: ChatRequest) -> ChatResponse:
+    return ChatResponse(
+        message="Sorry, I encountered an error processing your request. Please try again or rephrase your question.",
+        conversation_id=str(request.conversation_id) if request.conversation_id else "",
+        facts={},
+        missing_fields=[],
+        confidence=0,
+        citations=[]
+    )
 
 
 @router.get("/conversations", response_model=list[ConversationResponse])
@@ -1,5 +1,6 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, distinct
+from openai import AsyncOpenAI
 
 from app.models.document import Document, DocumentStatus
 from app.services.leader_agent import LeaderAgent
@@ -13,8 +14,9 @@ class AgentFactory:
     Factory for creating agents dynamically based on available lenders.
     """
     
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, client: AsyncOpenAI | None = None):
         self.db = db
+        self.client = client
         self._specialist_cache: dict[str, SpecialistAgent] = {}
         self._available_lenders: list[str] | None = None
     
@@ -36,27 +38,30 @@ class AgentFactory:
         
         return self._available_lenders
     
-    async def create_leader_agent(self) -> LeaderAgent:
+    async def create_leader_agent(self, lenders: list[str] | None = None) -> LeaderAgent:
         """Create the leader agent with knowledge of available lenders."""
-        lenders = await self.get_available_lenders()
-        return LeaderAgent(self.db, lenders)
+        if lenders is None:
+            lenders = await self.get_available_lenders()
+        return LeaderAgent(self.db, lenders, client=self.client)
     
     async def create_specialist_agent(self, lender: str) -> SpecialistAgent:
         """Create or get cached specialist agent for a lender."""
         if lender not in self._specialist_cache:
-            self._specialist_cache[lender] = SpecialistAgent(self.db, lender)
+            self._specialist_cache[lender] = SpecialistAgent(self.db, lender, client=self.client)
         return self._specialist_cache[lender]
     
     def create_evaluator_agent(self) -> EvaluatorAgent:
         """Create the evaluator agent."""
-        return EvaluatorAgent()
+        return EvaluatorAgent(client=self.client)
     
     async def create_specialists_for_lenders(
         self,
-        lenders: list[str]
+        lenders: list[str],
+        available: list[str] | None = None
     ) -> dict[str, SpecialistAgent]:
-        """Create specialist agents for a list of lenders."""
-        available = await self.get_available_lenders()
+        """Create specialist agents for a list of lenders (available: lenders with documents, looked up if None)."""
+        if available is None:
+            available = await self.get_available_lenders()
         
         agents = {}
         for lender in lenders:
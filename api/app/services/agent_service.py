@@ -1,18 +1,23 @@
 from abc import ABC, abstractmethod
 from openai import AsyncOpenAI
 import json
-from typing import Any
+from typing import Any, Awaitable, Callable
 
 from app.config import settings
+from app.llm_client import get_openai_client
+from app.services.llm_scheduler import llm_scheduler, Priority
 
 
 class BaseAgent(ABC):
     """Base class for all agents in the multi-agent system."""
     
-    def __init__(self, name: str, system_prompt: str):
+    # Queue priority for this agent's calls in llm_scheduler
+    priority = Priority.INTERACTIVE
+    
+    def __init__(self, name: str, system_prompt: str, client: AsyncOpenAI | None = None):
         self.name = name
         self.system_prompt = system_prompt
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = client or get_openai_client()
         self.model = settings.openai_model
     
     @abstractmethod
@@ -44,7 +49,7 @@ class BaseAgent(ABC):
             if response_format == "json":
                 kwargs["response_format"] = {"type": "json_object"}
             
-            response = await self.client.chat.completions.create(**kwargs)
+            response = await llm_scheduler.chat_completion(self.client, self.priority, **kwargs)
             content = response.choices[0].message.content
             
             if response_format == "json":
@@ -56,6 +61,41 @@ class BaseAgent(ABC):
         except Exception as e:
             return {"error": str(e)}
     
+    async def _stream_llm(
+        self,
+        user_prompt: str,
+        on_token: Callable[[str], Awaitable[None]],
+        temperature: float = 0.3,
+        max_tokens: int = 2000
+    ) -> str | dict:
+        """Text LLM call that hands each token to on_token; returns the full text."""
+        try:
+            stream = await llm_scheduler.chat_completion(
+                self.client,
+                self.priority,
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            
+            parts = []
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    parts.append(token)
+                    await on_token(token)
+            return "".join(parts)
+            
+        except Exception as e:
+            return {"error": str(e)}
+    
     def _format_scenario(self, scenario: dict) -> str:
         """Format scenario dict into readable text."""
         lines = []
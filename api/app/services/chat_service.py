@@ -8,8 +8,11 @@ NEW FLEXIBLE FLOW:
 4. Always cite sources
 """
 import asyncio
+import time
+from typing import Awaitable, Callable
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from openai import AsyncOpenAI
 from uuid import UUID
 
 from app.models.conversation import Conversation, Message, MessageRole
@@ -17,6 +20,17 @@ from app.services.intent_classifier import IntentClassifier, IntentType
 from app.services.general_qa_service import GeneralQAService
 from app.services.agent_factory import AgentFactory
 from app.services.llm_service import LLMService
+from app.services.retrieval_service import RetrievalService
+from app.services.rules_service import RulesService
+from app.services.incremental_analysis import incremental_analysis
+from app.services.deadline import Deadline, current_deadline, stage_latency
+from app.services.leader_agent import MAX_CANDIDATES
+from app.services.specialist_agent import build_specialist_query
+from app.services.speculative_retrieval import speculative_retrieval
+from app.services.pipeline import Pipeline, Stage
+from app.services.local_intent_classifier import MAX_SHORT_ANSWER_WORDS
+from app.config import settings
+from app.llm_client import get_openai_client
 
 
 # Minimum fields for a preliminary recommendation
@@ -40,8 +54,27 @@ FIELD_DESCRIPTIONS = {
     "credit_events": "recent credit events"
 }
 
+# Upper bound per specialist; the request deadline usually leaves less
 SPECIALIST_TIMEOUT = 15
 
+# Analysis stages in run order, for Deadline.budget() reservations
+ANALYSIS_STAGES = ("leader", "retrieval", "specialist", "evaluator")
+
+
+def asked_field(last_message: str | None) -> str | None:
+    """The first field the assistant's last message asked for ("- credit score"), or None."""
+    if not last_message:
+        return None
+    fields = {description.lower(): field for field, description in FIELD_DESCRIPTIONS.items()}
+    for line in last_message.splitlines():
+        field = fields.get(line.strip().lstrip("-").strip().lower())
+        if field:
+            return field
+    return None
+
+# Progress callback for streaming: emit(event_name, data)
+Emit = Callable[[str, dict], Awaitable[None]]
+
 
 class ChatService:
     """
@@ -54,20 +87,46 @@ class ChatService:
     - Full scenario analysis (with preliminary suggestions when incomplete)
     """
     
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, client: AsyncOpenAI | None = None):
         self.db = db
-        self.intent_classifier = IntentClassifier()
-        self.general_qa = GeneralQAService(db)
-        self.agent_factory = AgentFactory(db)
-        self.llm = LLMService()
+        # One pooled client for every service and agent of this request
+        self.client = client or get_openai_client()
+        self.intent_classifier = IntentClassifier(self.client)
+        self.general_qa = GeneralQAService(db, client=self.client)
+        self.agent_factory = AgentFactory(db, client=self.client)
+        self.llm = LLMService(self.client)
+        self.retrieval = RetrievalService(db, client=self.client)
+        self.rules = RulesService(db)
+        self.emit: Emit | None = None
+        self._speculation: asyncio.Task | None = None
+        # Set per turn by process_message
+        self.deadline: Deadline | None = None
     
     async def process_message(
         self,
         message: str,
-        conversation_id: UUID | None = None
+        conversation_id: UUID | None = None,
+        emit: Emit | None = None,
+        deadline: Deadline | None = None
     ) -> dict:
-        """Process user message with flexible routing."""
+        """
+        Process user message with flexible routing.
         
+        emit, when given, receives progress events as the turn runs:
+        intent, candidates, specialist (one per lender) and token (evaluator output).
+        deadline is the request's latency budget (created at the API boundary;
+        a fresh settings.chat_deadline_seconds one by default). Every stage,
+        LLM call and vector query of the turn is bounded by it.
+        """
+        self.emit = emit
+        self.deadline = deadline or Deadline(settings.chat_deadline_seconds)
+        token = current_deadline.set(self.deadline)
+        try:
+            return await self._process_message(message, conversation_id)
+        finally:
+            current_deadline.reset(token)
+    
+    async def _process_message(self, message: str, conversation_id: UUID | None) -> dict:
         # 1. Get or create conversation
         conversation = await self._get_or_create_conversation(conversation_id)
         await self.db.flush()
@@ -82,20 +141,39 @@ class ChatService:
         
         # 3. Get current state
         current_facts = conversation.facts or {}
-        last_question_field = None
-        if conversation.missing_fields and len(conversation.missing_fields) > 0:
-            last_question_field = conversation.missing_fields[0]
-        
-        # 4. Classify intent
-        last_assistant_msg = await self._get_last_assistant_message(conversation.id)
-        intent_result = await self.intent_classifier.classify(
-            message,
-            last_question=last_assistant_msg,
-            current_facts=current_facts
-        )
+        # The field actually asked is read from the last assistant message (step 4);
+        # until then an incomplete scenario is the hint that a short answer may follow
+        pending_field = conversation.missing_fields[0] if conversation.missing_fields else None
+        
+        # 4. Classify intent (and, when combined, extract facts in the same call).
+        # Chunk retrieval for the message starts meanwhile, in case the intent needs it.
+        if self._should_speculate(message, pending_field):
+            self._speculation = speculative_retrieval.start(
+                self.retrieval, message, top_k=settings.speculative_top_k
+            )
+        # The available-lenders lookup (own session) overlaps the last-message
+        # fetch and classification; scenario turns hand it to the Leader and
+        # the specialist fan-out (None when it timed out: they look it up again).
+        try:
+            intake = await Pipeline("chat_intake", [
+                Stage("last_message", self._get_last_assistant_message, inputs=("conversation_id",), resource="db"),
+                Stage("lenders", self.agent_factory.get_available_lenders, optional=True, default=None),
+                Stage("intent_result", self._understand, inputs=("message", "last_message", "current_facts")),
+            ]).run(
+                deadline=self.deadline,
+                conversation_id=conversation.id,
+                message=message,
+                current_facts=current_facts
+            )
+        except BaseException:
+            self._discard_speculation()
+            raise
+        intent_result = intake["intent_result"]
+        last_question_field = asked_field(intake["last_message"])
         
         intent = intent_result.get("intent", IntentType.SCENARIO_INPUT)
         entities = intent_result.get("extracted_entities", {})
+        await self._emit("intent", {"intent": intent, "confidence": intent_result.get("confidence")})
         
         # 5a. Context Carryover: Extract and update last_mentioned_lender
         lender_from_message = entities.get("lender_asked")
@@ -115,10 +193,14 @@ class ChatService:
             # Context Carryover: Use last_mentioned_lender for follow-up questions
             # Only if no specific lender was mentioned in this message
             lender_filter = lender_from_message or conversation.last_mentioned_lender
+            # The speculative search is unfiltered, so it only helps without a lender filter
+            prefetched = None if lender_filter else await self._use_speculation(limit=5)
             result = await self.general_qa.answer_product_search(
                 message, 
                 product_type,
-                lender_filter=lender_filter
+                lender_filter=lender_filter,
+                prefetched_chunks=prefetched,
+                deadline=self.deadline
             )
             response = result["response"]
             citations = result.get("citations", [])
@@ -128,7 +210,12 @@ class ChatService:
             # CRITICAL: DO NOT apply lender filter for eligibility checks!
             # Eligibility questions like "Conventional requirements?" should search ALL lenders.
             # This was the bug in commit 36f7034 - filtering caused empty results.
-            result = await self.general_qa.answer_eligibility_check(message, entities)
+            result = await self.general_qa.answer_eligibility_check(
+                message,
+                entities,
+                prefetched_chunks=await self._use_speculation(limit=8),
+                deadline=self.deadline
+            )
             response = result["response"]
             citations = result.get("citations", [])
             # Merge any extracted entities
@@ -142,28 +229,38 @@ class ChatService:
             
         else:
             # SCENARIO_INPUT or FOLLOW_UP - Extract facts and give recommendations
-            try:
-                extracted = await self.llm.extract_facts(
-                    message, 
-                    current_facts,
-                    last_question_field=last_question_field
-                )
-            except Exception as e:
-                extracted = {}
+            if "facts" in intent_result:
+                extracted = intent_result["facts"]
+            else:
+                try:
+                    extracted = await self.llm.extract_facts(
+                        message, 
+                        current_facts,
+                        last_question_field=last_question_field
+                    )
+                except Exception as e:
+                    extracted = {}
             
             # Also merge entities from intent classification
             updated_facts = {**current_facts, **extracted, **self._clean_entities(entities)}
             
             # Generate response based on completeness
             try:
-                result = await self._generate_scenario_response(updated_facts)
+                result = await self._generate_scenario_response(
+                    updated_facts, conversation.analysis_state, available_lenders=intake["lenders"]
+                )
                 response = result["response"]
                 citations = result.get("citations", [])
+                if "analysis_state" in result:
+                    conversation.analysis_state = result["analysis_state"]
             except Exception as e:
                 # Fallback on any error
                 response = f"I understood your scenario. {self._format_facts_summary(updated_facts)}"
                 citations = []
         
+        # Any speculative search the routed handler did not take is wasted
+        self._discard_speculation()
+        
         # 6. Update conversation
         conversation.facts = updated_facts
         missing = self._get_missing_fields(updated_facts)
@@ -192,6 +289,41 @@ class ChatService:
             "citations": citations
         }
     
+    def _should_speculate(self, message: str, last_question_field: str | None) -> bool:
+        """Start retrieval before classification unless the turn clearly won't need it."""
+        if not settings.speculative_retrieval_enabled:
+            return False
+        # A short answer to a follow-up question is scenario input, never a search
+        return not (last_question_field and len(message.split()) <= MAX_SHORT_ANSWER_WORDS)
+    
+    async def _use_speculation(self, limit: int) -> list[dict] | None:
+        """
+        Chunks from the speculative search, or None to search normally
+        (also when it is still running after the retrieval budget).
+        """
+        task, self._speculation = self._speculation, None
+        if task is None:
+            return None
+        try:
+            return await asyncio.wait_for(
+                speculative_retrieval.use(task, limit),
+                self.deadline.budget("retrieval", cap=settings.retrieval_timeout_seconds)
+            )
+        except asyncio.TimeoutError:
+            print("ChatService: speculative retrieval timed out, searching normally")
+            speculative_retrieval.discard(task)
+            return None
+    
+    def _discard_speculation(self) -> None:
+        task, self._speculation = self._speculation, None
+        if task is not None:
+            speculative_retrieval.discard(task)
+    
+    async def _emit(self, event: str, data: dict) -> None:
+        """Send a progress event to the streaming caller, if any."""
+        if self.emit:
+            await self.emit(event, data)
+    
     async def _get_or_create_conversation(self, conversation_id: UUID | None) -> Conversation:
         """Get existing conversation or create new one."""
         if conversation_id:
@@ -206,6 +338,28 @@ class ChatService:
         self.db.add(conversation)
         return conversation
     
+    async def _understand(
+        self,
+        message: str,
+        last_message: str | None,
+        current_facts: dict
+    ) -> dict:
+        """Intent (and, when combined, facts) for the message."""
+        last_question_field = asked_field(last_message)
+        if settings.combined_understanding:
+            return await self.intent_classifier.understand(
+                message,
+                last_question=last_message,
+                current_facts=current_facts,
+                last_question_field=last_question_field
+            )
+        return await self.intent_classifier.classify(
+            message,
+            last_question=last_message,
+            current_facts=current_facts,
+            last_question_field=last_question_field
+        )
+    
     async def _get_last_assistant_message(self, conversation_id: UUID) -> str | None:
         """Get the last assistant message for context."""
         result = await self.db.execute(
@@ -295,12 +449,18 @@ class ChatService:
         
         return min(95, field_score + critical_bonus)
     
-    async def _generate_scenario_response(self, facts: dict) -> dict:
+    async def _generate_scenario_response(
+        self,
+        facts: dict,
+        analysis_state: dict | None = None,
+        available_lenders: list[str] | None = None
+    ) -> dict:
         """
         Generate response based on scenario completeness.
         
         - If minimal data: Give preliminary suggestions + ask what's missing
-        - If good data: Run multi-agent analysis
+        - If good data: Run multi-agent analysis (incremental against
+          analysis_state, the previous full analysis, when there is one)
         - Always cite sources
         """
         missing = self._get_missing_fields(facts)
@@ -318,10 +478,10 @@ class ChatService:
         
         if confidence >= 70:
             # Enough data for full analysis
-            return await self._run_multi_agent_analysis(facts)
+            return await self._run_multi_agent_analysis(facts, analysis_state, available_lenders)
         else:
             # Give preliminary suggestions + mention what's missing
-            return await self._generate_preliminary_response(facts, missing)
+            return await self._generate_preliminary_response(facts, missing, available_lenders)
     
     def _format_initial_prompt(self) -> str:
         """Format initial prompt when we have no data."""
@@ -339,11 +499,17 @@ Tell me about your client's situation - credit score, property type, loan purpos
 
 What would you like to know?"""
     
-    async def _generate_preliminary_response(self, facts: dict, missing: list[str]) -> dict:
+    async def _generate_preliminary_response(
+        self,
+        facts: dict,
+        missing: list[str],
+        available_lenders: list[str] | None = None
+    ) -> dict:
         """Generate preliminary suggestions with incomplete data."""
         
-        # Check if we have any lenders in the system
-        available_lenders = await self.agent_factory.get_available_lenders()
+        # Check if we have any lenders in the system (looked up during intake when available)
+        if available_lenders is None:
+            available_lenders = await self.agent_factory.get_available_lenders()
         
         if not available_lenders:
             # No lenders in system - give general guidance
@@ -351,11 +517,15 @@ What would you like to know?"""
         
         # Run a simplified analysis
         try:
-            leader = await self.agent_factory.create_leader_agent()
-            leader_result = await leader.analyze(facts)
+            leader = await self.agent_factory.create_leader_agent(available_lenders)
+            leader_result = await self._run_leader(leader, facts)
             
             top_lenders = leader_result.get("top_candidates", [])
             understanding = leader_result.get("understanding", "")
+            await self._emit("candidates", {
+                "lenders": [l.get("lender") if isinstance(l, dict) else l for l in top_lenders],
+                "understanding": understanding
+            })
             
             # Format response
             response_parts = ["## Preliminary Analysis\n"]
@@ -439,17 +609,44 @@ What would you like to know?"""
             "citations": []
         }
     
-    async def _run_multi_agent_analysis(self, scenario: dict) -> dict:
+    async def _run_multi_agent_analysis(
+        self,
+        scenario: dict,
+        analysis_state: dict | None = None,
+        available_lenders: list[str] | None = None
+    ) -> dict:
         """
         Run the full multi-agent eligibility analysis with citations.
+        available_lenders comes from the intake lookup (None: look it up).
+        
+        With the previous turn's analysis_state, the Leader's candidates
+        and the specialist results the fact change cannot affect are reused
+        (see incremental_analysis). The result carries the new
+        "analysis_state" to store on the conversation.
         """
         try:
-            # 1. Leader Agent - Pre-filter lenders
-            leader = await self.agent_factory.create_leader_agent()
-            leader_result = await leader.analyze(scenario)
+            # 1. Leader Agent - Pre-filter lenders (or last turn's candidates)
+            plan = None
+            if analysis_state and analysis_state.get("leader"):
+                previous_lenders = [
+                    c.get("lender") for c in analysis_state["leader"].get("top_candidates", [])
+                    if isinstance(c, dict) and c.get("lender")
+                ]
+                plan = await incremental_analysis.plan(
+                    analysis_state, scenario, await self.rules.get_by_lenders(previous_lenders)
+                )
+            
+            if plan:
+                leader_result = plan["leader"]
+                reused = plan["reused"]
+            else:
+                incremental_analysis.record_full_run()
+                leader = await self.agent_factory.create_leader_agent(available_lenders)
+                leader_result = await self._run_leader(leader, scenario)
+                reused = {}
             
             top_candidates = leader_result.get("top_candidates", [])
-            all_citations = leader_result.get("sources", [])
+            all_citations = list(leader_result.get("sources", []))
             
             # Extract lender names from candidates (can be dicts or strings)
             top_lenders = []
@@ -461,6 +658,11 @@ What would you like to know?"""
                 elif isinstance(candidate, str):
                     top_lenders.append(candidate)
             
+            await self._emit("candidates", {
+                "lenders": top_lenders,
+                "understanding": leader_result.get("understanding", "")
+            })
+            
             if not top_lenders:
                 missing = self._get_missing_fields(scenario)
                 missing_text = ""
@@ -476,23 +678,34 @@ What would you like to know?"""
                     "citations": all_citations
                 }
             
-            # 2. Specialist Agents - Analyze in parallel
-            specialists = await self.agent_factory.create_specialists_for_lenders(top_lenders)
+            # 2. Specialist Agents - Analyze in parallel (only those the change affects)
+            to_run = plan["rerun"] if plan else top_lenders
+            if len(to_run) > settings.degraded_max_specialists and self.deadline.tight(*ANALYSIS_STAGES[1:]):
+                # Not enough time left for the usual fan-out: keep the Leader's best candidates
+                print(f"ChatService: low latency budget, analyzing {settings.degraded_max_specialists} of {len(to_run)} lenders")
+                to_run = to_run[:settings.degraded_max_specialists]
+            specialists = await self.agent_factory.create_specialists_for_lenders(to_run, available_lenders)
             
-            specialist_tasks = [
-                self._run_specialist_with_timeout(agent, scenario)
-                for agent in specialists.values()
-            ]
+            prefetched = {}
+            if specialists:
+                # One batched retrieval for all specialists instead of 2 queries + 1 embedding each
+                prefetched = await self._prefetch_specialist_context(scenario, list(specialists))
             
-            specialist_results = await asyncio.gather(*specialist_tasks, return_exceptions=True)
-            
-            # Collect valid results and citations
-            valid_results = []
-            for r in specialist_results:
-                if isinstance(r, dict) and "error" not in r:
-                    valid_results.append(r)
-                    if r.get("sources"):
-                        all_citations.extend(r["sources"])
+            # Results are folded in as each specialist finishes; a quorum plus a
+            # short grace period is enough to evaluate (see _collect_specialists)
+            evaluator = self.agent_factory.create_evaluator_agent()
+            specialist_timeout = self.deadline.budget("specialist", after=("evaluator",), cap=SPECIALIST_TIMEOUT)
+            valid_results = await self._collect_specialists(
+                evaluator,
+                [
+                    self._run_specialist_with_timeout(agent, scenario, prefetched.get(lender), specialist_timeout)
+                    for lender, agent in specialists.items()
+                ],
+                reused=list(reused.values())
+            )
+            for r in valid_results:
+                if r.get("sources"):
+                    all_citations.extend(r["sources"])
             
             if not valid_results:
                 return {
@@ -501,11 +714,7 @@ What would you like to know?"""
                 }
             
             # 3. Evaluator Agent - Compare and recommend
-            evaluator = self.agent_factory.create_evaluator_agent()
-            evaluator_result = await evaluator.analyze(
-                scenario,
-                context={"specialist_analyses": valid_results}
-            )
+            evaluator_result = await self._evaluate(evaluator, scenario, valid_results)
             
             if evaluator_result.get("sources"):
                 all_citations.extend(evaluator_result["sources"])
@@ -515,7 +724,8 @@ What would you like to know?"""
             
             return {
                 "response": response,
-                "citations": all_citations
+                "citations": all_citations,
+                "analysis_state": await incremental_analysis.snapshot(scenario, leader_result, valid_results)
             }
             
         except Exception as e:
@@ -524,17 +734,168 @@ What would you like to know?"""
                 "citations": []
             }
     
-    async def _run_specialist_with_timeout(self, agent, scenario: dict) -> dict:
-        """Run specialist with timeout."""
+    async def _run_leader(self, leader, scenario: dict) -> dict:
+        """
+        Leader triage within its share of the request deadline; on timeout
+        the first available lenders go to the specialists unranked.
+        """
         try:
-            return await asyncio.wait_for(
-                agent.analyze(scenario),
-                timeout=SPECIALIST_TIMEOUT
-            )
+            with stage_latency.timed("leader"):
+                return await asyncio.wait_for(
+                    leader.analyze(scenario), self.deadline.budget("leader", after=ANALYSIS_STAGES[1:])
+                )
+        except asyncio.TimeoutError:
+            print("ChatService: leader timed out, analyzing the first available lenders")
+            return {
+                "understanding": "",
+                "top_candidates": [
+                    {"lender": lender, "reason": "Included for analysis"}
+                    for lender in leader.available_lenders[:MAX_CANDIDATES]
+                ],
+                "reasoning": "Fallback due to timeout",
+                "sources": [],
+                "error": "timeout"
+            }
+    
+    async def _prefetch_specialist_context(self, scenario: dict, lenders: list[str]) -> dict[str, dict]:
+        """
+        Chunks and rules for every specialist (RetrievalService.search_by_lenders)
+        within the retrieval share of the deadline; rules alone if the search runs out of time.
+        """
+        timeout = self.deadline.budget(
+            "retrieval", after=ANALYSIS_STAGES[2:], cap=settings.retrieval_timeout_seconds
+        )
+        try:
+            with stage_latency.timed("retrieval"):
+                return await asyncio.wait_for(
+                    self.retrieval.search_by_lenders(
+                        build_specialist_query(scenario), lenders, top_k=settings.specialist_top_k
+                    ),
+                    timeout
+                )
         except asyncio.TimeoutError:
-            return {"error": f"Timeout analyzing {getattr(agent, 'lender_name', 'lender')}"}
+            print("ChatService: specialist retrieval timed out, analyzing with rules only")
+            rules = await self.rules.get_by_lenders(lenders)
+            return {lender: {"chunks": [], "rules": rules.get(lender, [])} for lender in lenders}
+    
+    async def _collect_specialists(self, evaluator, specialist_runs: list, reused: list[dict]) -> list[dict]:
+        """
+        Valid specialist results, taken as they complete.
+        
+        Once settings.specialist_quorum of the specialists that are running
+        have answered, a "ranking" event carries the evaluator's
+        deterministic ranking, and the rest get
+        settings.specialist_grace_seconds more; each late result updates the
+        ranking. Specialists still running after that are cancelled, so one
+        slow lender no longer sets the turn's latency. Reused results are
+        ranked but do not count towards the quorum: the re-run lenders are
+        the ones the change affects.
+        """
+        valid = []
+        for result in reused:
+            await self._emit("specialist", {
+                "lender": result.get("lender"),
+                "eligible_products": result.get("eligible_products", []),
+                "summary": result.get("summary"),
+                "error": None,
+                "reused": True
+            })
+            valid.append(result)
+        
+        pending = {asyncio.ensure_future(run) for run in specialist_runs}
+        quorum = min(max(1, settings.specialist_quorum), len(pending))
+        fresh = 0
+        grace_deadline = None
+        changed = bool(valid)
+        try:
+            while True:
+                if grace_deadline is None and fresh >= quorum:
+                    grace_deadline = time.monotonic() + settings.specialist_grace_seconds
+                if changed and grace_deadline is not None:
+                    await self._emit("ranking", {
+                        **evaluator.rank(valid),
+                        "lenders": [r.get("lender") for r in valid],
+                        "pending": len(pending)
+                    })
+                if not pending:
+                    break
+                
+                timeout = None if grace_deadline is None else grace_deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                
+                changed = False
+                for task in done:
+                    result = task.result()
+                    if isinstance(result, dict) and "error" not in result:
+                        valid.append(result)
+                        fresh += 1
+                        changed = True
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            print(f"ChatService: evaluating without {len(pending)} specialist(s) still running after the grace period")
+        return valid
+    
+    async def _evaluate(self, evaluator, scenario: dict, analyses: list[dict]) -> dict:
+        """
+        Evaluator LLM within settings.evaluator_timeout_seconds (and the
+        request deadline); its deterministic ranking if it fails or runs out
+        of time, or straight away when its p90 latency no longer fits.
+        """
+        if self.deadline.tight("evaluator"):
+            print("ChatService: low latency budget, skipping evaluator prose")
+            return evaluator.rank(analyses)
+        
+        timeout = self.deadline.budget("evaluator", cap=settings.evaluator_timeout_seconds)
+        if timeout > 0:
+            context = {"specialist_analyses": analyses}
+            if self.emit:
+                context["on_token"] = self._emit_token
+            try:
+                with stage_latency.timed("evaluator"):
+                    result = await asyncio.wait_for(evaluator.analyze(scenario, context=context), timeout)
+                if "error" not in result:
+                    return result
+                print(f"ChatService: evaluator error, using ranking: {result['error']}")
+            except asyncio.TimeoutError:
+                print("ChatService: evaluator timed out, using ranking")
+        return evaluator.rank(analyses)
+    
+    async def _run_specialist_with_timeout(
+        self,
+        agent,
+        scenario: dict,
+        context: dict | None = None,
+        timeout: float = SPECIALIST_TIMEOUT
+    ) -> dict:
+        """Run specialist with timeout; streams its result as soon as it completes."""
+        lender = getattr(agent, 'lender_name', 'lender')
+        try:
+            with stage_latency.timed("specialist"):
+                result = await asyncio.wait_for(
+                    agent.analyze(scenario, context=context),
+                    timeout=timeout
+                )
+        except asyncio.TimeoutError:
+            result = {"error": f"Timeout analyzing {lender}"}
         except Exception as e:
-            return {"error": str(e)}
+            result = {"error": str(e)}
+        
+        await self._emit("specialist", {
+            "lender": lender,
+            "eligible_products": result.get("eligible_products", []),
+            "summary": result.get("summary"),
+            "error": result.get("error")
+        })
+        return result
+    
+    async def _emit_token(self, token: str) -> None:
+        await self._emit("token", {"text": token})
     
     def _format_facts(self, facts: dict) -> str:
         """Format facts as readable summary."""
@@ -0,0 +1,121 @@
+"""
+Deadline - Request-scoped latency budget
+
+A Deadline is created where a chat request enters the API and travels
+with it: ChatService hands it to its pipelines and stages, and
+current_deadline exposes it to code several calls down (LLM scheduler
+attempts, vector queries) without adding a parameter to every signature.
+
+Stages get a share of the time left instead of fixed timeouts:
+- budget() reserves the median latency of the stages still to run after
+  this one, so an early stage cannot eat the whole request
+- tight() reports that the stages' p90 latency no longer fits, so the
+  caller can take a cheaper path (fewer specialists, no evaluator prose)
+Latencies come from stage_latency, a rolling window per stage; until a
+stage has settings.latency_min_samples samples it only gets fixed caps.
+"""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+import asyncio
+import time
+
+from app.config import settings
+
+
+class StageLatency:
+    """Rolling window of recent wall times per stage."""
+
+    def __init__(self):
+        self._samples: dict[str, deque] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        self._samples.setdefault(stage, deque(maxlen=settings.latency_window)).append(seconds)
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """Record the wall time of the block (timeouts included, cancellations not)."""
+        started = time.monotonic()
+        cancelled = False
+        try:
+            yield
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                self.record(stage, time.monotonic() - started)
+
+    def percentile(self, stage: str, q: float) -> float | None:
+        """q-th percentile in seconds, or None with too few samples to trust."""
+        samples = self._samples.get(stage)
+        if not samples or len(samples) < settings.latency_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+    def reset_stats(self) -> None:
+        self._samples.clear()
+
+    def stats(self) -> dict:
+        """Per-stage percentiles for the admin metrics endpoint."""
+        result = {}
+        for stage, samples in self._samples.items():
+            ordered = sorted(samples)
+            result[stage] = {
+                "samples": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p90_ms": round(ordered[min(len(ordered) - 1, len(ordered) * 9 // 10)] * 1000, 1)
+            }
+        return result
+
+
+# Process-wide latency windows shared by every request
+stage_latency = StageLatency()
+
+
+class Deadline:
+    """Absolute time.monotonic() deadline for one request."""
+
+    def __init__(self, seconds: float):
+        self.at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def budget(self, stage: str, after: tuple[str, ...] = (), cap: float | None = None) -> float:
+        """
+        Seconds for `stage`: the time left minus the median latency of the
+        stages `after` it, but never below the stage's own median (when
+        there is time for it) or settings.deadline_min_stage_share of the
+        time left; at most cap.
+        """
+        remaining = self.remaining()
+        reserved = sum(stage_latency.percentile(name, 50) or 0 for name in after)
+        budget = max(
+            remaining - reserved,
+            min(remaining, stage_latency.percentile(stage, 50) or 0),
+            remaining * settings.deadline_min_stage_share
+        )
+        return budget if cap is None else min(budget, cap)
+
+    def tight(self, *stages: str) -> bool:
+        """True when the stages' observed p90 latencies add up to more than the time left."""
+        needed = [stage_latency.percentile(stage, 90) for stage in stages]
+        observed = [seconds for seconds in needed if seconds is not None]
+        return bool(observed) and sum(observed) > self.remaining()
+
+
+# Deadline of the request the current task is serving (None outside requests)
+current_deadline: ContextVar[Deadline | None] = ContextVar("current_deadline", default=None)
+
+
+def time_left(deadline: Deadline | None) -> float | None:
+    """Seconds until deadline (negative once it has passed); None without one."""
+    if deadline is None:
+        return None
+    return deadline.at - time.monotonic()
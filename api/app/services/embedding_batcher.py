@@ -0,0 +1,136 @@
+"""
+Embedding Batcher - Cross-request micro-batching of query embeddings
+
+Leader and Specialist agents (and concurrent chat requests) each embed one
+short query within milliseconds of each other. Instead of one HTTP call per
+query, pending texts are collected for settings.embedding_batch_window_ms
+(or until settings.embedding_batch_size distinct texts are waiting) and sent
+as a single `embeddings.create(input=[...])`. Identical texts in the same
+window share one input. Results are fanned back to the waiting coroutines.
+"""
+import asyncio
+
+import numpy as np
+from openai import AsyncOpenAI
+
+from app.config import settings
+from app.services.deadline import current_deadline
+from app.services.llm_scheduler import llm_scheduler, Priority
+from app.services.token_counter import truncate_tokens
+
+# Embeddings API limit per input
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+
+
+class EmbeddingBatcher:
+    """Collects concurrent embed requests and dispatches them in batches."""
+
+    def __init__(self, window_ms: float | None = None, max_batch: int | None = None):
+        self.window_ms = window_ms if window_ms is not None else settings.embedding_batch_window_ms
+        self.max_batch = max_batch if max_batch is not None else settings.embedding_batch_size
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._client: AsyncOpenAI | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self._in_flight: set[asyncio.Task] = set()
+        self.requests = 0
+        self.batches = 0
+        self.inputs = 0
+
+    async def embed(self, client: AsyncOpenAI, text: str) -> np.ndarray:
+        """Embed text as part of the next batch; returns a float32 vector."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        if self._client is None:
+            # Every caller uses the same API key/model, so one client serves the batch
+            self._client = client
+        self._pending.setdefault(text, []).append(future)
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Send everything collected so far as one API call."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, client = self._pending, self._client
+        self._pending, self._client = {}, None
+        if not pending:
+            return
+
+        # Keep a reference so the task is not garbage collected mid-flight
+        task = asyncio.ensure_future(self._send(client, pending))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, client: AsyncOpenAI, pending: dict[str, list[asyncio.Future]]) -> None:
+        # The batch serves several requests: not bound to the deadline of the one that flushed it
+        current_deadline.set(None)
+        # Skip texts nobody is waiting for any more (e.g. a discarded speculative search)
+        pending = {text: waiters for text, waiters in pending.items() if not all(f.done() for f in waiters)}
+        if not pending:
+            return
+        texts = list(pending)
+        self.batches += 1
+        self.inputs += len(texts)
+
+        call = asyncio.ensure_future(llm_scheduler.embeddings(
+            client,
+            Priority.INTERACTIVE,
+            model=settings.embedding_model,
+            input=[truncate_tokens(text, EMBEDDING_MAX_INPUT_TOKENS) for text in texts]
+        ))
+
+        def abandon(_) -> None:
+            # Stop queueing and retrying once every caller of the batch has given up
+            if not call.done() and all(f.done() for waiters in pending.values() for f in waiters):
+                call.cancel()
+
+        for waiters in pending.values():
+            for future in waiters:
+                future.add_done_callback(abandon)
+
+        try:
+            response = await call
+            items = response.data
+            if len(items) > 1:
+                # The API returns one item per input, tagged with its position
+                items = sorted(items, key=lambda d: d.index)
+
+            for text, item in zip(texts, items):
+                embedding = np.asarray(item.embedding, dtype=np.float32)
+                for future in pending[text]:
+                    if not future.done():
+                        future.set_result(embedding)
+        except Exception as e:
+            for waiters in pending.values():
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self) -> dict:
+        """Batching counters for the admin metrics endpoint."""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "inputs": self.inputs,
+            "avg_batch_size": round(self.inputs / self.batches, 2) if self.batches else 0.0,
+            "window_ms": self.window_ms,
+            "max_batch": self.max_batch
+        }
+
+    def reset_stats(self) -> None:
+        self.requests = 0
+        self.batches = 0
+        self.inputs = 0
+
+
+# Process-wide batcher shared by every RetrievalService instance
+embedding_batcher = EmbeddingBatcher()
@@ -0,0 +1,109 @@
+"""
+Embedding Cache - Two-tier cache for query embeddings
+
+Leader and Specialist agents build their queries from the same templated
+facts, so the same text gets embedded over and over. Lookups go:
+1. In-process LRU (bounded by settings.embedding_cache_size)
+2. Redis (shared across workers, expires after embedding_cache_ttl_seconds)
+3. Miss - caller embeds and stores the result
+"""
+from collections import OrderedDict
+import hashlib
+
+import numpy as np
+
+from app.config import settings
+from app.redis_client import get_redis, mark_redis_unavailable
+
+
+class EmbeddingCache:
+    """LRU + Redis cache keyed by normalized text and embedding model."""
+
+    def __init__(self, max_size: int | None = None, ttl_seconds: int | None = None):
+        self.max_size = max_size if max_size is not None else settings.embedding_cache_size
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.embedding_cache_ttl_seconds
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        """Build the cache key: model + hash of whitespace/case-normalized text."""
+        normalized = " ".join(text.lower().split())
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"owly:emb:{settings.embedding_model}:{digest}"
+
+    async def get(self, text: str) -> np.ndarray | None:
+        """Return the cached embedding for text, or None on a miss."""
+        key = self.key(text)
+
+        embedding = self._entries.get(key)
+        if embedding is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return embedding
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(key)
+            except Exception as e:
+                mark_redis_unavailable(e)
+                raw = None
+            if raw:
+                embedding = np.frombuffer(raw, dtype=np.float32)
+                self._remember(key, embedding)
+                self.redis_hits += 1
+                return embedding
+
+        self.misses += 1
+        return None
+
+    async def set(self, text: str, embedding: np.ndarray | list[float]) -> None:
+        """Store an embedding (as float32) in both tiers."""
+        key = self.key(text)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        self._remember(key, embedding)
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                # float32 bytes: ~6 KB per 1536-dim vector instead of ~30 KB of JSON
+                await redis.set(
+                    key,
+                    embedding.tobytes(),
+                    ex=self.ttl_seconds
+                )
+            except Exception as e:
+                mark_redis_unavailable(e)
+
+    def _remember(self, key: str, embedding: np.ndarray) -> None:
+        """Insert into the LRU, evicting the least recently used entries."""
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop the in-process tier and reset counters."""
+        self._entries.clear()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the admin metrics endpoint."""
+        hits = self.memory_hits + self.redis_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+
+# Process-wide cache shared by every RetrievalService instance
+embedding_cache = EmbeddingCache()
@@ -1,4 +1,7 @@
+from openai import AsyncOpenAI
+
 from app.services.agent_service import BaseAgent
+from app.services.llm_scheduler import Priority
 
 
 EVALUATOR_SYSTEM_PROMPT = """You are the Comparison Analyst at Owly.
@@ -33,8 +36,10 @@ class EvaluatorAgent(BaseAgent):
     Evaluator Agent - Compares specialist analyses and recommends best option.
     """
     
-    def __init__(self):
-        super().__init__("Evaluator", EVALUATOR_SYSTEM_PROMPT)
+    priority = Priority.EVALUATOR
+    
+    def __init__(self, client: AsyncOpenAI | None = None):
+        super().__init__("Evaluator", EVALUATOR_SYSTEM_PROMPT, client=client)
     
     async def analyze(self, scenario: dict, context: dict | None = None) -> dict:
         """
@@ -42,7 +47,8 @@ class EvaluatorAgent(BaseAgent):
         
         Args:
             scenario: The loan scenario
-            context: Must contain 'specialist_analyses' list
+            context: Must contain 'specialist_analyses' list; an optional
+                'on_token' coroutine receives the analysis as it streams
         """
         specialist_analyses = context.get("specialist_analyses", []) if context else []
         
@@ -63,12 +69,21 @@ Lender Analyses:
 Based on these analyses, provide your recommendation for the best lender/product for this scenario."""
 
         # Get text response (not JSON) for more natural recommendation
-        response = await self._call_llm(
-            user_prompt,
-            response_format="text",
-            max_tokens=2000,
-            temperature=0.4
-        )
+        on_token = context.get("on_token")
+        if on_token:
+            response = await self._stream_llm(
+                user_prompt,
+                on_token,
+                max_tokens=2000,
+                temperature=0.4
+            )
+        else:
+            response = await self._call_llm(
+                user_prompt,
+                response_format="text",
+                max_tokens=2000,
+                temperature=0.4
+            )
         
         if isinstance(response, dict) and "error" in response:
             return response
@@ -81,6 +96,14 @@ Based on these analyses, provide your recommendation for the best lender/product
             "sources": self._extract_sources(specialist_analyses)
         }
     
+    def rank(self, analyses: list[dict]) -> dict:
+        """Deterministic recommendation from the analyses so far (no LLM call)."""
+        return {
+            "recommendation": self._extract_recommendation(analyses),
+            "alternatives": self._extract_alternatives(analyses),
+            "sources": self._extract_sources(analyses)
+        }
+    
     def _format_analyses(self, analyses: list[dict]) -> str:
         """Format specialist analyses for comparison."""
         lines = []
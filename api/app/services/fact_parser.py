@@ -0,0 +1,315 @@
+"""
+Fact Parser - Deterministic extraction of scenario facts
+
+Implements the LLMService "MAPPING GUIDE" locally: short answers such as
+"California", "740", "20% down" or "Single family", and free-text
+scenarios in English or Spanish ("credit score de 740, 20% de down
+payment en una casa de $400,000"), map to the same normalized values the
+LLM is asked to produce. unresolved_fields() tells the caller when the
+message mentions something the parser could not pin down, so the LLM
+only runs for those messages.
+"""
+import re
+
+
+US_STATES = {
+    "AL": "alabama", "AK": "alaska", "AZ": "arizona", "AR": "arkansas",
+    "CA": "california", "CO": "colorado", "CT": "connecticut", "DE": "delaware",
+    "DC": "district of columbia", "FL": "florida", "GA": "georgia", "HI": "hawaii",
+    "ID": "idaho", "IL": "illinois", "IN": "indiana", "IA": "iowa",
+    "KS": "kansas", "KY": "kentucky", "LA": "louisiana", "ME": "maine",
+    "MD": "maryland", "MA": "massachusetts", "MI": "michigan", "MN": "minnesota",
+    "MS": "mississippi", "MO": "missouri", "MT": "montana", "NE": "nebraska",
+    "NV": "nevada", "NH": "new hampshire", "NJ": "new jersey", "NM": "new mexico",
+    "NY": "new york", "NC": "north carolina", "ND": "north dakota", "OH": "ohio",
+    "OK": "oklahoma", "OR": "oregon", "PA": "pennsylvania", "RI": "rhode island",
+    "SC": "south carolina", "SD": "south dakota", "TN": "tennessee", "TX": "texas",
+    "UT": "utah", "VT": "vermont", "VA": "virginia", "WA": "washington",
+    "WV": "west virginia", "WI": "wisconsin", "WY": "wyoming",
+}
+
+# Spanish state names that differ from the English ones
+SPANISH_STATE_NAMES = {
+    "nueva york": "new york", "nueva jersey": "new jersey", "nuevo méxico": "new mexico",
+    "nuevo mexico": "new mexico", "carolina del norte": "north carolina",
+    "carolina del sur": "south carolina", "dakota del norte": "north dakota",
+    "dakota del sur": "south dakota", "virginia occidental": "west virginia",
+    "pensilvania": "pennsylvania", "luisiana": "louisiana", "misisipi": "mississippi",
+    "hawái": "hawaii", "tejas": "texas",
+}
+
+# Large metros named without their state ("downtown Miami")
+MAJOR_CITIES = {
+    "miami": "florida", "orlando": "florida", "tampa": "florida", "jacksonville": "florida",
+    "los angeles": "california", "san diego": "california", "san francisco": "california",
+    "san jose": "california", "sacramento": "california", "houston": "texas",
+    "dallas": "texas", "austin": "texas", "san antonio": "texas", "phoenix": "arizona",
+    "las vegas": "nevada", "atlanta": "georgia", "chicago": "illinois", "boston": "massachusetts",
+    "seattle": "washington", "denver": "colorado", "philadelphia": "pennsylvania",
+    "detroit": "michigan", "nashville": "tennessee", "charlotte": "north carolina",
+    "brooklyn": "new york", "manhattan": "new york", "new york city": "new york",
+}
+
+# Two-letter codes that are also common words or loan programs ("VA loan");
+# only accepted as a whole answer
+AMBIGUOUS_STATE_CODES = {"IN", "OR", "ME", "OK", "HI", "DE", "LA", "PA", "MA", "AL", "CO", "ID", "OH", "MO", "VA"}
+
+# Field -> [(pattern, normalized value)], first match wins (most specific first)
+ENUM_PATTERNS: dict[str, list[tuple[str, str]]] = {
+    "loan_purpose": [
+        (r"cash[\s-]?out|sacar (efectivo|dinero)", "cashout"),
+        (r"rate (and|&) term|\brefi\b|refinanc", "rate_term_refi"),
+        (r"purchas|buying|\bbuy\b|homebuyer|down payment|\bcompr(a|ar|ando)\b", "purchase"),
+    ],
+    "occupancy": [
+        (r"second (home|residence)|vacation|segunda (casa|vivienda|residencia)", "second_home"),
+        (r"investment|investor|rental|\bnoo\b|non[\s-]?owner|inversi[oó]n|inversionista|para rentar|alquiler", "investment"),
+        (r"primary|owner[\s-]?occupied|main residence|residencia principal|first[\s-]?time homebuyer", "primary"),
+    ],
+    "property_type": [
+        (r"condo", "condo"),
+        (r"duplex|dúplex|triplex|fourplex|quadplex|[234][\s-]?unit|multi[\s-]?(family|unit)|multifamiliar|[234] unidades", "2-4_unit"),
+        (r"single[\s-]?family|\bsfr\b|unifamiliar", "sfr"),
+    ],
+    "doc_type": [
+        (r"\bdscr\b|rental income|ingreso(s)? de renta", "dscr"),
+        (r"bank statements?|self[\s-]?employed|estados de cuenta|cuenta propia|independiente", "bank_statement"),
+        (r"\b1099\b", "1099"),
+        (r"\bwvoe\b|written (voe|verification)", "wvoe"),
+        (r"asset (utilization|depletion|qualifier)|assets? l[ií]quidos|liquid assets", "asset_utilization"),
+        (r"\bw-?2\b|full[\s-]?doc|tax returns?|declaraciones de impuestos", "full_doc"),
+    ],
+    "credit_events": [
+        (r"bankruptcy|\bbk\b|chapter (7|13)|\bch\.? ?(7|13)\b|bancarrota|quiebra", "bankruptcy"),
+        (r"foreclosure|ejecuci[oó]n hipotecaria", "foreclosure"),
+        (r"short[\s-]?sale|venta corta", "short_sale"),
+        (r"late payments?|\blates\b|pagos atrasados", "late_payments"),
+        (r"no credit events|clean credit|sin eventos de cr[eé]dito|cr[eé]dito limpio", "none"),
+    ],
+}
+
+# Whole-message answers that only mean something as a reply to the field
+# just asked ("No" to "any credit events?", "A house" to "property type?")
+SHORT_ANSWER_PATTERNS: dict[str, list[tuple[str, str]]] = {
+    "property_type": [
+        (r"^(an? |una? )?(house|home|casa)[.!]*$", "sfr"),
+    ],
+    "credit_events": [
+        (r"^(no|none|nope|clean( credit)?|no (credit )?events?|ninguno|nada)[.!]*$", "none"),
+    ],
+}
+
+# Mentions of a field; if present but the field was not parsed, the LLM is needed
+FIELD_CUES = {
+    "fico": r"score|fico|puntaje|puntuaci[oó]n",
+    "ltv": r"\bltv\b|down\b|financ|enganche|pago inicial",
+    "loan_amount": r"loan amount|loan of|pr[eé]stamo|\bborrow(?!er)|\bprice\b|precio",
+    "loan_purpose": r"purchas|\bbuy|compr|refi|refinanc|cash[\s-]?out",
+    "occupancy": r"occup|primary|\bresiden|invest|rental|vivir",
+    "property_type": r"condo|\bunits?\b|unidad|family|plex|property type|tipo de propiedad",
+    "doc_type": r"\bdoc\b|statement|1099|w-?2|self[\s-]?employed|dscr|asset",
+    "credit_events": r"bankrupt|foreclos|short[\s-]?sale|late pay|quiebra|bancarrota|chapter|\bbk\b",
+}
+
+_NUMBER = r"\$?\s*(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)\s*(k|m|mm|million|thousand)?\b"
+_MULTIPLIERS = {"k": 1_000, "thousand": 1_000, "m": 1_000_000, "mm": 1_000_000, "million": 1_000_000}
+
+# A whole message that is just a number: "740", "$400,000", "400k", "80%", "20% down"
+_NUMERIC_ANSWER = (
+    r"^(\$)?\s*(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)\s*(k|m|mm|million|thousand)?"
+    r"\s*(%)?\s*(down)?[.!]*$"
+)
+
+# Plausible range per numeric field; a bare number outside it is not an answer
+NUMERIC_RANGES = {"fico": (300, 850), "ltv": (1, 100), "loan_amount": (10_000, None)}
+
+
+def parse_state(text: str) -> str | None:
+    """US state name (English or Spanish), code or major city -> lowercase state name."""
+    cleaned = text.strip().strip(".!")
+    if len(cleaned) == 2 and cleaned.upper() in US_STATES:
+        return US_STATES[cleaned.upper()]
+
+    lowered = cleaned.lower()
+    names = {**{name: name for name in US_STATES.values()}, **SPANISH_STATE_NAMES, **MAJOR_CITIES}
+    for name in sorted(names, key=len, reverse=True):
+        if re.search(rf"\b{name}\b", lowered):
+            return names[name]
+
+    # Upper-case codes in running text ("a condo in CA"), skipping common words
+    for code in re.findall(r"\b([A-Z]{2})\b", cleaned):
+        if code in US_STATES and code not in AMBIGUOUS_STATE_CODES:
+            return US_STATES[code]
+    return None
+
+
+def parse_amount(text: str) -> int | None:
+    """'$400,000', '400k', '1.2M' -> 400000 / 1200000."""
+    match = re.search(_NUMBER, text.lower())
+    if not match:
+        return None
+    value = float(match.group(1).replace(",", ""))
+    if match.group(2):
+        value *= _MULTIPLIERS[match.group(2)]
+    return int(value)
+
+
+def parse_numeric_answer(field: str, text: str) -> int | float | None:
+    """
+    A whole-message answer to a numeric field: '740' (fico), '80%' or
+    '20% down' (ltv), '$400,000' or '400k' (loan_amount). None for anything
+    else, including numbers outside the field's range ("Top 3 lenders").
+    """
+    match = re.match(_NUMERIC_ANSWER, text.strip().lower())
+    if not match:
+        return None
+    dollar, number, multiplier, percent, down = match.groups()
+    value = float(number.replace(",", ""))
+
+    if field == "loan_amount":
+        if percent or down:
+            return None
+        if multiplier:
+            value *= _MULTIPLIERS[multiplier]
+    elif dollar or multiplier:
+        return None
+    elif field == "fico":
+        if percent or down or not number.isdigit():
+            return None
+    elif down:
+        value = 100 - value
+
+    low, high = NUMERIC_RANGES[field]
+    if value < low or (high is not None and value > high):
+        return None
+    return _number(f"{value:g}") if field == "ltv" else int(value)
+
+
+def parse_enum(field: str, text: str) -> str | None:
+    """Map a phrase to the normalized enum value for field."""
+    lowered = text.strip().lower()
+    for pattern, value in ENUM_PATTERNS.get(field, []):
+        if re.search(pattern, lowered):
+            return value
+    return None
+
+
+def parse_field_value(field: str, text: str):
+    """Normalize a short answer to the field that was just asked, or None."""
+    if field == "state":
+        return parse_state(text)
+    if field in NUMERIC_RANGES:
+        return parse_numeric_answer(field, text)
+    lowered = text.strip().lower()
+    for pattern, value in SHORT_ANSWER_PATTERNS.get(field, []):
+        if re.search(pattern, lowered):
+            return value
+    return parse_enum(field, text)
+
+
+def _number(value: str) -> int | float:
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def _find_fico(lowered: str) -> int | None:
+    patterns = [
+        r"(?:credit score|fico|score|puntaje|puntuaci[oó]n)\s*(?:de|del|of|is|:)?\s*(\d{3})\b",
+        r"\b(\d{3})\s*(?:fico|credit score|score)",
+    ]
+    for pattern in patterns:
+        for match in re.finditer(pattern, lowered):
+            score = int(match.group(1))
+            if 300 <= score <= 850:
+                return score
+    return None
+
+
+def _find_ltv(lowered: str) -> int | float | None:
+    match = re.search(r"\bltv\s*(?:de|del|of|at|is|:)?\s*(\d{1,3}(?:\.\d+)?)\s*%?", lowered) \
+        or re.search(r"\b(\d{1,3}(?:\.\d+)?)\s*%?\s*ltv\b", lowered)
+    if match and float(match.group(1)) <= 100:
+        return _number(match.group(1))
+
+    if re.search(r"\b(sin|no|zero)\s+down|(?<![\d.])0\s*%\s*down|100\s*%\s*financ", lowered):
+        return 100
+
+    match = re.search(
+        r"(\d{1,2}(?:\.\d+)?)\s*%\s*(?:[a-záéíóúñ]+\s+){0,2}?(?:down\b|enganche|pago inicial)", lowered
+    )
+    if match:
+        return _number(f"{100 - float(match.group(1)):g}")
+    return None
+
+
+def _find_dti(lowered: str) -> int | float | None:
+    match = re.search(r"\bdti\s*(?:de|del|of|at|is|:)?\s*(\d{1,2}(?:\.\d+)?)\s*%?", lowered)
+    return _number(match.group(1)) if match else None
+
+
+def _find_loan_amount(lowered: str, ltv: float | None) -> int | None:
+    match = re.search(rf"(?:loan amount|loan of|loan for|pr[eé]stamo de|monto del pr[eé]stamo)\s*(?:of|de|is|:)?\s*{_NUMBER}", lowered)
+    if match:
+        return parse_amount(match.group(0).split(None, 2)[-1])
+
+    # Purchase price + down payment -> loan amount
+    match = re.search(
+        rf"(?:casa|house|home|property|propiedad|\bprice|precio)\s*(?:de|of|for|at|is|:)?\s*{_NUMBER}", lowered
+    )
+    if match and ltv is not None:
+        price = parse_amount(match.group(0))
+        if price and price >= 10_000:
+            return int(round(price * float(ltv) / 100))
+    return None
+
+
+def parse_facts(message: str, last_question_field: str | None = None) -> dict:
+    """
+    Extract normalized scenario facts from a message (English or Spanish).
+    Returns only the fields found, like LLMService.extract_facts.
+    """
+    text = message.strip()
+    lowered = text.lower()
+    facts = {}
+
+    # A short answer to the field that was just asked
+    if last_question_field and len(text.split()) <= 5:
+        value = parse_field_value(last_question_field, text)
+        if value is not None:
+            facts[last_question_field] = value
+
+    fico = _find_fico(lowered)
+    if fico is not None:
+        facts.setdefault("fico", fico)
+
+    ltv = _find_ltv(lowered)
+    if ltv is not None:
+        facts.setdefault("ltv", ltv)
+
+    dti = _find_dti(lowered)
+    if dti is not None:
+        facts.setdefault("dti", dti)
+
+    loan_amount = _find_loan_amount(lowered, facts.get("ltv"))
+    if loan_amount is not None:
+        facts.setdefault("loan_amount", loan_amount)
+
+    state = parse_state(text)
+    if state is not None:
+        facts.setdefault("state", state)
+
+    for field in ENUM_PATTERNS:
+        value = parse_enum(field, text)
+        if value is not None:
+            facts.setdefault(field, value)
+
+    return facts
+
+
+def unresolved_fields(message: str, facts: dict) -> list[str]:
+    """Fields the message mentions that parse_facts() could not extract."""
+    lowered = message.lower()
+    return [
+        field for field, cue in FIELD_CUES.items()
+        if field not in facts and re.search(cue, lowered)
+    ]
@@ -7,16 +7,23 @@ from openai import AsyncOpenAI
 import json
 
 from app.config import settings
-from app.models.document import Document, Rule, Chunk
+from app.llm_client import get_openai_client
+from app.models.document import Document, Rule
+from app.services.retrieval_service import RetrievalService
+from app.services.deadline import Deadline
+from app.services.llm_scheduler import llm_scheduler
+from app.services.pipeline import Pipeline, Stage
+from app.services.prompt_packer import pack_chunks, pack_lines
 
 
 class GeneralQAService:
     """Handles general questions about lenders, products, and the system."""
     
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, client: AsyncOpenAI | None = None):
         self.db = db
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = client or get_openai_client()
         self.model = settings.openai_model
+        self.retrieval = RetrievalService(db, client=self.client)
     
     async def answer_general_question(self, question: str) -> dict:
         """
@@ -52,7 +59,8 @@ For eligibility analysis, these are the key factors we consider:
 
 Respond naturally and helpfully."""
 
-        response = await self.client.chat.completions.create(
+        response = await llm_scheduler.chat_completion(
+            self.client,
             model=self.model,
             messages=[
                 {"role": "system", "content": system_prompt.format(stats=json.dumps(stats, indent=2))},
@@ -72,7 +80,9 @@ Respond naturally and helpfully."""
         self, 
         question: str, 
         product_type: str | None = None,
-        lender_filter: str | None = None
+        lender_filter: str | None = None,
+        prefetched_chunks: list[dict] | None = None,
+        deadline: Deadline | None = None
     ) -> dict:
         """
         Answer product-specific questions like:
@@ -83,21 +93,36 @@ Respond naturally and helpfully."""
             question: The user's question
             product_type: Filter by product type (e.g., "bank statement", "DSCR")
             lender_filter: Optional lender to focus on (for follow-up questions)
+            prefetched_chunks: Chunks already retrieved for this question (skips the search)
+            deadline: Deadline of the chat turn
         """
-        # Get relevant rules and documents
+        # Get relevant rules and documents concurrently
         # Apply lender filter if provided (for context carryover in follow-ups)
-        rules = await self._get_rules_by_product(product_type, lender_filter=lender_filter)
-        chunks = await self._search_chunks(question, limit=5, lender_filter=lender_filter)
+        run = await Pipeline("product_search", [
+            Stage("rules", lambda: self._get_rules_by_product(product_type, lender_filter=lender_filter), resource="db"),
+            Stage(
+                "chunks",
+                lambda: self._retrieve_chunks(question, 5, lender_filter, prefetched_chunks),
+                timeout=settings.retrieval_timeout_seconds, optional=True, default=[]
+            ),
+        ]).run(deadline=deadline)
+        rules, chunks = run["rules"], run["chunks"]
         
-        # Format context with citations
+        # Format context with citations, packed into the token budget
         context_parts = []
         citations = []
         
-        for i, rule in enumerate(rules[:10]):
-            context_parts.append(f"[{i+1}] {rule.lender} - {rule.program or 'Standard'}: "
-                               f"FICO {rule.fico_min or 'N/A'}-{rule.fico_max or 'N/A'}, "
-                               f"LTV max {rule.ltv_max or 'N/A'}%, "
-                               f"Doc types: {', '.join(rule.doc_types or ['Full Doc'])}")
+        packed_rules = pack_lines(
+            [f"{rule.lender} - {rule.program or 'Standard'}: "
+             f"FICO {rule.fico_min or 'N/A'}-{rule.fico_max or 'N/A'}, "
+             f"LTV max {rule.ltv_max or 'N/A'}%, "
+             f"Doc types: {', '.join(rule.doc_types or ['Full Doc'])}"
+             for rule in rules],
+            settings.rules_context_tokens,
+            stage="product_search_rules"
+        )
+        for i, (rule, line) in enumerate(zip(rules, packed_rules.items)):
+            context_parts.append(f"[{i+1}] {line['content']}")
             citations.append({
                 "id": i+1,
                 "lender": rule.lender,
@@ -105,13 +130,23 @@ Respond naturally and helpfully."""
                 "type": "rule"
             })
         
-        for i, chunk in enumerate(chunks):
-            idx = len(rules) + i + 1
-            # Safely access document attributes
-            lender = getattr(chunk.document, 'lender', 'Unknown') if chunk.document else 'Unknown'
-            filename = getattr(chunk.document, 'filename', 'Unknown') if chunk.document else 'Unknown'
-            context_parts.append(f"[{idx}] From {lender} ({filename}): "
-                               f"{chunk.content[:300]}...")
+        def render_chunk(index: int, chunk: dict, content: str) -> str:
+            idx = len(packed_rules.items) + index
+            return (f"[{idx}] From {chunk.get('lender') or 'Unknown'} ({chunk.get('filename') or 'Unknown'}): "
+                    f"{content}...")
+        
+        packed_chunks = pack_chunks(
+            chunks,
+            settings.qa_context_tokens,
+            render_chunk,
+            stage="product_search",
+            max_item_tokens=settings.max_chunk_tokens
+        )
+        for i, chunk in enumerate(packed_chunks.items):
+            idx = len(packed_rules.items) + i + 1
+            lender = chunk.get("lender") or "Unknown"
+            filename = chunk.get("filename") or "Unknown"
+            context_parts.append(render_chunk(i + 1, chunk, chunk["content"]))
             citations.append({
                 "id": idx,
                 "lender": lender,
@@ -157,7 +192,8 @@ Example response format:
 Angel Oak requires minimum 660 FICO with 12-24 months statements [1], while Deephaven goes down to 620 FICO [3]."
 """
 
-        response = await self.client.chat.completions.create(
+        response = await llm_scheduler.chat_completion(
+            self.client,
             model=self.model,
             messages=[
                 {"role": "system", "content": system_prompt.format(context="\n".join(context_parts))},
@@ -173,27 +209,47 @@ Angel Oak requires minimum 660 FICO with 12-24 months statements [1], while Deep
             "citations": citations
         }
     
-    async def answer_eligibility_check(self, question: str, entities: dict | None = None) -> dict:
+    async def answer_eligibility_check(
+        self,
+        question: str,
+        entities: dict | None = None,
+        prefetched_chunks: list[dict] | None = None,
+        deadline: Deadline | None = None
+    ) -> dict:
         """
         Answer quick eligibility questions like:
         - Does any DSCR lender do 5 units?
         - Can I get a loan with 580 score?
         """
-        # Search for relevant chunks
-        chunks = await self._search_chunks(question, limit=8)
-        
-        # Also get relevant rules
-        rules = await self._search_rules_by_criteria(entities or {})
+        # Relevant chunks (unless already retrieved speculatively) and rules, concurrently
+        run = await Pipeline("eligibility_check", [
+            Stage(
+                "chunks",
+                lambda: self._retrieve_chunks(question, 8, None, prefetched_chunks),
+                timeout=settings.retrieval_timeout_seconds, optional=True, default=[]
+            ),
+            Stage("rules", lambda: self._search_rules_by_criteria(entities or {}), resource="db"),
+        ]).run(deadline=deadline)
+        chunks, rules = run["chunks"], run["rules"]
         
         # Format context with citations
         context_parts = []
         citations = []
         
-        for i, chunk in enumerate(chunks):
-            # Safely access document attributes
-            lender = getattr(chunk.document, 'lender', 'Unknown') if chunk.document else 'Unknown'
-            filename = getattr(chunk.document, 'filename', 'Unknown') if chunk.document else 'Unknown'
-            context_parts.append(f"[{i+1}] {lender} ({filename}): {chunk.content[:400]}")
+        def render_chunk(index: int, chunk: dict, content: str) -> str:
+            return f"[{index}] {chunk.get('lender') or 'Unknown'} ({chunk.get('filename') or 'Unknown'}): {content}"
+        
+        packed_chunks = pack_chunks(
+            chunks,
+            settings.qa_context_tokens,
+            render_chunk,
+            stage="eligibility_check",
+            max_item_tokens=settings.max_chunk_tokens
+        )
+        for i, chunk in enumerate(packed_chunks.items):
+            lender = chunk.get("lender") or "Unknown"
+            filename = chunk.get("filename") or "Unknown"
+            context_parts.append(render_chunk(i + 1, chunk, chunk["content"]))
             citations.append({
                 "id": i+1,
                 "lender": lender,
@@ -201,10 +257,16 @@ Angel Oak requires minimum 660 FICO with 12-24 months statements [1], while Deep
                 "type": "document"
             })
         
-        for i, rule in enumerate(rules[:5]):
-            idx = len(chunks) + i + 1
-            context_parts.append(f"[{idx}] {rule.lender} - {rule.program or 'Standard'}: "
-                               f"FICO {rule.fico_min or 'N/A'}-{rule.fico_max or 'N/A'}, LTV max {rule.ltv_max or 'N/A'}%")
+        packed_rules = pack_lines(
+            [f"{rule.lender} - {rule.program or 'Standard'}: "
+             f"FICO {rule.fico_min or 'N/A'}-{rule.fico_max or 'N/A'}, LTV max {rule.ltv_max or 'N/A'}%"
+             for rule in rules],
+            settings.rules_context_tokens,
+            stage="eligibility_check_rules"
+        )
+        for i, (rule, line) in enumerate(zip(rules, packed_rules.items)):
+            idx = len(packed_chunks.items) + i + 1
+            context_parts.append(f"[{idx}] {line['content']}")
             citations.append({
                 "id": idx,
                 "lender": rule.lender,
@@ -250,7 +312,8 @@ Based on the guidelines, **Angel Oak** [1] allows up to 10 units with minimum 1.
 and **Deephaven** [3] goes up to 8 units. Note that LTV requirements are typically lower (65-70%) for larger properties [1][3]."
 """
 
-        response = await self.client.chat.completions.create(
+        response = await llm_scheduler.chat_completion(
+            self.client,
             model=self.model,
             messages=[
                 {"role": "system", "content": system_prompt.format(context="\n".join(context_parts))},
@@ -317,31 +380,41 @@ and **Deephaven** [3] goes up to 8 units. Note that LTV requirements are typical
         result = await self.db.execute(query)
         return list(result.scalars().all())
     
+    async def _retrieve_chunks(
+        self,
+        question: str,
+        limit: int,
+        lender_filter: str | None,
+        prefetched_chunks: list[dict] | None
+    ) -> list[dict]:
+        """Prefetched chunks if the caller has them, otherwise search."""
+        if prefetched_chunks is not None:
+            return prefetched_chunks
+        if lender_filter:
+            return await self._search_chunks(question, limit=limit, lender_filter=lender_filter)
+        return await self._search_chunks(question, limit=limit)
+    
     async def _search_chunks(
         self, 
         query: str, 
         limit: int = 5,
         lender_filter: str | None = None
-    ) -> list[Chunk]:
+    ) -> list[dict]:
         """
-        Search chunks by text (simplified - would use vector search in production).
+        Search chunks relevant to the question (hybrid vector + full-text ranking).
+        
+        Returns the joined chunk/document projection from RetrievalService:
+        id, content, section_path, document_id, filename, lender, scores.
         
         NOTE: lender_filter is only used for PRODUCT_SEARCH follow-ups,
         NOT for ELIGIBILITY_CHECK (which always searches all lenders).
         """
-        from sqlalchemy.orm import selectinload
-        
-        stmt = select(Chunk).options(selectinload(Chunk.document))
-        
-        if lender_filter:
-            # Filter by lender via join with Document
-            stmt = stmt.join(Chunk.document).where(
-                Document.lender.ilike(f"%{lender_filter}%")
-            )
-        
-        stmt = stmt.limit(limit)
-        result = await self.db.execute(stmt)
-        return list(result.scalars().all())
+        return await self.retrieval.search(
+            query,
+            top_k=limit,
+            lender=lender_filter,
+            lender_match="contains"
+        )
     
     async def _search_rules_by_criteria(self, criteria: dict) -> list[Rule]:
         """Search rules matching criteria."""
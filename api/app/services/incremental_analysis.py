@@ -0,0 +1,106 @@
+"""
+Incremental Analysis - Re-run only the specialists a fact change affects
+
+LOs usually tweak one fact at a time ("what if LTV is 75?"). The full
+analysis of a turn is kept on the conversation (analysis_state): the
+scenario, the Leader's candidates, each lender's specialist result and
+the lender's corpus generation. On the next full analysis:
+1. If too many facts changed, or any non-numeric one (state, purpose,
+   occupancy, property/doc type, credit events gate which lenders the
+   Leader picks), everything runs from scratch
+2. Otherwise the Leader's candidates are reused, and a lender's
+   specialist re-runs only when the change moves its canonical scenario
+   (specialist_cache.canonical_scenario: a different bracket between the
+   lender's own rule thresholds), its corpus changed, or it has no
+   usable result
+"""
+from app.config import settings
+from app.services.specialist_cache import NUMERIC_FIELDS, SCENARIO_FIELDS, canonical_scenario, specialist_cache
+
+
+class IncrementalAnalysis:
+    """Plans which specialists to re-run against the previous turn's analysis."""
+
+    def __init__(self):
+        self.reset_stats()
+
+    def changed_fields(self, previous: dict, scenario: dict) -> list[str]:
+        before = previous.get("scenario", {})
+        return [field for field in SCENARIO_FIELDS if before.get(field) != scenario.get(field)]
+
+    async def plan(self, previous: dict | None, scenario: dict, rules_by_lender: dict[str, list]) -> dict | None:
+        """
+        Returns {"leader": previous Leader result, "rerun": [lender, ...],
+        "reused": {lender: result}}, or None to run the full analysis.
+        rules_by_lender holds the active rules of the previous candidates.
+        """
+        if not settings.incremental_analysis_enabled or not previous or not previous.get("leader"):
+            return None
+        changed = self.changed_fields(previous, scenario)
+        if len(changed) > settings.incremental_max_changed_fields:
+            return None
+        if any(field not in NUMERIC_FIELDS for field in changed):
+            # The Leader's candidates only hold for the same enum facts
+            return None
+
+        before = previous["scenario"]
+        results = previous.get("results", {})
+        generations = previous.get("generations", {})
+        rerun, reused = [], {}
+        for candidate in previous["leader"].get("top_candidates", []):
+            lender = candidate.get("lender") if isinstance(candidate, dict) else candidate
+            if not lender:
+                continue
+            rules = rules_by_lender.get(lender, [])
+            unchanged = (
+                lender in results
+                and generations.get(lender) == await specialist_cache.generation(lender)
+                and canonical_scenario(before, rules) == canonical_scenario(scenario, rules)
+            )
+            if unchanged:
+                reused[lender] = results[lender]
+            else:
+                rerun.append(lender)
+
+        self.incremental_runs += 1
+        self.specialists_rerun += len(rerun)
+        self.specialists_reused += len(reused)
+        return {"leader": previous["leader"], "rerun": rerun, "reused": reused}
+
+    async def snapshot(self, scenario: dict, leader_result: dict, results: list[dict]) -> dict:
+        """State to keep on the conversation after a full analysis."""
+        by_lender = {r["lender"]: r for r in results if r.get("lender")}
+        return {
+            "scenario": {field: scenario.get(field) for field in SCENARIO_FIELDS},
+            "leader": {
+                "understanding": leader_result.get("understanding", ""),
+                "top_candidates": leader_result.get("top_candidates", []),
+                "sources": leader_result.get("sources", [])
+            },
+            "results": by_lender,
+            "generations": {lender: await specialist_cache.generation(lender) for lender in by_lender}
+        }
+
+    def record_full_run(self) -> None:
+        self.full_runs += 1
+
+    def reset_stats(self) -> None:
+        self.full_runs = 0
+        self.incremental_runs = 0
+        self.specialists_rerun = 0
+        self.specialists_reused = 0
+
+    def stats(self) -> dict:
+        """Counters for the admin metrics endpoint."""
+        specialists = self.specialists_rerun + self.specialists_reused
+        return {
+            "full_runs": self.full_runs,
+            "incremental_runs": self.incremental_runs,
+            "specialists_rerun": self.specialists_rerun,
+            "specialists_reused": self.specialists_reused,
+            "reuse_rate": round(self.specialists_reused / specialists, 3) if specialists else 0.0
+        }
+
+
+# Process-wide planner and counters
+incremental_analysis = IncrementalAnalysis()
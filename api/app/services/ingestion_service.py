@@ -4,11 +4,13 @@ import fitz  # PyMuPDF
 import io
 import re
 import json
-from openai import AsyncOpenAI
 
 from app.models.document import Document, Chunk, Rule, DocumentStatus
 from app.services.retrieval_service import RetrievalService
 from app.config import settings
+from app.llm_client import get_openai_client
+from app.services.llm_cache import llm_cache
+from app.services.llm_scheduler import Priority
 
 
 # Known lenders for better matching
@@ -244,11 +246,13 @@ class IngestionService:
         Returns: {"lender": str, "program": str | None, "confidence": str}
         """
         try:
-            client = AsyncOpenAI(api_key=settings.openai_api_key)
+            client = get_openai_client()
             
             known_lenders_str = ", ".join(KNOWN_LENDERS)
             
-            response = await client.chat.completions.create(
+            result_text = await llm_cache.complete(
+                client,
+                Priority.INGESTION,
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -281,7 +285,7 @@ Return JSON only: {{"lender": "Lender Name", "program": "Program Name or null"}}
                 max_tokens=100
             )
             
-            result_text = response.choices[0].message.content.strip()
+            result_text = result_text.strip()
             
             # Parse JSON response
             if result_text.startswith("```"):
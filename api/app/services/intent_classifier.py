@@ -2,8 +2,16 @@
 Intent Classifier - Determines the type of user question/input
 """
 from openai import AsyncOpenAI
+import asyncio
 import json
+import random
 from app.config import settings
+from app.llm_client import get_openai_client
+from app.services.deadline import current_deadline
+from app.services.llm_cache import llm_cache
+from app.services.llm_service import FACT_FIELDS_GUIDE, FACT_MAPPING_GUIDE, build_field_context
+from app.services.fact_parser import parse_facts
+from app.services.local_intent_classifier import local_intent_classifier
 
 
 class IntentType:
@@ -16,38 +24,7 @@ class IntentType:
     SUMMARY_REQUEST = "summary_request"        # "Summarize what you know", "What info do you have?"
 
 
-class IntentClassifier:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
-        self.model = settings.openai_model
-    
-    async def classify(
-        self, 
-        message: str, 
-        last_question: str | None = None,
-        current_facts: dict | None = None
-    ) -> dict:
-        """
-        Classify the user's message intent.
-        
-        Returns:
-            {
-                "intent": "general_question|product_search|eligibility_check|scenario_input|follow_up",
-                "confidence": 0.0-1.0,
-                "extracted_entities": {...}  # Any entities found in the message
-            }
-        """
-        context = ""
-        if last_question:
-            context += f"\nLast system question: {last_question}"
-        if current_facts:
-            context += f"\nKnown facts about scenario: {json.dumps(current_facts)}"
-        
-        system_prompt = """You are an intent classifier for a mortgage lending assistant.
-
-Classify the user's message into one of these intents:
-
-1. **general_question** - Questions about the system, available lenders, or general mortgage concepts
+INTENT_DEFINITIONS = """1. **general_question** - Questions about the system, available lenders, or general mortgage concepts
    Examples: "How many lenders do you have?", "What products are available?", "What is LTV?"
 
 2. **product_search** - Looking for specific product types or lender capabilities
@@ -64,17 +41,10 @@ Classify the user's message into one of these intents:
    IMPORTANT: If there was a previous question and the answer is short/direct, this is likely follow_up.
 
 6. **summary_request** - Asking for a summary of current information or what's missing
-   Examples: "Summarize what you know", "What info do you have?", "What am I missing?", "Show me the client profile", "What information have I provided?"
-
-Also extract any mortgage-related entities found in the message.
-{context}
+   Examples: "Summarize what you know", "What info do you have?", "What am I missing?", "Show me the client profile", "What information have I provided?\""""
 
-Respond with JSON:
-{{
-    "intent": "<intent_type>",
-    "confidence": <0.0-1.0>,
-    "reasoning": "<brief explanation>",
-    "extracted_entities": {{
+# Schema of "extracted_entities" in both classification prompts
+ENTITIES_SCHEMA = """{
         "fico": <number or null>,
         "state": "<string or null>",
         "loan_purpose": "<string or null>",
@@ -84,13 +54,102 @@ Respond with JSON:
         "doc_type": "<string or null>",
         "product_type_asked": "<string or null>",
         "lender_asked": "<string or null>"
-    }}
+    }"""
+
+CLASSIFY_SYSTEM_PROMPT = """You are an intent classifier for a mortgage lending assistant.
+
+Classify the user's message into one of these intents:
+
+{intents}
+
+Also extract any mortgage-related entities found in the message.
+{context}
+
+Respond with JSON:
+{{
+    "intent": "<intent_type>",
+    "confidence": <0.0-1.0>,
+    "reasoning": "<brief explanation>",
+    "extracted_entities": {entities}
+}}"""
+
+UNDERSTAND_SYSTEM_PROMPT = """You are the message-understanding stage of a mortgage lending assistant.
+In one pass, classify the user's message and extract the loan scenario facts it contains.
+
+Classify the user's message into one of these intents:
+
+{intents}
+
+Also extract any mortgage-related entities found in the message ("extracted_entities").
+{context}
+
+Then extract scenario facts ("facts") for the loan scenario.
+{fact_fields}
+{field_context}
+{mapping_guide}
+
+"facts" contains ONLY the newly extracted fields (an empty object if none),
+with lowercase values and underscores for multi-word values.
+
+Respond with JSON:
+{{
+    "intent": "<intent_type>",
+    "confidence": <0.0-1.0>,
+    "reasoning": "<brief explanation>",
+    "extracted_entities": {entities},
+    "facts": {{"<field>": <value>}}
 }}"""
 
-        response = await self.client.chat.completions.create(
+
+# Keep references to in-flight shadow comparisons until they finish
+_shadow_tasks: set[asyncio.Task] = set()
+
+
+class IntentClassifier:
+    def __init__(self, client: AsyncOpenAI | None = None):
+        self.client = client or get_openai_client()
+        self.model = settings.openai_model
+    
+    async def classify(
+        self, 
+        message: str, 
+        last_question: str | None = None,
+        current_facts: dict | None = None,
+        last_question_field: str | None = None
+    ) -> dict:
+        """
+        Classify the user's message intent.
+        Trivial messages are answered by local rules; the rest go to the LLM.
+        
+        Returns:
+            {
+                "intent": "general_question|product_search|eligibility_check|scenario_input|follow_up",
+                "confidence": 0.0-1.0,
+                "extracted_entities": {...}  # Any entities found in the message
+            }
+        """
+        local = self._classify_locally(message, last_question, current_facts, last_question_field)
+        if local is not None:
+            return local
+        
+        return await self._classify_llm(message, last_question, current_facts)
+    
+    async def _classify_llm(
+        self,
+        message: str,
+        last_question: str | None = None,
+        current_facts: dict | None = None
+    ) -> dict:
+        """Classify with the LLM (no local fast path)."""
+        content = await llm_cache.complete(
+            self.client,
             model=self.model,
             messages=[
-                {"role": "system", "content": system_prompt.format(context=context)},
+                {"role": "system", "content": CLASSIFY_SYSTEM_PROMPT.format(
+                    intents=INTENT_DEFINITIONS,
+                    entities=ENTITIES_SCHEMA,
+                    context=self._build_context(last_question, current_facts)
+                )},
                 {"role": "user", "content": message}
             ],
             response_format={"type": "json_object"},
@@ -98,7 +157,7 @@ Respond with JSON:
         )
         
         try:
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(content)
             return result
         except json.JSONDecodeError:
             return {
@@ -106,3 +165,101 @@ Respond with JSON:
                 "confidence": 0.5,
                 "extracted_entities": {}
             }
+    
+    async def understand(
+        self,
+        message: str,
+        last_question: str | None = None,
+        current_facts: dict | None = None,
+        last_question_field: str | None = None
+    ) -> dict:
+        """
+        Classify the message AND extract normalized scenario facts in one call.
+        
+        Same result as classify() plus "facts" (what LLMService.extract_facts
+        would return), so scenario turns need a single LLM round trip.
+        Local rule hits need none.
+        """
+        local = self._classify_locally(message, last_question, current_facts, last_question_field)
+        if local is not None:
+            return {**local, "facts": dict(local["extracted_entities"])}
+        
+        content = await llm_cache.complete(
+            self.client,
+            model=self.model,
+            messages=[
+                {"role": "system", "content": UNDERSTAND_SYSTEM_PROMPT.format(
+                    intents=INTENT_DEFINITIONS,
+                    entities=ENTITIES_SCHEMA,
+                    context=self._build_context(last_question, current_facts),
+                    fact_fields=FACT_FIELDS_GUIDE,
+                    field_context=build_field_context(last_question_field),
+                    mapping_guide=FACT_MAPPING_GUIDE
+                )},
+                {"role": "user", "content": message}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0
+        )
+        
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError:
+            return {
+                "intent": IntentType.SCENARIO_INPUT,
+                "confidence": 0.5,
+                "extracted_entities": {},
+                "facts": {}
+            }
+        
+        if not isinstance(result.get("facts"), dict):
+            result["facts"] = {}
+        if settings.local_fact_parser_enabled:
+            # Deterministic values fill in whatever the LLM left out
+            result["facts"] = {**parse_facts(message, last_question_field), **result["facts"]}
+        return result
+    
+    def _classify_locally(
+        self,
+        message: str,
+        last_question: str | None,
+        current_facts: dict | None,
+        last_question_field: str | None
+    ) -> dict | None:
+        """Local rule-based result, or None when the message needs the LLM."""
+        if not settings.local_intent_enabled:
+            return None
+        
+        result = local_intent_classifier.classify(message, last_question_field)
+        if result is not None and random.random() < settings.local_intent_shadow_rate:
+            # Sampled shadow call to measure how often the rules agree with the LLM
+            task = asyncio.ensure_future(
+                self._shadow_compare(result, message, last_question, current_facts)
+            )
+            _shadow_tasks.add(task)
+            task.add_done_callback(_shadow_tasks.discard)
+        return result
+    
+    async def _shadow_compare(
+        self,
+        local: dict,
+        message: str,
+        last_question: str | None,
+        current_facts: dict | None
+    ) -> None:
+        # Off the request path: the turn's deadline does not apply
+        current_deadline.set(None)
+        try:
+            llm_result = await self._classify_llm(message, last_question, current_facts)
+            local_intent_classifier.record_agreement(local["rule"], local["intent"], llm_result.get("intent"))
+        except Exception as e:
+            print(f"IntentClassifier shadow comparison error: {e}")
+    
+    def _build_context(self, last_question: str | None, current_facts: dict | None) -> str:
+        """Conversation context appended to the classification prompt."""
+        context = ""
+        if last_question:
+            context += f"\nLast system question: {last_question}"
+        if current_facts:
+            context += f"\nKnown facts about scenario: {json.dumps(current_facts)}"
+        return context
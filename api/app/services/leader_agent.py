@@ -1,7 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from openai import AsyncOpenAI
 
+from app.config import settings
 from app.services.agent_service import BaseAgent
 from app.services.retrieval_service import RetrievalService
+from app.services.rules_service import RulesService, format_rule, rule_covers
+from app.services.prompt_packer import pack_chunks
+
+
+# Per-excerpt cap for the leader's lender overview
+LEADER_MAX_CHUNK_TOKENS = 120
+# Lenders handed to the specialists
+MAX_CANDIDATES = 5
 
 
 LEADER_SYSTEM_PROMPT = """You are the Lead Analyst for mortgage eligibility at Owly.
@@ -41,31 +51,79 @@ class LeaderAgent(BaseAgent):
     """
     Leader Agent - Pre-filters lenders based on scenario.
     Returns top 3-5 candidates for specialist analysis.
+    
+    Candidates come from the structured rules (RulesService.rank_lenders)
+    when they cover the scenario; the LLM triage over retrieved excerpts
+    runs only when rule coverage is too thin.
     """
     
-    def __init__(self, db: AsyncSession, available_lenders: list[str]):
+    def __init__(self, db: AsyncSession, available_lenders: list[str], client: AsyncOpenAI | None = None):
         self.db = db
-        self.retrieval = RetrievalService(db)
+        self.retrieval = RetrievalService(db, client=client)
+        self.rules = RulesService(db)
         self.available_lenders = available_lenders
         
         system_prompt = LEADER_SYSTEM_PROMPT.format(
             available_lenders=", ".join(available_lenders)
         )
-        super().__init__("Leader", system_prompt)
+        super().__init__("Leader", system_prompt, client=client)
     
     async def analyze(self, scenario: dict, context: dict | None = None) -> dict:
         """
         Analyze scenario and return top candidate lenders with citations.
         """
+        if settings.leader_rules_prefilter:
+            result = await self._rules_triage(scenario)
+            if result is not None:
+                return result
+        return await self._llm_triage(scenario)
+    
+    async def _rules_triage(self, scenario: dict) -> dict | None:
+        """
+        Pick candidates from matching rules, or None when fewer than
+        settings.leader_min_rule_candidates lenders have a best rule (the
+        one cited) covering the scenario's doc type, occupancy and purpose.
+        """
+        ranked = await self.rules.rank_lenders(scenario, self.available_lenders)
+        covered = [entry for entry in ranked if rule_covers(entry["rules"][0], scenario)]
+        needed = min(settings.leader_min_rule_candidates, len(self.available_lenders))
+        if not covered or len(covered) < needed:
+            return None
+        
+        candidates, sources = [], []
+        for source_id, entry in enumerate(covered[:MAX_CANDIDATES], start=1):
+            summary = format_rule(entry["rules"][0])
+            reason = f"{summary} [{source_id}]"
+            if len(entry["rules"]) > 1:
+                reason += f" (+{len(entry['rules']) - 1} more matching programs)"
+            candidates.append({"lender": entry["lender"], "reason": reason})
+            sources.append({
+                "id": source_id,
+                "lender": entry["lender"],
+                "filename": entry["filename"],
+                "content_preview": summary[:100]
+            })
+        
+        profile = "; ".join(line[2:] for line in self._format_scenario(scenario).splitlines() if line.startswith("- "))
+        return {
+            "understanding": f"Looking for programs matching: {profile}" if profile else "",
+            "top_candidates": candidates,
+            "reasoning": f"{len(covered)} lenders have eligibility rules matching this scenario; ranked by rule fit",
+            "sources": sources,
+            "method": "rules"
+        }
+    
+    async def _llm_triage(self, scenario: dict) -> dict:
+        """Let the LLM pick candidates from retrieved excerpts."""
         try:
             # Get some context from RAG to help decision
             query = self._build_query(scenario)
-            chunks = await self.retrieval.search(query, top_k=10)
+            chunks = await self.retrieval.search(query, top_k=settings.leader_top_k)
         except Exception as e:
             # If retrieval fails, return fallback with all lenders
             return {
                 "understanding": "Could not search documents",
-                "top_candidates": [{"lender": l, "reason": "Included for analysis"} for l in self.available_lenders[:5]],
+                "top_candidates": [{"lender": l, "reason": "Included for analysis"} for l in self.available_lenders[:MAX_CANDIDATES]],
                 "reasoning": f"Fallback due to retrieval error: {str(e)}",
                 "sources": [],
                 "error": str(e)
@@ -75,7 +133,16 @@ class LeaderAgent(BaseAgent):
         lender_mentions = {}
         sources = []
         
-        for i, chunk in enumerate(chunks):
+        # Breadth over depth: many short excerpts so every lender gets a mention
+        packed = pack_chunks(
+            chunks,
+            settings.leader_context_tokens,
+            lambda index, chunk, content: f"{chunk.get('lender', 'Unknown')}:\n  - [{index}] {content}...",
+            stage="leader",
+            max_item_tokens=LEADER_MAX_CHUNK_TOKENS
+        )
+        
+        for i, chunk in enumerate(packed.items):
             lender = chunk.get("lender", "Unknown")
             source_id = i + 1
             
@@ -91,7 +158,7 @@ class LeaderAgent(BaseAgent):
                 lender_mentions[lender] = []
             lender_mentions[lender].append({
                 "source_id": source_id,
-                "content": chunk["content"][:200]
+                "content": chunk["content"]
             })
         
         # Build user prompt with source IDs
@@ -117,7 +184,7 @@ Return the top 3-5 most promising candidates with citations."""
         if "error" in result:
             return {
                 "understanding": "Could not analyze - using all lenders",
-                "top_candidates": [{"lender": l, "reason": "Included for analysis"} for l in self.available_lenders[:5]],
+                "top_candidates": [{"lender": l, "reason": "Included for analysis"} for l in self.available_lenders[:MAX_CANDIDATES]],
                 "reasoning": "Fallback due to error",
                 "sources": sources,
                 "error": result["error"]
@@ -133,8 +200,9 @@ Return the top 3-5 most promising candidates with citations."""
                         valid_candidates.append(candidate)
                     else:
                         valid_candidates.append({"lender": candidate, "reason": ""})
-            result["top_candidates"] = valid_candidates[:5]
+            result["top_candidates"] = valid_candidates[:MAX_CANDIDATES]
         
+        result["method"] = "llm"
         return result
     
     def _format_lender_mentions_with_ids(self, mentions: dict) -> str:
@@ -145,7 +213,7 @@ Return the top 3-5 most promising candidates with citations."""
         lines = []
         for lender, items in mentions.items():
             lines.append(f"\n{lender}:")
-            for item in items[:2]:
+            for item in items:
                 lines.append(f"  - [{item['source_id']}] {item['content']}...")
         
         return "\n".join(lines)
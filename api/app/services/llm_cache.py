@@ -0,0 +1,172 @@
+"""
+LLM Cache - Response cache for deterministic (temperature 0) completions
+
+Intent classification, fact extraction and lender detection see the same
+prompts over and over (short follow-up answers, re-uploaded filenames).
+Lookups go:
+1. In-process LRU with TTL (bounded by settings.llm_cache_size)
+2. Redis (shared across workers, expires after llm_cache_ttl_seconds)
+3. Miss - one API call per key; identical concurrent requests wait on it,
+   and it is cancelled once every one of them has been cancelled
+"""
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import time
+
+from openai import AsyncOpenAI
+
+from app.config import settings
+from app.redis_client import get_redis, mark_redis_unavailable
+from app.services.deadline import current_deadline
+from app.services.llm_scheduler import llm_scheduler, Priority
+
+
+class LLMCache:
+    """LRU + Redis cache of completion text keyed by model and request hash."""
+
+    def __init__(self, max_size: int | None = None, ttl_seconds: int | None = None):
+        self.max_size = max_size if max_size is not None else settings.llm_cache_size
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.llm_cache_ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def key(self, request: dict) -> str:
+        """Build the cache key: model + hash of the full request (messages, format, limits)."""
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        return f"owly:llm:{request.get('model')}:{digest}"
+
+    async def complete(self, client: AsyncOpenAI, priority: Priority = Priority.INTERACTIVE, **request) -> str:
+        """
+        Run chat.completions.create(**request) through llm_scheduler and
+        return the message content. Only temperature-0 requests are cached;
+        priority only orders the call and is not part of the key.
+        """
+        if not settings.llm_cache_enabled or request.get("temperature") != 0:
+            return await self._call(client, request, priority)
+
+        key = self.key(request)
+        content = await self.get(key)
+        if content is not None:
+            return content
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fill(client, key, request, priority))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # A cancelled caller must not cancel the call other callers are waiting on
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                # Nobody is left to read the answer
+                if not task.done():
+                    task.cancel()
+
+    async def _call(self, client: AsyncOpenAI, request: dict, priority: Priority) -> str:
+        response = await llm_scheduler.chat_completion(client, priority, **request)
+        return response.choices[0].message.content
+
+    async def _fill(self, client: AsyncOpenAI, key: str, request: dict, priority: Priority) -> str:
+        # Shared by every caller of the key: not bound to the first caller's deadline
+        current_deadline.set(None)
+        content = await self._call(client, request, priority)
+        if self._is_cacheable(content, request):
+            await self.set(key, content)
+        return content
+
+    def _is_cacheable(self, content: str | None, request: dict) -> bool:
+        """Never cache empty or (for JSON mode) unparseable responses."""
+        if not content:
+            return False
+        if request.get("response_format", {}).get("type") == "json_object":
+            try:
+                json.loads(content)
+            except json.JSONDecodeError:
+                return False
+        return True
+
+    async def get(self, key: str) -> str | None:
+        """Return the cached completion for key, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, content = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return content
+            del self._entries[key]
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(key)
+            except Exception as e:
+                mark_redis_unavailable(e)
+                raw = None
+            if raw:
+                content = raw.decode("utf-8")
+                self._remember(key, content)
+                self.redis_hits += 1
+                return content
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, content: str) -> None:
+        """Store a completion in both tiers."""
+        self._remember(key, content)
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(key, content.encode("utf-8"), ex=self.ttl_seconds)
+            except Exception as e:
+                mark_redis_unavailable(e)
+
+    def _remember(self, key: str, content: str) -> None:
+        """Insert into the LRU, evicting the least recently used entries."""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop the in-process tier and reset counters."""
+        self._entries.clear()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the admin metrics endpoint."""
+        hits = self.memory_hits + self.redis_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+
+# Process-wide cache shared by every service instance
+llm_cache = LLMCache()
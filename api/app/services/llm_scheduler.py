@@ -0,0 +1,299 @@
+"""
+LLM Scheduler - Shared rate limits and priorities for OpenAI calls
+
+Chat turns, evaluator prose, ingestion lender detection and bulk
+embedding all draw on the same per-model RPM/TPM quota. Every call goes
+through llm_scheduler:
+1. Token buckets per model (requests/min and tokens/min from
+   settings.llm_rate_limits), kept in Redis so all workers share them;
+   in-process buckets when Redis is unavailable
+2. One queue per model ordered by priority (INTERACTIVE > EVALUATOR >
+   INGESTION), so an upload waits behind chat instead of starving it
+3. Retries with jittered exponential backoff on 429, 5xx and connection
+   errors, re-queuing each attempt
+4. Inside a chat request (current_deadline), queueing plus the call is
+   bounded by the time left, and no retry starts after the deadline
+Queue depth and wait times are exposed for the admin metrics endpoint.
+"""
+from collections import defaultdict
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, TypeVar
+import asyncio
+import heapq
+import itertools
+import time
+
+import openai
+from openai import AsyncOpenAI
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_any, stop_after_attempt, wait_random_exponential
+
+from app.config import settings
+from app.redis_client import get_redis, mark_redis_unavailable
+from app.services.deadline import current_deadline
+from app.services.token_counter import count_tokens
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Lower value is served first."""
+    INTERACTIVE = 0
+    EVALUATOR = 1
+    INGESTION = 2
+
+
+RETRYABLE_LLM_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,  # Includes APITimeoutError
+    openai.InternalServerError,
+)
+
+RETRY_WAIT = wait_random_exponential(multiplier=0.5, max=20)
+
+# Completion tokens reserved when a request sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 500
+# Per-message formatting overhead in chat prompts
+MESSAGE_OVERHEAD_TOKENS = 4
+# Longest sleep before the queue head is re-checked (a higher priority
+# request may have arrived)
+MAX_POLL_SECONDS = 0.25
+
+# Refills both buckets from elapsed time (Redis clock), then either takes
+# one request + `cost` tokens and returns 0, or returns the seconds to wait.
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local cost = math.min(tonumber(ARGV[3]), tpm)
+local state = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts')
+local req = tonumber(state[1]) or rpm
+local tok = tonumber(state[2]) or tpm
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+req = math.min(rpm, req + elapsed * rpm / 60)
+tok = math.min(tpm, tok + elapsed * tpm / 60)
+local wait = 0
+if req < 1 then wait = math.max(wait, (1 - req) * 60 / rpm) end
+if tok < cost then wait = math.max(wait, (cost - tok) * 60 / tpm) end
+if wait == 0 then
+  req = req - 1
+  tok = tok - cost
+end
+redis.call('HSET', KEYS[1], 'req', req, 'tok', tok, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 120)
+return tostring(wait)
+"""
+
+
+class RateLimiter:
+    """Per-model RPM/TPM token buckets in Redis, or in-process as a fallback."""
+
+    def __init__(self):
+        # model -> [requests, tokens, last refill]
+        self._local: dict[str, list[float]] = {}
+
+    async def reserve(self, model: str, tokens: int, limits: dict) -> float:
+        """Take one request and `tokens` tokens; returns 0, or the seconds to wait."""
+        redis = get_redis()
+        if redis is not None:
+            try:
+                wait = await redis.eval(
+                    TOKEN_BUCKET_SCRIPT, 1, f"owly:ratelimit:{model}",
+                    limits["rpm"], limits["tpm"], tokens
+                )
+                return float(wait)
+            except Exception as e:
+                mark_redis_unavailable(e)
+        return self._reserve_local(model, tokens, limits)
+
+    def _reserve_local(self, model: str, tokens: int, limits: dict) -> float:
+        rpm, tpm = limits["rpm"], limits["tpm"]
+        now = time.monotonic()
+        requests, available, last = self._local.get(model, (rpm, tpm, now))
+
+        elapsed = now - last
+        requests = min(rpm, requests + elapsed * rpm / 60)
+        available = min(tpm, available + elapsed * tpm / 60)
+        cost = min(tokens, tpm)
+
+        wait = 0.0
+        if requests < 1:
+            wait = max(wait, (1 - requests) * 60 / rpm)
+        if available < cost:
+            wait = max(wait, (cost - available) * 60 / tpm)
+        if wait == 0:
+            requests -= 1
+            available -= cost
+
+        self._local[model] = [requests, available, now]
+        return wait
+
+
+class LLMScheduler:
+    """Priority queue per model in front of the shared rate limiter."""
+
+    def __init__(self, limiter: RateLimiter | None = None):
+        self.limiter = limiter or RateLimiter()
+        self._queues: dict[str, list] = defaultdict(list)
+        self._dispatchers: dict[str, asyncio.Task] = {}
+        self._seq = itertools.count()
+        self.reset_stats()
+
+    async def chat_completion(
+        self,
+        client: AsyncOpenAI,
+        priority: Priority = Priority.INTERACTIVE,
+        **request: Any
+    ):
+        """client.chat.completions.create(**request), scheduled and retried."""
+        tokens = sum(
+            count_tokens(str(message.get("content") or "")) + MESSAGE_OVERHEAD_TOKENS
+            for message in request.get("messages", [])
+        ) + (request.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+        return await self.call(
+            lambda: client.chat.completions.create(**request),
+            model=request["model"],
+            tokens=tokens,
+            priority=priority
+        )
+
+    async def embeddings(
+        self,
+        client: AsyncOpenAI,
+        priority: Priority = Priority.INTERACTIVE,
+        max_attempts: int | None = None,
+        wait: Any = None,
+        **request: Any
+    ):
+        """client.embeddings.create(**request), scheduled and retried."""
+        inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+        return await self.call(
+            lambda: client.embeddings.create(**request),
+            model=request["model"],
+            tokens=sum(count_tokens(text) for text in inputs),
+            priority=priority,
+            max_attempts=max_attempts,
+            wait=wait
+        )
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        model: str,
+        tokens: int,
+        priority: Priority,
+        max_attempts: int | None = None,
+        wait: Any = None
+    ) -> T:
+        """
+        Run fn once a slot is granted; retry transient errors, re-queuing each attempt.
+        Raises asyncio.TimeoutError when the request deadline runs out first.
+        """
+        deadline = current_deadline.get()
+        stop = stop_after_attempt(max_attempts or settings.llm_max_attempts)
+        if deadline is not None:
+            stop = stop_any(stop, lambda _: deadline.expired())
+
+        async for attempt in AsyncRetrying(
+            retry=retry_if_exception_type(RETRYABLE_LLM_ERRORS),
+            stop=stop,
+            wait=wait or RETRY_WAIT,
+            before_sleep=self._record_retry,
+            reraise=True
+        ):
+            with attempt:
+                if deadline is None:
+                    result = await self._attempt(fn, model, tokens, priority)
+                else:
+                    try:
+                        result = await asyncio.wait_for(
+                            self._attempt(fn, model, tokens, priority), deadline.remaining()
+                        )
+                    except asyncio.TimeoutError:
+                        self.deadline_exceeded += 1
+                        raise
+        return result
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], model: str, tokens: int, priority: Priority) -> T:
+        await self.acquire(model, tokens, priority)
+        return await fn()
+
+    async def acquire(self, model: str, tokens: int, priority: Priority) -> None:
+        """Wait until this request may be sent (immediately if the model has no limits)."""
+        limits = settings.llm_rate_limits.get(model)
+        if not settings.llm_scheduler_enabled or not limits:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues[model], (priority, next(self._seq), tokens, future))
+        if model not in self._dispatchers:
+            self._dispatchers[model] = asyncio.ensure_future(self._dispatch(model, limits))
+
+        started = time.monotonic()
+        try:
+            await future
+        finally:
+            self._record_wait(priority, time.monotonic() - started)
+
+    async def _dispatch(self, model: str, limits: dict) -> None:
+        """Grant queued requests in priority order as the buckets allow."""
+        queue = self._queues[model]
+        try:
+            while queue:
+                _, _, tokens, future = queue[0]
+                if future.done():  # Caller gave up (cancelled)
+                    heapq.heappop(queue)
+                    continue
+
+                wait = await self.limiter.reserve(model, tokens, limits)
+                if wait <= 0:
+                    heapq.heappop(queue)
+                    if not future.done():
+                        future.set_result(None)
+                else:
+                    await asyncio.sleep(min(wait, MAX_POLL_SECONDS))
+        finally:
+            self._dispatchers.pop(model, None)
+
+    def _record_wait(self, priority: Priority, seconds: float) -> None:
+        entry = self._waits[priority.name.lower()]
+        entry["requests"] += 1
+        entry["total_ms"] += seconds * 1000
+        entry["max_ms"] = max(entry["max_ms"], seconds * 1000)
+
+    def _record_retry(self, retry_state) -> None:
+        self.retries += 1
+        if isinstance(retry_state.outcome.exception(), openai.RateLimitError):
+            self.rate_limited += 1
+
+    def reset_stats(self) -> None:
+        self._waits: dict[str, dict] = defaultdict(lambda: {"requests": 0, "total_ms": 0.0, "max_ms": 0.0})
+        self.retries = 0
+        self.rate_limited = 0
+        self.deadline_exceeded = 0
+
+    def stats(self) -> dict:
+        """Queue depth and wait times for the admin metrics endpoint."""
+        depth: dict[str, dict] = {}
+        for model, queue in self._queues.items():
+            waiting = [entry[0] for entry in queue if not entry[3].done()]
+            if waiting:
+                depth[model] = {p.name.lower(): waiting.count(p) for p in Priority if p in waiting}
+        return {
+            "queue_depth": depth,
+            "wait_ms": {
+                priority: {
+                    "requests": entry["requests"],
+                    "avg": round(entry["total_ms"] / entry["requests"], 1),
+                    "max": round(entry["max_ms"], 1)
+                }
+                for priority, entry in self._waits.items()
+            },
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "deadline_exceeded": self.deadline_exceeded
+        }
+
+
+# Process-wide scheduler shared by every service, agent and ingestion job
+llm_scheduler = LLMScheduler()
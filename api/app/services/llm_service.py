@@ -2,36 +2,17 @@ from openai import AsyncOpenAI
 import json
 
 from app.config import settings
+from app.llm_client import get_openai_client
+from app.services.llm_cache import llm_cache
+from app.services.llm_scheduler import llm_scheduler
+from app.services.fact_parser import parse_facts, unresolved_fields
+from app.services.prompt_packer import pack_chunks, pack_lines
 from app.models.document import Rule
 
 
-class LLMService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
-        self.model = settings.openai_model
-    
-    async def extract_facts(
-        self, 
-        message: str, 
-        current_facts: dict,
-        last_question_field: str | None = None
-    ) -> dict:
-        """
-        Extract scenario facts from user message.
-        Returns dict of extracted fields.
-        """
-        # Build context about what field we're asking for
-        field_context = ""
-        if last_question_field:
-            field_context = f"""
-IMPORTANT: The user was just asked about "{last_question_field}".
-If the user's message is a short answer (like "Single family", "California", "Purchase", etc.), 
-map it to the appropriate "{last_question_field}" field value.
-"""
-
-        system_prompt = """You are an assistant that extracts mortgage loan scenario information from user messages.
-
-Extract the following fields if mentioned:
+# Fact fields and normalized values, shared by extract_facts and the
+# combined understanding call in IntentClassifier
+FACT_FIELDS_GUIDE = """Extract the following fields if mentioned:
 - state: The US state where the property is located (e.g., "California" → "california", "CA" → "california")
 - loan_purpose: purchase, rate_term_refi, or cashout
 - occupancy: primary, second_home, or investment  
@@ -40,11 +21,9 @@ Extract the following fields if mentioned:
 - ltv: Loan-to-value percentage (number only, no %)
 - fico: Credit score (number, e.g., 740)
 - doc_type: full_doc (W-2, Full Doc), bank_statement (Bank Statement), dscr (DSCR, rental income), 1099, wvoe, asset_utilization, or other
-- credit_events: none (No, None, Clean), bankruptcy, foreclosure, short_sale, or late_payments
-{field_context}
-Current known facts: {current_facts}
+- credit_events: none (No, None, Clean), bankruptcy, foreclosure, short_sale, or late_payments"""
 
-MAPPING GUIDE for short answers:
+FACT_MAPPING_GUIDE = """MAPPING GUIDE for short answers:
 - "Single family", "SFR", "House", "Single-family home" → property_type: "sfr"
 - "Condo", "Condominium" → property_type: "condo"  
 - "Duplex", "2-unit", "Triplex", "3-unit", "Fourplex", "4-unit" → property_type: "2-4_unit"
@@ -55,18 +34,65 @@ MAPPING GUIDE for short answers:
 - "Cash out", "Cash-out refi" → loan_purpose: "cashout"
 - "W-2", "Full doc", "Tax returns" → doc_type: "full_doc"
 - "Bank statements", "Self-employed" → doc_type: "bank_statement"
-- "None", "No", "Clean credit" → credit_events: "none"
+- "None", "No", "Clean credit" → credit_events: "none\""""
+
+
+def build_field_context(last_question_field: str | None) -> str:
+    """Prompt hint for mapping a short answer to the field that was just asked."""
+    if not last_question_field:
+        return ""
+    return f"""
+IMPORTANT: The user was just asked about "{last_question_field}".
+If the user's message is a short answer (like "Single family", "California", "Purchase", etc.), 
+map it to the appropriate "{last_question_field}" field value.
+"""
+
+
+class LLMService:
+    def __init__(self, client: AsyncOpenAI | None = None):
+        self.client = client or get_openai_client()
+        self.model = settings.openai_model
+    
+    async def extract_facts(
+        self, 
+        message: str, 
+        current_facts: dict,
+        last_question_field: str | None = None
+    ) -> dict:
+        """
+        Extract scenario facts from user message.
+        Returns dict of extracted fields.
+        
+        The local parser runs first; the LLM is only called when the message
+        mentions a field the parser could not resolve (or nothing was parsed).
+        """
+        local_facts = {}
+        if settings.local_fact_parser_enabled:
+            local_facts = parse_facts(message, last_question_field)
+            if local_facts and not unresolved_fields(message, local_facts):
+                return local_facts
+        
+        system_prompt = """You are an assistant that extracts mortgage loan scenario information from user messages.
+
+{fact_fields}
+{field_context}
+Current known facts: {current_facts}
+
+{mapping_guide}
 
 Respond with a JSON object containing ONLY the newly extracted fields.
 If no new information is found, respond with an empty object {{}}.
 Use lowercase values and underscores for multi-word values."""
 
-        response = await self.client.chat.completions.create(
+        content = await llm_cache.complete(
+            self.client,
             model=self.model,
             messages=[
                 {"role": "system", "content": system_prompt.format(
+                    fact_fields=FACT_FIELDS_GUIDE,
+                    mapping_guide=FACT_MAPPING_GUIDE,
                     current_facts=json.dumps(current_facts),
-                    field_context=field_context
+                    field_context=build_field_context(last_question_field)
                 )},
                 {"role": "user", "content": message}
             ],
@@ -75,10 +101,10 @@ Use lowercase values and underscores for multi-word values."""
         )
         
         try:
-            extracted = json.loads(response.choices[0].message.content)
-            return extracted
+            extracted = json.loads(content)
         except json.JSONDecodeError:
-            return {}
+            return local_facts
+        return {**local_facts, **extracted}
     
     async def generate_eligibility_response(
         self,
@@ -89,10 +115,9 @@ Use lowercase values and underscores for multi-word values."""
         """
         Generate an eligibility response based on matched rules and retrieved content.
         """
-        # Format rules for the prompt
-        rules_text = ""
-        for i, rule in enumerate(rules[:5], 1):
-            rules_text += f"""
+        # Format rules for the prompt (whole rules, until the budget is spent)
+        rule_blocks = [
+            f"""
 {i}. {rule.lender} - {rule.program or 'Standard Program'}
    - FICO: {rule.fico_min or 'N/A'} - {rule.fico_max or 'N/A'}
    - Max LTV: {rule.ltv_max or 'N/A'}%
@@ -101,12 +126,20 @@ Use lowercase values and underscores for multi-word values."""
    - Doc Types: {', '.join(rule.doc_types) if rule.doc_types else 'All'}
    - Notes: {rule.notes or 'None'}
 """
+            for i, rule in enumerate(rules, 1)
+        ]
+        rules_text = "".join(
+            item["content"] for item in pack_lines(rule_blocks, settings.rules_context_tokens, stage="eligibility_rules").items
+        )
         
         # Format chunks for context
-        context_text = "\n\n".join([
-            f"[{c['lender']} - {c['filename']}]\n{c['content'][:500]}"
-            for c in chunks[:5]
-        ])
+        context_text = pack_chunks(
+            chunks,
+            settings.qa_context_tokens,
+            lambda index, c, content: f"[{c['lender']} - {c['filename']}]\n{content}\n",
+            stage="eligibility_response",
+            max_item_tokens=settings.max_chunk_tokens
+        ).text
         
         system_prompt = """You are Owly, an AI assistant helping Loan Officers find eligible mortgage programs.
 
@@ -129,7 +162,8 @@ Additional Context:
 
 Provide the eligibility assessment:"""
 
-        response = await self.client.chat.completions.create(
+        response = await llm_scheduler.chat_completion(
+            self.client,
             model=self.model,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -0,0 +1,115 @@
+"""
+Local Intent Classifier - Rule-based fast path in front of the LLM classifier
+
+Many turns are trivially classifiable: "California" right after the
+assistant asked for the property state, or "summarize what you know".
+These rules answer them without an LLM call; anything ambiguous returns
+None and goes to the LLM. Per-rule hit counters and (sampled) agreement
+with the LLM are kept for the admin metrics endpoint.
+"""
+import re
+from collections import Counter
+
+from app.services.fact_parser import parse_field_value
+
+# IntentType values (intent_classifier imports this module, so no import back)
+SUMMARY_REQUEST = "summary_request"
+FOLLOW_UP = "follow_up"
+
+
+SUMMARY_PATTERNS = [
+    r"^(summary|summarize|summarise|resumen|recap)[.!?]*$",
+    r"\b(summari[sz]e|recap)\b.*\b(what you know|so far|scenario|profile|info|information|facts|everything)\b",
+    r"\bwhat (info|information|data|details) (do you have|have i (given|provided|shared))\b",
+    r"\bwhat am i missing\b",
+    r"\bwhat('s| is) (still )?missing\b",
+    r"\b(show|see|display)\b.*\b(client|borrower) profile\b",
+    r"\bwhat do you know (so far|about (my|the) (client|borrower|scenario))\b",
+]
+
+YES_NO = {"yes", "y", "yeah", "yep", "correct", "right", "si", "sí", "no", "nope", "n"}
+
+# Longer answers are left to the LLM (they may carry several facts or a question)
+MAX_SHORT_ANSWER_WORDS = 5
+
+
+class LocalIntentClassifier:
+    """Keyword/regex rules plus the last asked field; abstains when unsure."""
+
+    def __init__(self):
+        self.rule_hits: Counter[str] = Counter()
+        self.abstained = 0
+        self.shadow_compared: Counter[str] = Counter()
+        self.shadow_agreed: Counter[str] = Counter()
+
+    def classify(self, message: str, last_question_field: str | None = None) -> dict | None:
+        """
+        Return a classify()-shaped result with a "rule" key, or None to defer to the LLM.
+        """
+        text = message.strip()
+        lowered = text.lower()
+
+        if any(re.search(pattern, lowered) for pattern in SUMMARY_PATTERNS):
+            return self._hit("summary", SUMMARY_REQUEST, 0.95)
+
+        if last_question_field and self._is_short_answer(text):
+            value = parse_field_value(last_question_field, text)
+            if value is not None:
+                return self._hit(
+                    "field_answer", FOLLOW_UP, 0.95,
+                    entities={last_question_field: value}
+                )
+            if lowered.strip(".!") in YES_NO:
+                return self._hit("yes_no", FOLLOW_UP, 0.9)
+
+        self.abstained += 1
+        return None
+
+    def _is_short_answer(self, text: str) -> bool:
+        return "?" not in text and 0 < len(text.split()) <= MAX_SHORT_ANSWER_WORDS
+
+    def _hit(self, rule: str, intent: str, confidence: float, entities: dict | None = None) -> dict:
+        self.rule_hits[rule] += 1
+        return {
+            "intent": intent,
+            "confidence": confidence,
+            "reasoning": f"local rule: {rule}",
+            "extracted_entities": entities or {},
+            "rule": rule
+        }
+
+    def record_agreement(self, rule: str, local_intent: str, llm_intent: str) -> None:
+        """Record a shadow comparison between a local hit and the LLM's intent."""
+        self.shadow_compared[rule] += 1
+        if local_intent == llm_intent:
+            self.shadow_agreed[rule] += 1
+
+    def reset_stats(self) -> None:
+        self.rule_hits.clear()
+        self.abstained = 0
+        self.shadow_compared.clear()
+        self.shadow_agreed.clear()
+
+    def stats(self) -> dict:
+        """Per-rule hit rates and LLM agreement for the admin metrics endpoint."""
+        hits = sum(self.rule_hits.values())
+        total = hits + self.abstained
+        rules = {}
+        for rule, count in self.rule_hits.items():
+            compared = self.shadow_compared[rule]
+            rules[rule] = {
+                "hits": count,
+                "hit_rate": round(count / total, 3) if total else 0.0,
+                "shadow_compared": compared,
+                "agreement": round(self.shadow_agreed[rule] / compared, 3) if compared else None
+            }
+        return {
+            "messages": total,
+            "local_hits": hits,
+            "local_rate": round(hits / total, 3) if total else 0.0,
+            "rules": rules
+        }
+
+
+# Process-wide classifier (stateless rules, shared counters)
+local_intent_classifier = LocalIntentClassifier()
@@ -0,0 +1,326 @@
+"""
+Local Vector Index - Memory-mapped retrieval backend without pgvector
+
+For dev, CI and small deployments (tens of thousands of chunks), a NumPy
+matrix product beats a database round trip. Layout under
+settings.local_index_dir:
+
+    current -> gen-<timestamp>/     symlink, swapped atomically on rebuild
+    gen-<timestamp>/vectors.bin     row-major L2-normalized embeddings (float32/float16)
+    gen-<timestamp>/meta.jsonl      one JSON object per row (parallel to vectors.bin)
+    .lock                           serializes appends/rebuilds across workers
+
+Vectors are memory-mapped read-only, so every worker on the host shares one
+page-cache copy. Readers pick up appends (file growth) and rebuilds
+(symlink target change) on their next search. Searches run in worker
+threads: each one reads a single immutable _Snapshot of the mapped state,
+which a refresh replaces in one assignment.
+
+Rebuild from the chunks table (plain SQLAlchemy session; no pgvector
+search settings or fast-path pool involved):
+    python -m app.services.local_vector_index rebuild
+"""
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.config import settings
+from app.models.document import Chunk
+
+# Keep in sync with the pgvector column so both backends accept the same embeddings
+EMBEDDING_DIMENSIONS = Chunk.__table__.c.embedding.type.dim
+
+META_FIELDS = ("id", "document_id", "content", "section_path", "filename", "lender", "archetype")
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """Mapped state at one point in time; never mutated, only replaced."""
+    generation: str | None = None
+    vectors: np.ndarray | None = None
+    meta: tuple[dict, ...] = ()
+    meta_offset: int = 0
+    lenders: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+    document_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+    archetypes: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+
+    @property
+    def rows(self) -> int:
+        return self.vectors.shape[0] if self.vectors is not None else 0
+
+
+class LocalVectorIndex:
+    """Brute-force cosine top-k over a memory-mapped embedding matrix."""
+
+    def __init__(self, root: str | None = None):
+        self.root = root or settings.local_index_dir
+        self.dtype = np.dtype(settings.local_index_dtype)
+        self._snapshot = _Snapshot()
+        # Serializes refreshes; searches only read the snapshot they got
+        self._refresh_lock = threading.Lock()
+
+    # --- Paths ---
+
+    @property
+    def _current(self) -> str:
+        return os.path.join(self.root, "current")
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive cross-process lock for writers."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _new_generation(self) -> str:
+        path = os.path.join(self.root, f"gen-{time.time_ns()}")
+        os.makedirs(path)
+        return path
+
+    def _swap_current(self, generation: str) -> None:
+        """Point `current` at generation atomically, then drop older generations."""
+        tmp_link = os.path.join(self.root, f".current-{os.getpid()}")
+        os.symlink(os.path.basename(generation), tmp_link)
+        os.replace(tmp_link, self._current)
+
+        for name in os.listdir(self.root):
+            if name.startswith("gen-") and name != os.path.basename(generation):
+                # Workers still mapping the old files keep their inodes until they reload
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    # --- Reading ---
+
+    def _refresh(self) -> _Snapshot:
+        """(Re)map the matrix and load new metadata rows if the files changed."""
+        with self._refresh_lock:
+            self._snapshot = self._next_snapshot(self._snapshot)
+            return self._snapshot
+
+    def _next_snapshot(self, current: _Snapshot) -> _Snapshot:
+        if not os.path.exists(self._current):
+            return _Snapshot()
+
+        generation = os.path.realpath(self._current)
+        if generation != current.generation:
+            current = _Snapshot(generation=generation)
+
+        vectors_path = os.path.join(generation, "vectors.bin")
+        row_bytes = EMBEDDING_DIMENSIONS * self.dtype.itemsize
+        vector_rows = os.path.getsize(vectors_path) // row_bytes
+
+        # Pick up rows appended since the last refresh
+        appended, offset = [], current.meta_offset
+        with open(os.path.join(generation, "meta.jsonl"), "rb") as meta_file:
+            meta_file.seek(offset)
+            for line in meta_file:
+                if not line.endswith(b"\n"):
+                    break  # Partially written by a concurrent append
+                appended.append(json.loads(line))
+                offset += len(line)
+        meta = current.meta + tuple(appended)
+
+        # A concurrent append may have written vectors before metadata (or vice versa)
+        rows = min(vector_rows, len(meta))
+        if current.vectors is not None and rows == current.rows:
+            return _Snapshot(
+                generation, current.vectors, meta, offset,
+                current.lenders, current.document_ids, current.archetypes
+            )
+
+        vectors = (
+            np.memmap(vectors_path, dtype=self.dtype, mode="r", shape=(rows, EMBEDDING_DIMENSIONS))
+            if rows else None
+        )
+        # Column arrays used to build filter masks without looping in Python
+        indexed = meta[:rows]
+        return _Snapshot(
+            generation, vectors, meta, offset,
+            np.array([(m.get("lender") or "").lower() for m in indexed], dtype=object),
+            np.array([m.get("document_id") for m in indexed], dtype=object),
+            np.array([m.get("archetype") for m in indexed], dtype=object)
+        )
+
+    def search(
+        self,
+        embedding: np.ndarray,
+        top_k: int = 10,
+        lender: str | None = None,
+        document_ids: list[str] | None = None,
+        archetypes: list[str] | None = None,
+        lender_match: str = "exact"
+    ) -> list[dict]:
+        """Return the top_k most similar rows as chunk dicts (same shape as RetrievalService.search)."""
+        snapshot = self._refresh()
+        if snapshot.vectors is None:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = snapshot.vectors @ query.astype(self.dtype)
+        scores = scores.astype(np.float32)
+
+        mask = np.ones(scores.shape[0], dtype=bool)
+        if lender and lender_match == "contains":
+            needle = lender.lower()
+            mask &= np.array([needle in name for name in snapshot.lenders], dtype=bool)
+        elif lender:
+            mask &= snapshot.lenders == lender.lower()
+        if document_ids:
+            mask &= np.isin(snapshot.document_ids, [str(d) for d in document_ids])
+        if archetypes:
+            mask &= np.isin(snapshot.archetypes, [str(a) for a in archetypes])
+
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return []
+
+        k = min(top_k, candidates.size)
+        candidate_scores = scores[candidates]
+        top = np.argpartition(-candidate_scores, k - 1)[:k]
+        top = top[np.argsort(-candidate_scores[top])]
+
+        results = []
+        for i in top:
+            row = candidates[i]
+            chunk = {field: snapshot.meta[row].get(field) for field in META_FIELDS if field != "archetype"}
+            chunk["similarity"] = float(candidate_scores[i])
+            results.append(chunk)
+        return results
+
+    # --- Writing ---
+
+    def _write_rows(self, generation: str, rows: list[dict], embeddings: np.ndarray) -> None:
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIMENSIONS)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = (matrix / np.where(norms == 0, 1.0, norms)).astype(self.dtype)
+
+        with open(os.path.join(generation, "vectors.bin"), "ab") as vectors_file:
+            vectors_file.write(matrix.tobytes())
+        with open(os.path.join(generation, "meta.jsonl"), "a", encoding="utf-8") as meta_file:
+            for row in rows:
+                meta_file.write(json.dumps({field: row.get(field) for field in META_FIELDS}) + "\n")
+
+    def append(self, rows: list[dict], embeddings: np.ndarray) -> None:
+        """Append chunks (dicts with META_FIELDS) and their embeddings."""
+        if not rows:
+            return
+
+        with self._locked():
+            if os.path.exists(self._current):
+                generation = os.path.realpath(self._current)
+            else:
+                generation = self._new_generation()
+                open(os.path.join(generation, "vectors.bin"), "wb").close()
+                open(os.path.join(generation, "meta.jsonl"), "w").close()
+                self._swap_current(generation)
+            self._write_rows(generation, rows, embeddings)
+
+    async def _load_rows(self, document_id: str | None = None) -> tuple[list[dict], np.ndarray]:
+        """Committed active chunks (all, or one document's) with their embeddings."""
+        from sqlalchemy import select
+        from app.db import async_session
+        from app.models.document import Document, DocumentStatus
+
+        query = (
+            select(Chunk, Document.filename, Document.lender, Document.archetype)
+            .join(Document, Chunk.document_id == Document.id)
+            .where(Document.status == DocumentStatus.ACTIVE)
+            .where(Chunk.embedding.is_not(None))
+            .order_by(Chunk.document_id, Chunk.chunk_index)
+        )
+        if document_id is not None:
+            query = query.where(Chunk.document_id == document_id)
+
+        # Regular session: none of the fast-path pool's ANN settings are needed here
+        async with async_session() as session:
+            records = (await session.execute(query)).all()
+
+        rows = [
+            {
+                "id": str(chunk.id),
+                "document_id": str(chunk.document_id),
+                "content": chunk.content,
+                "section_path": chunk.section_path,
+                "filename": filename,
+                "lender": lender,
+                "archetype": getattr(archetype, "value", archetype)
+            }
+            for chunk, filename, lender, archetype in records
+        ]
+        embeddings = (
+            np.stack([np.asarray(chunk.embedding, dtype=np.float32) for chunk, *_ in records])
+            if records else np.empty((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+        )
+        return rows, embeddings
+
+    async def append_document(self, document_id: str) -> None:
+        """
+        Append a newly ingested document's chunks. Run it after the upload
+        has committed, so a rolled-back upload leaves no vectors behind.
+        """
+        rows, embeddings = await self._load_rows(document_id)
+        await asyncio.to_thread(self.append, rows, embeddings)
+
+    async def rebuild(self) -> dict:
+        """Rebuild the index from all active chunks in the database."""
+        started = time.perf_counter()
+        rows, embeddings = await self._load_rows()
+
+        def write() -> None:
+            with self._locked():
+                generation = self._new_generation()
+                open(os.path.join(generation, "vectors.bin"), "wb").close()
+                open(os.path.join(generation, "meta.jsonl"), "w").close()
+                self._write_rows(generation, rows, embeddings)
+                self._swap_current(generation)
+
+        await asyncio.to_thread(write)
+        build_seconds = time.perf_counter() - started
+
+        result = self.status()
+        result["build_seconds"] = round(build_seconds, 3)
+        return result
+
+    def status(self) -> dict:
+        """Report size and row count (same fields as VectorIndexService.status)."""
+        snapshot = self._refresh()
+        rows = snapshot.rows
+        size_bytes = rows * EMBEDDING_DIMENSIONS * self.dtype.itemsize
+        return {
+            "name": os.path.abspath(self._current),
+            "method": f"local-mmap-{self.dtype.name}",
+            "exists": snapshot.vectors is not None,
+            "definition": None,
+            "size_bytes": size_bytes,
+            "size": f"{size_bytes / (1024 * 1024):.1f} MB",
+            "chunks_count": rows,
+            "build_seconds": None
+        }
+
+
+# Process-wide index; the memory map is shared by every RetrievalService instance
+local_vector_index = LocalVectorIndex()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.services.local_vector_index rebuild")
+        sys.exit(1)
+
+    async def _main() -> None:
+        result = await local_vector_index.rebuild()
+        print(f"Indexed {result['chunks_count']} chunks ({result['size']}) in {result['build_seconds']}s")
+
+    asyncio.run(_main())
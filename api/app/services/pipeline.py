@@ -0,0 +1,193 @@
+"""
+Pipeline - Small DAG executor for request stages
+
+Each stage declares the values it needs (inputs) and the value it
+produces (output). Pipeline.run() starts every stage at once; a stage
+waits only for its own inputs, so independent stages overlap without
+hand-written gather() calls.
+
+- Timeouts: each stage gets min(its own timeout, time left until the
+  request deadline).
+- Failures: an optional stage that fails or times out yields its default;
+  a required one cancels the rest and re-raises.
+- Shared resources: stages naming the same resource (e.g. "db" for the
+  request's AsyncSession, which cannot run two queries at once) never
+  overlap.
+- Timings: per-stage wall time and status come back with the result and
+  feed the process-wide stats in pipeline_stats.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+import asyncio
+import time
+
+from app.services.deadline import Deadline, time_left
+
+
+@dataclass
+class Stage:
+    """One unit of work; called with its inputs as keyword arguments."""
+    name: str
+    fn: Callable[..., Awaitable[Any]]
+    inputs: tuple[str, ...] = ()
+    output: str | None = None  # Defaults to the stage name
+    timeout: float | None = None
+    optional: bool = False
+    default: Any = None
+    resource: str | None = None
+
+    @property
+    def output_name(self) -> str:
+        return self.output or self.name
+
+
+@dataclass
+class PipelineResult:
+    values: dict[str, Any]
+    timings: dict[str, dict] = field(default_factory=dict)
+
+    def __getitem__(self, name: str) -> Any:
+        return self.values[name]
+
+
+class Pipeline:
+    """A named set of stages, validated once and run per request."""
+
+    def __init__(self, name: str, stages: list[Stage]):
+        self.name = name
+        self.stages = stages
+        self._producers = {stage.output_name: stage for stage in stages}
+        if len(self._producers) != len(stages):
+            raise ValueError(f"Pipeline {name}: two stages produce the same output")
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        visiting, done = set(), set()
+
+        def visit(stage: Stage):
+            if stage.name in done:
+                return
+            if stage.name in visiting:
+                raise ValueError(f"Pipeline {self.name}: cycle through stage {stage.name}")
+            visiting.add(stage.name)
+            for name in stage.inputs:
+                if name in self._producers:
+                    visit(self._producers[name])
+            visiting.discard(stage.name)
+            done.add(stage.name)
+
+        for stage in self.stages:
+            visit(stage)
+
+    async def run(self, deadline: Deadline | None = None, **initial: Any) -> PipelineResult:
+        """
+        Run all stages. initial provides the inputs no stage produces;
+        deadline is the request's Deadline.
+        """
+        missing = {
+            name for stage in self.stages for name in stage.inputs
+            if name not in self._producers and name not in initial
+        }
+        if missing:
+            raise ValueError(f"Pipeline {self.name}: missing inputs {sorted(missing)}")
+
+        locks: dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        result = PipelineResult(values=dict(initial))
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> Any:
+            args = {}
+            for name in stage.inputs:
+                args[name] = await tasks[name] if name in tasks else initial[name]
+
+            started = time.monotonic()
+            status = "ok"
+            try:
+                timeout = self._timeout(stage, deadline)
+                if timeout is not None and timeout <= 0:
+                    raise asyncio.TimeoutError()
+                if stage.resource:
+                    async with locks[stage.resource]:
+                        value = await asyncio.wait_for(stage.fn(**args), timeout)
+                else:
+                    value = await asyncio.wait_for(stage.fn(**args), timeout)
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            except asyncio.TimeoutError:
+                status = "timeout"
+                if not stage.optional:
+                    raise
+                value = stage.default
+            except Exception as e:
+                status = "error"
+                if not stage.optional:
+                    raise
+                print(f"Pipeline {self.name}: optional stage {stage.name} failed: {e}")
+                value = stage.default
+            finally:
+                result.timings[stage.name] = {
+                    "ms": round((time.monotonic() - started) * 1000, 1),
+                    "status": status
+                }
+            return value
+
+        for stage in self.stages:
+            tasks[stage.output_name] = asyncio.ensure_future(run_stage(stage))
+
+        try:
+            values = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            pipeline_stats.record(self.name, result.timings)
+
+        result.values.update(zip(tasks, values))
+        return result
+
+    @staticmethod
+    def _timeout(stage: Stage, deadline: Deadline | None) -> float | None:
+        remaining = time_left(deadline)
+        if remaining is None:
+            return stage.timeout
+        return remaining if stage.timeout is None else min(stage.timeout, remaining)
+
+
+class PipelineStats:
+    """Per-pipeline, per-stage latency counters for the admin metrics endpoint."""
+
+    def __init__(self):
+        self._stages: dict[tuple[str, str], dict] = {}
+
+    def record(self, pipeline: str, timings: dict[str, dict]) -> None:
+        for stage, timing in timings.items():
+            entry = self._stages.setdefault(
+                (pipeline, stage), {"runs": 0, "total_ms": 0.0, "max_ms": 0.0, "failures": 0}
+            )
+            entry["runs"] += 1
+            entry["total_ms"] += timing["ms"]
+            entry["max_ms"] = max(entry["max_ms"], timing["ms"])
+            if timing["status"] != "ok":
+                entry["failures"] += 1
+
+    def reset_stats(self) -> None:
+        self._stages.clear()
+
+    def stats(self) -> dict:
+        pipelines: dict[str, dict] = defaultdict(dict)
+        for (pipeline, stage), entry in self._stages.items():
+            pipelines[pipeline][stage] = {
+                "runs": entry["runs"],
+                "avg_ms": round(entry["total_ms"] / entry["runs"], 1),
+                "max_ms": entry["max_ms"],
+                "failures": entry["failures"]
+            }
+        return dict(pipelines)
+
+
+# Process-wide stage timings shared by every pipeline
+pipeline_stats = PipelineStats()
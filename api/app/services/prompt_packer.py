@@ -0,0 +1,197 @@
+"""
+Prompt Packer - Fit retrieved context into a token budget
+
+Replaces fixed character slices (content[:500], chunks[:8]) when building
+prompts:
+1. Chunks are taken greedily by relevance (hybrid "score", else vector
+   "similarity", else retrieval order)
+2. Chunks mostly contained in one already packed (ingestion overlap,
+   the same passage from two documents) are skipped
+3. A chunk that does not fit is trimmed at whole table rows / sentences,
+   never mid-row; each chunk is also capped at max_item_tokens so one long
+   passage cannot crowd out the rest
+Token counts come from token_counter (tiktoken).
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable
+import re
+
+from app.services.token_counter import count_tokens, truncate_tokens
+
+# Words per shingle when comparing chunks for overlap
+SHINGLE_SIZE = 8
+# Share of a chunk's shingles already packed for it to count as a duplicate
+DUPLICATE_CONTAINMENT = 0.8
+# Trimmed remainders smaller than this are not worth a citation
+MIN_TRIMMED_TOKENS = 30
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_TABLE_ROW = re.compile(r"\||\t|\S {2,}\S")
+
+
+@dataclass
+class PackedContext:
+    """Result of packing: items kept (content possibly trimmed), their rendered text and size."""
+    items: list[dict]
+    text: str
+    tokens: int
+    dropped: int = 0
+    trimmed: int = 0
+
+
+def split_units(text: str) -> list[str]:
+    """Split into whole table rows (lines that look tabular) and sentences."""
+    units = []
+    for line in text.splitlines(keepends=True):
+        if _TABLE_ROW.search(line):
+            units.append(line)
+            continue
+        sentences = _SENTENCE_END.split(line)
+        units.extend(sentence + " " for sentence in sentences[:-1])
+        units.append(sentences[-1])
+    return [unit for unit in units if unit.strip()]
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of whole rows/sentences within max_tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    kept, used = [], 0
+    for unit in split_units(text):
+        cost = count_tokens(unit)
+        if used + cost > max_tokens:
+            break
+        kept.append(unit)
+        used += cost
+    # Per-unit counts are not exactly additive; check the joined text
+    while kept and count_tokens("".join(kept).rstrip()) > max_tokens:
+        kept.pop()
+
+    if not kept:
+        # A single sentence longer than the budget: cut it by tokens
+        return truncate_tokens(text, max_tokens).rstrip() + "..."
+    return "".join(kept).rstrip()
+
+
+def _shingles(text: str) -> set[tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _relevance_order(chunks: list[dict]) -> list[dict]:
+    def relevance(chunk: dict) -> float | None:
+        return chunk.get("score", chunk.get("similarity"))
+
+    if chunks and all(relevance(c) is not None for c in chunks):
+        return sorted(chunks, key=relevance, reverse=True)
+    return list(chunks)
+
+
+def pack_chunks(
+    chunks: list[dict],
+    budget_tokens: int,
+    render: Callable[[int, dict, str], str],
+    stage: str,
+    max_item_tokens: int | None = None
+) -> PackedContext:
+    """
+    Pack chunks into budget_tokens.
+
+    render(index, chunk, content) returns the prompt text for one chunk
+    (header/citation + content); index is 1-based in packed order.
+    Returned items are copies with the (possibly trimmed) "content".
+    """
+    items, parts, packed_shingles = [], [], []
+    used = dropped = trimmed = 0
+
+    for chunk in _relevance_order(chunks):
+        content = chunk.get("content") or ""
+        shingles = _shingles(content)
+        if any(len(shingles & seen) / len(shingles) >= DUPLICATE_CONTAINMENT for seen in packed_shingles):
+            dropped += 1
+            continue
+
+        index = len(items) + 1
+        overhead = count_tokens(render(index, chunk, ""))
+        room = budget_tokens - used - overhead
+        if max_item_tokens is not None:
+            room = min(room, max_item_tokens)
+        if room < MIN_TRIMMED_TOKENS:
+            dropped += 1
+            continue
+
+        fitted = trim_to_tokens(content, room)
+        if fitted != content:
+            trimmed += 1
+        rendered = render(index, chunk, fitted)
+        used += count_tokens(rendered)
+        items.append({**chunk, "content": fitted})
+        parts.append(rendered)
+        packed_shingles.append(shingles)
+
+    packed = PackedContext(items=items, text="\n".join(parts), tokens=used, dropped=dropped, trimmed=trimmed)
+    packing_stats.record(stage, packed)
+    return packed
+
+
+def pack_lines(lines: list[str], budget_tokens: int, stage: str) -> PackedContext:
+    """
+    Pack whole lines (e.g. formatted rules) in priority order until the
+    budget is spent; the kept lines are always a prefix of `lines`.
+    """
+    kept, used = [], 0
+    for line in lines:
+        cost = count_tokens(line)
+        if used + cost > budget_tokens:
+            break
+        kept.append(line)
+        used += cost
+
+    packed = PackedContext(
+        items=[{"content": line} for line in kept],
+        text="\n".join(kept),
+        tokens=used,
+        dropped=len(lines) - len(kept)
+    )
+    packing_stats.record(stage, packed)
+    return packed
+
+
+class PackingStats:
+    """Packed prompt sizes per stage for the admin metrics endpoint."""
+
+    def __init__(self):
+        self._stages: dict[str, dict] = defaultdict(
+            lambda: {"packs": 0, "tokens": 0, "items": 0, "dropped": 0, "trimmed": 0}
+        )
+
+    def record(self, stage: str, packed: PackedContext) -> None:
+        entry = self._stages[stage]
+        entry["packs"] += 1
+        entry["tokens"] += packed.tokens
+        entry["items"] += len(packed.items)
+        entry["dropped"] += packed.dropped
+        entry["trimmed"] += packed.trimmed
+
+    def reset_stats(self) -> None:
+        self._stages.clear()
+
+    def stats(self) -> dict:
+        return {
+            stage: {
+                "packs": entry["packs"],
+                "avg_tokens": round(entry["tokens"] / entry["packs"], 1),
+                "avg_items": round(entry["items"] / entry["packs"], 2),
+                "dropped": entry["dropped"],
+                "trimmed": entry["trimmed"]
+            }
+            for stage, entry in self._stages.items()
+        }
+
+
+# Process-wide packing counters
+packing_stats = PackingStats()
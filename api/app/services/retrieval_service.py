@@ -1,90 +1,591 @@
+import asyncio
+import json
+import re
+from decimal import Decimal
+import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, text
+from sqlalchemy import select, text, bindparam, func, DateTime, Numeric
 from openai import AsyncOpenAI
+from tenacity import wait_random_exponential
 
-from app.models.document import Chunk, Document, DocumentStatus
+from app.models.document import Chunk, Document, DocumentStatus, Rule
 from app.config import settings
-from app.db import async_session
+from app.llm_client import get_openai_client
+from app.db import (
+    async_session,
+    apply_vector_search_params,
+    get_vector_pool,
+    set_vector_search_params,
+    TEXT_SEARCH_CONFIG,
+    CHUNK_TSVECTOR,
+)
+from app.services.deadline import current_deadline, time_left
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_batcher import embedding_batcher, EMBEDDING_MAX_INPUT_TOKENS
+from app.services.llm_scheduler import llm_scheduler, Priority
+from app.services.local_vector_index import local_vector_index
+from app.services.token_counter import count_tokens, truncate_tokens
+
+
+# Backoff between bulk embedding retries (llm_scheduler retries transient errors)
+EMBED_RETRY_WAIT = wait_random_exponential(multiplier=0.5, max=20)
+
+
+# ":name" bind markers, skipping "::type" casts
+_NAMED_PARAM = re.compile(r"(?<!:):(\w+)")
+
+
+def _to_positional(sql: str, params: dict) -> tuple[str, list]:
+    """Rewrite :name binds to asyncpg's $n placeholders (repeated names share a slot)."""
+    order: list[str] = []
+    
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in order:
+            order.append(name)
+        return f"${order.index(name) + 1}"
+    
+    positional = _NAMED_PARAM.sub(replace, sql)
+    return positional, [params[name] for name in order]
+
+
+def _query_timeout() -> float | None:
+    """asyncpg timeout: the time left on the current request's deadline (None outside requests)."""
+    remaining = time_left(current_deadline.get())
+    if remaining is not None and remaining <= 0:
+        raise asyncio.TimeoutError()
+    return remaining
+
+
+def reciprocal_rank_fusion(ranked_lists: list[list[dict]], top_k: int = 10, k: int = 60) -> list[dict]:
+    """
+    Merge ranked chunk lists with reciprocal-rank fusion.
+    
+    Each chunk scores sum(1 / (k + rank)) over the lists it appears in, so
+    chunks ranked well by both vector and lexical search float to the top
+    without having to calibrate cosine similarity against ts_rank.
+    """
+    fused: dict[str, dict] = {}
+    
+    for ranked in ranked_lists:
+        for rank, chunk in enumerate(ranked, 1):
+            entry = fused.get(chunk["id"])
+            if entry is None:
+                entry = {**chunk, "similarity": chunk.get("similarity", 0.0), "score": 0.0}
+                fused[chunk["id"]] = entry
+            else:
+                # Keep scores reported by either leg
+                for key in ("similarity", "text_rank"):
+                    if chunk.get(key):
+                        entry[key] = chunk[key]
+            entry["score"] += 1.0 / (k + rank)
+    
+    merged = sorted(fused.values(), key=lambda c: c["score"], reverse=True)
+    return merged[:top_k]
+
+
+def _rule_from_json(data: dict) -> Rule:
+    """Build a transient Rule from a row_to_json object (numerics back to Decimal)."""
+    values = {}
+    for column in Rule.__table__.columns:
+        if isinstance(column.type, DateTime):
+            continue  # Timestamps are not used in prompts
+        value = data.get(column.name)
+        if value is not None and isinstance(column.type, Numeric):
+            value = Decimal(str(value))
+        values[column.name] = value
+    values["status"] = DocumentStatus.ACTIVE
+    return Rule(**values)
 
 
 class RetrievalService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, client: AsyncOpenAI | None = None):
         self.db = db
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = client or get_openai_client()
     
-    async def search(self, query: str, top_k: int = 10) -> list[dict]:
+    async def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        lender: str | None = None,
+        document_ids: list[str] | None = None,
+        archetypes: list[str] | None = None,
+        mode: str | None = None,
+        lender_match: str = "exact"
+    ) -> list[dict]:
         """
-        Search for relevant chunks using vector similarity.
+        Search for relevant chunks.
         Returns list of chunks with scores.
-        Uses a separate session to avoid transaction conflicts.
+        Uses separate sessions to avoid transaction conflicts.
+        
+        Modes (default settings.retrieval_mode):
+            vector: cosine similarity on embeddings only
+            hybrid: vector + full-text search run concurrently, merged with
+                    reciprocal-rank fusion (better for exact terms like "DSCR 0.75")
+        
+        Filters are applied inside the queries, so filtered top-k is
+        ranked over the matching chunks only (not a post-filtered global top-k):
+            lender: case-insensitive lender name ("contains" lender_match
+                    accepts partial names, e.g. "Acra" for "Acra Lending")
+            document_ids: restrict to these documents
+            archetypes: restrict to these document archetypes (A-E)
+        
+        With settings.retrieval_backend = "local" the query is answered from
+        the in-process memory-mapped index instead (vector mode only).
         """
+        mode = mode or settings.retrieval_mode
+        
         try:
-            # Generate embedding for query
-            embedding = await self._embed(query)
+            if settings.retrieval_backend == "local":
+                return await self._local_search(query, top_k, lender, document_ids, archetypes, lender_match)
             
-            # Format embedding as PostgreSQL vector literal
-            embedding_str = "[" + ",".join(str(x) for x in embedding) + "]"
+            where, params = self._build_filters(lender, document_ids, archetypes, lender_match)
             
-            # Use separate session for vector search to avoid transaction conflicts
-            async with async_session() as session:
-                # Vector similarity search using pgvector
-                # Use bindparam for proper parameter handling with asyncpg
-                from sqlalchemy import bindparam
-                
-                sql = text("""
-                    SELECT 
-                        c.id,
-                        c.content,
-                        c.section_path,
-                        c.document_id,
-                        d.filename,
-                        d.lender,
-                        1 - (c.embedding <=> cast(:embedding as vector)) as similarity
-                    FROM chunks c
-                    JOIN documents d ON c.document_id = d.id
-                    WHERE d.status::text = 'active'
-                    ORDER BY c.embedding <=> cast(:embedding as vector)
-                    LIMIT :limit
-                """).bindparams(
-                    bindparam("embedding", value=embedding_str),
-                    bindparam("limit", value=top_k)
-                )
-                
-                result = await session.execute(sql)
-                rows = result.fetchall()
-                
-                return [
-                    {
-                        "id": str(row.id),
-                        "content": row.content,
-                        "section_path": row.section_path,
-                        "document_id": str(row.document_id),
-                        "filename": row.filename,
-                        "lender": row.lender,
-                        "similarity": float(row.similarity)
-                    }
-                    for row in rows
-                ]
+            if mode != "hybrid":
+                return await self._vector_search(query, top_k, where, params)
+            
+            candidates = top_k * settings.hybrid_candidate_multiplier
+            legs = await asyncio.gather(
+                self._vector_search(query, candidates, where, params),
+                self._lexical_search(query, candidates, where, params),
+                return_exceptions=True
+            )
+            
+            ranked_lists = []
+            for leg in legs:
+                if isinstance(leg, Exception):
+                    # One failed leg degrades to the other instead of failing the search
+                    print(f"RetrievalService.search leg error: {leg}")
+                else:
+                    ranked_lists.append(leg)
+            
+            return reciprocal_rank_fusion(ranked_lists, top_k=top_k, k=settings.rrf_k)
         except Exception as e:
             print(f"RetrievalService.search error: {e}")
             # Return empty list on error to avoid breaking the flow
             return []
     
-    async def _embed(self, text: str) -> list[float]:
+    async def _vector_search(self, query: str, limit: int, where: list[str], params: dict) -> list[dict]:
+        """Rank chunks by cosine similarity to the query embedding."""
+        # Generate embedding for query
+        embedding = await self._embed(query)
+        
+        if settings.retrieval_fast_path:
+            try:
+                return await self._vector_search_fast(embedding, limit, where, params)
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                print(f"RetrievalService fast path error, using ORM path: {e}")
+        
+        return await self._vector_search_orm(embedding, limit, where, params)
+    
+    async def search_by_lenders(
+        self,
+        query: str,
+        lenders: list[str],
+        top_k: int = 10,
+        mode: str | None = None
+    ) -> dict[str, dict]:
+        """
+        Top-k chunks and active rules for several lenders at once.
+        Returns {lender: {"chunks": [...], "rules": [Rule, ...]}}, or {} if
+        the search fails.
+        
+        The query is embedded once. On the fast path, every lender's chunks
+        and rules come back from one SQL statement (a LATERAL subquery per
+        lender and leg) instead of a vector query plus a rules query per
+        specialist. Raises asyncio.TimeoutError once the request deadline
+        has passed.
+        """
+        if not lenders:
+            return {}
+        mode = mode or settings.retrieval_mode
+        
+        try:
+            if settings.retrieval_backend != "local" and settings.retrieval_fast_path:
+                try:
+                    return await self._search_by_lenders_fast(query, lenders, top_k, mode)
+                except asyncio.TimeoutError:
+                    raise
+                except Exception as e:
+                    print(f"RetrievalService fast path error, searching lenders one by one: {e}")
+            
+            return await self._search_by_lenders_fallback(query, lenders, top_k, mode)
+        except asyncio.TimeoutError:
+            # Past the request deadline: the caller falls back to rules only
+            raise
+        except Exception as e:
+            print(f"RetrievalService.search_by_lenders error: {e}")
+            # No entries, so each specialist fetches its own context
+            return {}
+    
+    async def _search_by_lenders_fast(
+        self,
+        query: str,
+        lenders: list[str],
+        top_k: int,
+        mode: str
+    ) -> dict[str, dict]:
+        """Per-lender vector (+ lexical) top-k and rules in a single round trip."""
+        embedding = await self._embed(query)
+        hybrid = mode == "hybrid"
+        candidates = top_k * settings.hybrid_candidate_multiplier if hybrid else top_k
+        
+        lender_chunks = """
+                    FROM chunks c
+                    JOIN documents d ON c.document_id = d.id
+                    WHERE d.status::text = 'active' AND lower(d.lender) = lower(l.lender)"""
+        
+        lexical_cte = f"""
+            WITH q AS (
+                SELECT to_tsquery(
+                    '{TEXT_SEARCH_CONFIG}',
+                    replace(plainto_tsquery('{TEXT_SEARCH_CONFIG}', :query)::text, ' & ', ' | ')
+                ) AS query
+            )""" if hybrid else ""
+        
+        lexical_join = f"""
+            CROSS JOIN q
+            LEFT JOIN LATERAL (
+                SELECT coalesce(json_agg(t ORDER BY t.text_rank DESC), '[]'::json) AS chunks
+                FROM (
+                    SELECT c.id, c.content, c.section_path, c.document_id, d.filename, d.lender,
+                           ts_rank_cd({CHUNK_TSVECTOR}, q.query) AS text_rank{lender_chunks}
+                      AND {CHUNK_TSVECTOR} @@ q.query
+                    ORDER BY text_rank DESC
+                    LIMIT :limit
+                ) t
+            ) lex ON true""" if hybrid else ""
+        
+        sql, args = _to_positional(
+            f"""{lexical_cte}
+            SELECT
+                l.lender,
+                vec.chunks AS vector_chunks,
+                {"lex.chunks" if hybrid else "'[]'::json"} AS lexical_chunks,
+                r.rules
+            FROM unnest(cast(:lenders as text[])) AS l(lender){lexical_join}
+            LEFT JOIN LATERAL (
+                SELECT coalesce(json_agg(t ORDER BY t.similarity DESC), '[]'::json) AS chunks
+                FROM (
+                    SELECT c.id, c.content, c.section_path, c.document_id, d.filename, d.lender,
+                           1 - (c.embedding <=> :embedding) AS similarity{lender_chunks}
+                    ORDER BY c.embedding <=> :embedding
+                    LIMIT :limit
+                ) t
+            ) vec ON true
+            LEFT JOIN LATERAL (
+                SELECT coalesce(json_agg(ru), '[]'::json) AS rules
+                FROM rules ru
+                WHERE lower(ru.lender) = lower(l.lender) AND ru.status::text = 'active'
+            ) r ON true
+            """,
+            {"embedding": embedding, "limit": candidates, "lenders": list(lenders), "query": query}
+        )
+        
+        pool = await get_vector_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            await set_vector_search_params(conn, candidates, filtered=True)
+            statement = await conn.prepare(sql)
+            rows = await statement.fetch(*args, timeout=_query_timeout())
+        
+        results = {}
+        for row in rows:
+            vector = json.loads(row["vector_chunks"])
+            lexical = json.loads(row["lexical_chunks"])
+            if hybrid:
+                chunks = reciprocal_rank_fusion([vector, lexical], top_k=top_k, k=settings.rrf_k)
+            else:
+                chunks = vector[:top_k]
+            results[row["lender"]] = {
+                "chunks": chunks,
+                "rules": [_rule_from_json(rule) for rule in json.loads(row["rules"])]
+            }
+        return results
+    
+    async def _search_by_lenders_fallback(
+        self,
+        query: str,
+        lenders: list[str],
+        top_k: int,
+        mode: str
+    ) -> dict[str, dict]:
+        """Concurrent per-lender searches (one shared embedding) plus one rules query."""
+        chunk_lists = await asyncio.gather(
+            *(self.search(query, top_k=top_k, lender=lender, mode=mode) for lender in lenders)
+        )
+        rules = await self._get_rules_for_lenders(lenders)
+        
+        return {
+            lender: {"chunks": chunks, "rules": rules.get(lender, [])}
+            for lender, chunks in zip(lenders, chunk_lists)
+        }
+    
+    async def _get_rules_for_lenders(self, lenders: list[str]) -> dict[str, list[Rule]]:
+        """
+        Active rules for several lenders in one query, grouped by the
+        requested lender name (matched case-insensitively, like the chunks).
+        """
+        requested = {lender.lower(): lender for lender in lenders}
+        async with async_session() as session:
+            result = await session.execute(
+                select(Rule)
+                .where(func.lower(Rule.lender).in_(list(requested)))
+                .where(Rule.status == DocumentStatus.ACTIVE)
+            )
+            rules = result.scalars().all()
+        
+        grouped: dict[str, list[Rule]] = {}
+        for rule in rules:
+            grouped.setdefault(requested[rule.lender.lower()], []).append(rule)
+        return grouped
+    
+    async def _local_search(
+        self,
+        query: str,
+        top_k: int,
+        lender: str | None,
+        document_ids: list[str] | None,
+        archetypes: list[str] | None,
+        lender_match: str
+    ) -> list[dict]:
+        """Rank chunks with the memory-mapped local index (no database round trip)."""
+        embedding = await self._embed(query)
+        # The matrix product releases the GIL; keep it off the event loop
+        return await asyncio.to_thread(
+            local_vector_index.search,
+            embedding,
+            top_k,
+            lender=lender,
+            document_ids=document_ids,
+            archetypes=archetypes,
+            lender_match=lender_match
+        )
+    
+    async def _vector_search_fast(
+        self,
+        embedding: np.ndarray,
+        limit: int,
+        where: list[str],
+        params: dict
+    ) -> list[dict]:
+        """
+        Vector query on raw asyncpg: the embedding travels as a binary float32
+        vector (registered pgvector codec) through a prepared statement, with
+        no text encoding and no ORM session.
+        """
+        sql, args = _to_positional(
+            f"""
+            SELECT 
+                c.id,
+                c.content,
+                c.section_path,
+                c.document_id,
+                d.filename,
+                d.lender,
+                1 - (c.embedding <=> :embedding) as similarity
+            FROM chunks c
+            JOIN documents d ON c.document_id = d.id
+            WHERE {" AND ".join(where)}
+            ORDER BY c.embedding <=> :embedding
+            LIMIT :limit
+            """,
+            {"embedding": embedding, "limit": limit, **params}
+        )
+        
+        pool = await get_vector_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            # Recall knobs for this limit and filter, scoped to the transaction
+            await set_vector_search_params(conn, limit, filtered=len(where) > 1)
+            # asyncpg keeps prepared statements in a per-connection LRU,
+            # so each filter combination is parsed/planned once per connection
+            statement = await conn.prepare(sql)
+            rows = await statement.fetch(*args, timeout=_query_timeout())
+        
+        chunks = [
+            {
+                "id": str(row["id"]),
+                "content": row["content"],
+                "section_path": row["section_path"],
+                "document_id": str(row["document_id"]),
+                "filename": row["filename"],
+                "lender": row["lender"],
+                "similarity": float(row["similarity"])
+            }
+            for row in rows
+        ]
+        chunks.sort(key=lambda c: c["similarity"], reverse=True)
+        return chunks
+    
+    async def _vector_search_orm(
+        self,
+        embedding: np.ndarray,
+        limit: int,
+        where: list[str],
+        params: dict
+    ) -> list[dict]:
+        """Vector query through a SQLAlchemy session with a text-encoded embedding."""
+        # Format embedding as PostgreSQL vector literal
+        embedding_str = "[" + ",".join(str(x) for x in embedding) + "]"
+        
+        # Use separate session for vector search to avoid transaction conflicts
+        async with async_session() as session:
+            await apply_vector_search_params(session, limit, filtered=len(where) > 1)
+            
+            # Vector similarity search using pgvector
+            # Use bindparam for proper parameter handling with asyncpg
+            sql = text(f"""
+                SELECT 
+                    c.id,
+                    c.content,
+                    c.section_path,
+                    c.document_id,
+                    d.filename,
+                    d.lender,
+                    1 - (c.embedding <=> cast(:embedding as vector)) as similarity
+                FROM chunks c
+                JOIN documents d ON c.document_id = d.id
+                WHERE {" AND ".join(where)}
+                ORDER BY c.embedding <=> cast(:embedding as vector)
+                LIMIT :limit
+            """).bindparams(
+                bindparam("embedding", value=embedding_str),
+                bindparam("limit", value=limit),
+                *(bindparam(name, value=value) for name, value in params.items())
+            )
+            
+            result = await session.execute(sql)
+            rows = result.fetchall()
+        
+        chunks = [
+            {
+                "id": str(row.id),
+                "content": row.content,
+                "section_path": row.section_path,
+                "document_id": str(row.document_id),
+                "filename": row.filename,
+                "lender": row.lender,
+                "similarity": float(row.similarity)
+            }
+            for row in rows
+        ]
+        # Relaxed-order iterative scans (IVFFlat) can return rows slightly out of order
+        chunks.sort(key=lambda c: c["similarity"], reverse=True)
+        return chunks
+    
+    async def _lexical_search(self, query: str, limit: int, where: list[str], params: dict) -> list[dict]:
+        """
+        Rank chunks by full-text match (uses the GIN index on chunks.content).
+        
+        Query terms are OR-ed so long templated queries still match chunks
+        containing only some of them; ts_rank_cd rewards chunks with more.
+        """
+        async with async_session() as session:
+            sql = text(f"""
+                WITH q AS (
+                    SELECT to_tsquery(
+                        '{TEXT_SEARCH_CONFIG}',
+                        replace(plainto_tsquery('{TEXT_SEARCH_CONFIG}', :query)::text, ' & ', ' | ')
+                    ) AS query
+                )
+                SELECT 
+                    c.id,
+                    c.content,
+                    c.section_path,
+                    c.document_id,
+                    d.filename,
+                    d.lender,
+                    ts_rank_cd({CHUNK_TSVECTOR}, q.query) as rank
+                FROM chunks c
+                JOIN documents d ON c.document_id = d.id
+                CROSS JOIN q
+                WHERE {" AND ".join(where)}
+                  AND {CHUNK_TSVECTOR} @@ q.query
+                ORDER BY rank DESC
+                LIMIT :limit
+            """).bindparams(
+                bindparam("query", value=query),
+                bindparam("limit", value=limit),
+                *(bindparam(name, value=value) for name, value in params.items())
+            )
+            
+            result = await session.execute(sql)
+            rows = result.fetchall()
+        
+        return [
+            {
+                "id": str(row.id),
+                "content": row.content,
+                "section_path": row.section_path,
+                "document_id": str(row.document_id),
+                "filename": row.filename,
+                "lender": row.lender,
+                "text_rank": float(row.rank)
+            }
+            for row in rows
+        ]
+    
+    def _build_filters(
+        self,
+        lender: str | None,
+        document_ids: list[str] | None,
+        archetypes: list[str] | None,
+        lender_match: str = "exact"
+    ) -> tuple[list[str], dict]:
+        """Build WHERE predicates (and their bind values) for a filtered search."""
+        where = ["d.status::text = 'active'"]
+        params = {}
+        
+        if lender and lender_match == "contains":
+            escaped = lender.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("d.lender ILIKE :lender")
+            params["lender"] = f"%{escaped}%"
+        elif lender:
+            where.append("lower(d.lender) = lower(:lender)")
+            params["lender"] = lender
+        if document_ids:
+            where.append("c.document_id = ANY(cast(:document_ids as uuid[]))")
+            params["document_ids"] = [str(d) for d in document_ids]
+        if archetypes:
+            where.append("d.archetype::text = ANY(cast(:archetypes as text[]))")
+            params["archetypes"] = [str(a) for a in archetypes]
+        
+        return where, params
+    
+    async def _embed(self, text: str) -> np.ndarray:
+        """
+        Generate a float32 embedding for a query, going through the embedding
+        cache and then the cross-request micro-batcher.
+        """
+        cached = await embedding_cache.get(text)
+        if cached is not None:
+            return cached
+        
+        if embedding_batcher.window_ms > 0:
+            embedding = await embedding_batcher.embed(self.client, text)
+        else:
+            embedding = await self._embed_uncached(text)
+        await embedding_cache.set(text, embedding)
+        return embedding
+    
+    async def _embed_uncached(self, text: str) -> np.ndarray:
         """Generate embedding for text using OpenAI."""
-        response = await self.client.embeddings.create(
+        response = await llm_scheduler.embeddings(
+            self.client,
+            Priority.INTERACTIVE,
             model=settings.embedding_model,
             input=text
         )
-        return response.data[0].embedding
+        return np.asarray(response.data[0].embedding, dtype=np.float32)
     
     async def embed_and_store(self, document_id: str, chunks: list[dict]) -> None:
         """
         Generate embeddings for chunks and store them.
         """
-        for i, chunk in enumerate(chunks):
-            embedding = await self._embed(chunk["content"])
-            
+        embeddings = await self._embed_many([chunk["content"] for chunk in chunks])
+        
+        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
             chunk_obj = Chunk(
                 document_id=document_id,
                 content=chunk["content"],
@@ -96,3 +597,72 @@ class RetrievalService:
             self.db.add(chunk_obj)
         
         await self.db.flush()
+    
+    async def _embed_many(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed many texts with token-bounded batches sent concurrently.
+        
+        Each batch is retried on its own, so a transient failure never
+        re-embeds batches that already completed.
+        """
+        batches = self._make_batches(texts)
+        results: list[list[float] | None] = [None] * len(texts)
+        semaphore = asyncio.Semaphore(settings.embedding_concurrency)
+        
+        async def run_batch(indices: list[int]) -> None:
+            async with semaphore:
+                embeddings = await self._embed_batch([texts[i] for i in indices])
+            for i, embedding in zip(indices, embeddings):
+                results[i] = embedding
+        
+        outcomes = await asyncio.gather(
+            *(run_batch(indices) for indices in batches),
+            return_exceptions=True
+        )
+        
+        failures = [o for o in outcomes if isinstance(o, Exception)]
+        if failures:
+            raise RuntimeError(
+                f"Embedding failed for {len(failures)} of {len(batches)} batches: {failures[0]}"
+            )
+        
+        return results
+    
+    def _make_batches(self, texts: list[str]) -> list[list[int]]:
+        """Group text indices into batches bounded by input count and total tokens."""
+        batches = []
+        current: list[int] = []
+        current_tokens = 0
+        
+        for i, content in enumerate(texts):
+            tokens = min(count_tokens(content), EMBEDDING_MAX_INPUT_TOKENS)
+            if current and (
+                len(current) >= settings.embedding_batch_max_inputs
+                or current_tokens + tokens > settings.embedding_batch_max_tokens
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+        
+        if current:
+            batches.append(current)
+        
+        return batches
+    
+    async def _embed_batch(self, inputs: list[str]) -> list[list[float]]:
+        """Embed one batch in a single API call, retrying transient errors."""
+        inputs = [truncate_tokens(content, EMBEDDING_MAX_INPUT_TOKENS) for content in inputs]
+        
+        response = await llm_scheduler.embeddings(
+            self.client,
+            Priority.INGESTION,
+            max_attempts=settings.embedding_max_retries,
+            wait=EMBED_RETRY_WAIT,
+            model=settings.embedding_model,
+            input=inputs
+        )
+        
+        # The API returns one item per input, tagged with its position
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
@@ -1,11 +1,51 @@
+from collections import defaultdict
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_
 from decimal import Decimal
 
-from app.models.document import Rule, DocumentStatus
+from app.models.document import Document, Rule, DocumentStatus
 from app.db import async_session
 
 
+# Lender-level bonuses on top of its best rule's score
+DOC_TYPE_COVERAGE_BONUS = 15
+OCCUPANCY_COVERAGE_BONUS = 10
+MAX_BREADTH_BONUS = 5  # +1 per additional matching program
+
+
+def format_rule(rule: Rule) -> str:
+    """One-line summary of a rule's program and thresholds."""
+    line = f"Program: {rule.program or 'Standard'}"
+    if rule.fico_min:
+        line += f", FICO {rule.fico_min}+"
+    if rule.ltv_max:
+        line += f", Max LTV {rule.ltv_max}%"
+    if rule.doc_types:
+        line += f", Doc Types: {', '.join(rule.doc_types)}"
+    if rule.purposes:
+        line += f", Purposes: {', '.join(rule.purposes)}"
+    return line
+
+
+def _covers(rules: list[Rule], column: str, value: str | None) -> bool | None:
+    """Whether any rule lists value in column (None when the scenario has no value)."""
+    if not value:
+        return None
+    value = str(value).lower()
+    return any(
+        v.lower() in value or value in v.lower()
+        for rule in rules for v in (getattr(rule, column) or [])
+    )
+
+
+def rule_covers(rule: Rule, facts: dict) -> bool:
+    """Whether the rule lists the scenario's doc type, occupancy and loan purpose (when stated)."""
+    return all(
+        _covers([rule], column, facts.get(fact)) is not False
+        for fact, column in (("doc_type", "doc_types"), ("occupancy", "occupancies"), ("loan_purpose", "purposes"))
+    )
+
+
 class RulesService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -152,6 +192,78 @@ class RulesService:
         
         return score
     
+    async def rank_lenders(self, facts: dict, lenders: list[str]) -> list[dict]:
+        """
+        Deterministic lender triage from structured rules.
+        
+        Groups match(facts) by lender (limited to lenders) and scores each
+        lender by its best rule plus doc type / occupancy coverage and the
+        number of matching programs. Returns best first:
+        [{"lender", "score", "rules", "covers_doc_type", "covers_occupancy", "filename"}]
+        where covers_* is None when the scenario does not state that fact.
+        """
+        available = {lender.lower(): lender for lender in lenders}
+        by_lender: dict[str, list[Rule]] = defaultdict(list)
+        for rule in await self.match(facts):  # Best rule first
+            lender = available.get((rule.lender or "").lower())
+            if lender:
+                by_lender[lender].append(rule)
+        
+        filenames = await self._document_filenames({rules[0].document_id for rules in by_lender.values()})
+        
+        ranked = []
+        for lender, rules in by_lender.items():
+            covers_doc_type = _covers(rules, "doc_types", facts.get("doc_type"))
+            covers_occupancy = _covers(rules, "occupancies", facts.get("occupancy"))
+            score = self._score_rule(rules[0], facts)
+            score += DOC_TYPE_COVERAGE_BONUS if covers_doc_type else 0
+            score += OCCUPANCY_COVERAGE_BONUS if covers_occupancy else 0
+            score += min(MAX_BREADTH_BONUS, len(rules) - 1)
+            ranked.append({
+                "lender": lender,
+                "score": score,
+                "rules": rules,
+                "covers_doc_type": covers_doc_type,
+                "covers_occupancy": covers_occupancy,
+                "filename": filenames.get(rules[0].document_id, "Eligibility rules")
+            })
+        
+        ranked.sort(key=lambda entry: entry["score"], reverse=True)
+        return ranked
+    
+    async def _document_filenames(self, document_ids: set) -> dict:
+        """document_id -> filename, for citing rules."""
+        if not document_ids:
+            return {}
+        try:
+            async with async_session() as session:
+                result = await session.execute(
+                    select(Document.id, Document.filename).where(Document.id.in_(document_ids))
+                )
+                return dict(result.all())
+        except Exception as e:
+            print(f"RulesService._document_filenames error: {e}")
+            return {}
+    
+    async def get_by_lenders(self, lenders: list[str]) -> dict[str, list[Rule]]:
+        """Active rules for several lenders in one query, grouped by lender."""
+        if not lenders:
+            return {}
+        try:
+            async with async_session() as session:
+                result = await session.execute(
+                    select(Rule)
+                    .where(Rule.lender.in_(lenders))
+                    .where(Rule.status == DocumentStatus.ACTIVE)
+                )
+                grouped: dict[str, list[Rule]] = defaultdict(list)
+                for rule in result.scalars().all():
+                    grouped[rule.lender].append(rule)
+                return dict(grouped)
+        except Exception as e:
+            print(f"RulesService.get_by_lenders error: {e}")
+            return {}
+    
     async def get_by_lender(self, lender: str) -> list[Rule]:
         """Get all active rules for a specific lender."""
         try:
@@ -1,10 +1,12 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from openai import AsyncOpenAI
 
+from app.config import settings
 from app.services.agent_service import BaseAgent
 from app.services.retrieval_service import RetrievalService
-from app.services.rules_service import RulesService
-from app.models.document import Document, Chunk, Rule, DocumentStatus
+from app.services.rules_service import RulesService, format_rule
+from app.services.prompt_packer import pack_chunks, pack_lines
+from app.services.specialist_cache import specialist_cache
 
 
 SPECIALIST_SYSTEM_PROMPT = """You are the specialist agent for {lender_name}.
@@ -60,30 +62,63 @@ Respond in JSON format:
 }}"""
 
 
+def build_specialist_query(scenario: dict) -> str:
+    """
+    Retrieval query shared by every specialist for a scenario.
+    The lender is applied as a filter, so it is not part of the text
+    (one embedding serves the whole fan-out).
+    """
+    parts = []
+    if scenario.get("doc_type"):
+        parts.append(scenario["doc_type"])
+    if scenario.get("loan_purpose"):
+        parts.append(scenario["loan_purpose"])
+    
+    return " ".join(parts + ["eligibility"])
+
+
 class SpecialistAgent(BaseAgent):
     """
     Specialist Agent - Deep analysis of a single lender's products.
     One instance per lender.
     """
     
-    def __init__(self, db: AsyncSession, lender_name: str):
+    def __init__(self, db: AsyncSession, lender_name: str, client: AsyncOpenAI | None = None):
         self.db = db
         self.lender_name = lender_name
-        self.retrieval = RetrievalService(db)
+        self.retrieval = RetrievalService(db, client=client)
         self.rules = RulesService(db)
         
         system_prompt = SPECIALIST_SYSTEM_PROMPT.format(lender_name=lender_name)
-        super().__init__(f"Specialist_{lender_name}", system_prompt)
+        super().__init__(f"Specialist_{lender_name}", system_prompt, client=client)
     
     async def analyze(self, scenario: dict, context: dict | None = None) -> dict:
         """
         Deep analysis of this lender's products for the scenario.
+        
+        context may carry pre-fetched "chunks" and "rules" (see
+        RetrievalService.search_by_lenders); anything missing is fetched here.
+        Successful results with some chunks or rules behind them are cached
+        (specialist_cache); a hit skips chunk retrieval and the LLM call.
         """
-        # Get lender-specific chunks
-        chunks = await self._get_lender_chunks(scenario)
+        context = context or {}
         
-        # Get lender-specific rules
-        rules = await self.rules.get_by_lender(self.lender_name)
+        # Get lender-specific rules (their thresholds also bucket the cache key)
+        rules = context.get("rules")
+        if rules is None:
+            rules = await self.rules.get_by_lender(self.lender_name)
+        
+        cache_key = None
+        if settings.specialist_cache_enabled:
+            cache_key = await specialist_cache.key(self.lender_name, scenario, rules)
+            cached = await specialist_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        # Get lender-specific chunks
+        chunks = context.get("chunks")
+        if chunks is None:
+            chunks = await self._get_lender_chunks(scenario)
         
         # Build detailed context
         user_prompt = f"""Scenario:
@@ -103,6 +138,9 @@ Which products is this borrower eligible for?"""
         # Ensure lender is set correctly
         if isinstance(result, dict) and "error" not in result:
             result["lender"] = self.lender_name
+            # An analysis run without guidelines is not worth reusing
+            if cache_key and (chunks or rules):
+                await specialist_cache.set(cache_key, result)
         elif "error" in result:
             return {
                 "lender": self.lender_name,
@@ -116,85 +154,37 @@ Which products is this borrower eligible for?"""
         return result
     
     async def _get_lender_chunks(self, scenario: dict) -> list[dict]:
-        """Get chunks specific to this lender."""
+        """Get chunks specific to this lender (lender filter applied in the vector query)."""
         try:
-            # Build query
-            query = self._build_query(scenario)
-            
-            # Search with lender filter (simplified - full version would filter at query level)
-            all_chunks = await self.retrieval.search(query, top_k=20)
-            
-            # Filter to this lender
-            lender_chunks = [
-                c for c in all_chunks
-                if c.get("lender", "").lower() == self.lender_name.lower()
-            ]
-            
-            # If no specific chunks, try getting any chunks for this lender
-            if not lender_chunks:
-                from sqlalchemy import text, bindparam
-                from app.db import async_session
-                
-                # Use separate session to avoid transaction conflicts
-                async with async_session() as session:
-                    sql = text("""
-                        SELECT c.content, c.section_path, d.filename
-                        FROM chunks c
-                        JOIN documents d ON c.document_id = d.id
-                        WHERE d.lender = :lender AND d.status::text = 'active'
-                        LIMIT 10
-                    """).bindparams(bindparam("lender", value=self.lender_name))
-                    result = await session.execute(sql)
-                    rows = result.fetchall()
-                    lender_chunks = [
-                        {"content": r.content, "section_path": r.section_path, "filename": r.filename}
-                        for r in rows
-                    ]
-            
-            return lender_chunks[:10]
+            query = build_specialist_query(scenario)
+            return await self.retrieval.search(
+                query, top_k=settings.specialist_top_k, lender=self.lender_name
+            )
         except Exception as e:
             print(f"SpecialistAgent._get_lender_chunks error for {self.lender_name}: {e}")
             return []
     
-    def _build_query(self, scenario: dict) -> str:
-        """Build search query from scenario."""
-        parts = [self.lender_name]
-        if scenario.get("doc_type"):
-            parts.append(scenario["doc_type"])
-        if scenario.get("loan_purpose"):
-            parts.append(scenario["loan_purpose"])
-        
-        return " ".join(parts) + " eligibility"
-    
     def _format_chunks(self, chunks: list[dict]) -> str:
         """Format chunks for prompt."""
         if not chunks:
             return f"No specific {self.lender_name} documentation available."
         
-        lines = []
-        for i, chunk in enumerate(chunks[:8], 1):
+        def render(index: int, chunk: dict, content: str) -> str:
             source = chunk.get("filename", chunk.get("section_path", "Unknown"))
-            content = chunk.get("content", "")[:500]
-            lines.append(f"[Source: {source}]\n{content}\n")
+            return f"[Source: {source}]\n{content}\n"
         
-        return "\n".join(lines)
+        return pack_chunks(
+            chunks,
+            settings.specialist_context_tokens,
+            render,
+            stage="specialist",
+            max_item_tokens=settings.max_chunk_tokens
+        ).text
     
     def _format_rules(self, rules: list) -> str:
         """Format structured rules for prompt."""
         if not rules:
             return "No structured eligibility rules available."
         
-        lines = []
-        for rule in rules[:10]:
-            line = f"- Program: {rule.program or 'Standard'}"
-            if rule.fico_min:
-                line += f", FICO {rule.fico_min}+"
-            if rule.ltv_max:
-                line += f", Max LTV {rule.ltv_max}%"
-            if rule.doc_types:
-                line += f", Doc Types: {', '.join(rule.doc_types)}"
-            if rule.purposes:
-                line += f", Purposes: {', '.join(rule.purposes)}"
-            lines.append(line)
-        
-        return "\n".join(lines)
+        lines = [f"- {format_rule(rule)}" for rule in rules]
+        return pack_lines(lines, settings.rules_context_tokens, stage="specialist_rules").text
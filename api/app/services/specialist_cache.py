@@ -0,0 +1,236 @@
+"""
+Specialist Cache - Reuse specialist analyses across similar scenarios
+
+Most questions fall into a few scenario shapes, and a specialist's answer
+depends only on its lender's corpus and on which side of each matrix
+threshold the scenario falls. Results are cached under:
+1. The lender
+2. The canonical scenario: enum values normalized (fact_parser), FICO /
+   LTV / loan amount replaced by the bracket they fall in between the
+   lender's own rule thresholds (a fixed grid when it has none)
+3. The lender's corpus generation, a Redis counter bumped after every
+   admin change to its documents or rules, so edits invalidate at once
+Storage mirrors llm_cache: in-process LRU with TTL, then Redis.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import time
+
+from app.config import settings
+from app.redis_client import get_redis, mark_redis_unavailable
+from app.services.fact_parser import parse_field_value
+
+# Scenario fields a specialist prompt uses (BaseAgent._format_scenario)
+SCENARIO_FIELDS = (
+    "state", "loan_purpose", "occupancy", "property_type",
+    "loan_amount", "ltv", "fico", "doc_type", "credit_events",
+)
+
+# Grid for lenders without rule thresholds on a field
+FICO_STEP = 20
+LTV_STEP = 5
+LOAN_AMOUNT_STEP = 100_000
+
+# field -> (Rule lower-bound column, Rule upper-bound column, fallback step)
+NUMERIC_FIELDS = {
+    "fico": ("fico_min", "fico_max", FICO_STEP),
+    "ltv": (None, "ltv_max", LTV_STEP),
+    "loan_amount": ("loan_min", "loan_max", LOAN_AMOUNT_STEP),
+}
+
+
+def _number(field: str, value) -> float | None:
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = parse_field_value(field, str(value))
+    return float(parsed) if parsed is not None else None
+
+
+def _thresholds(rules: list, column: str | None) -> set[float]:
+    if column is None:
+        return set()
+    return {float(getattr(rule, column)) for rule in rules if getattr(rule, column, None) is not None}
+
+
+def _bracket(value: float, lower_bounds: set[float], upper_bounds: set[float], step: int) -> str:
+    """
+    Label for the interval between the nearest thresholds around value.
+    Two values with the same label pass and fail exactly the same rules.
+    """
+    if not lower_bounds and not upper_bounds:
+        low = value // step * step
+        return f"{low:g}-{low + step:g}"
+    lower = max((t for t in lower_bounds if t <= value), default=None)
+    upper = min((t for t in upper_bounds if t >= value), default=None)
+    return f"{'' if lower is None else f'{lower:g}'}..{'' if upper is None else f'{upper:g}'}"
+
+
+def canonical_scenario(scenario: dict, rules: list) -> dict:
+    """Scenario reduced to what can change this lender's answer."""
+    canonical = {}
+    for field in SCENARIO_FIELDS:
+        value = scenario.get(field)
+        if not value:
+            continue
+
+        if field in NUMERIC_FIELDS:
+            number = _number(field, value)
+            if number is None:
+                canonical[field] = str(value).strip().lower()
+                continue
+            lower_column, upper_column, step = NUMERIC_FIELDS[field]
+            lower_bounds = _thresholds(rules, lower_column)
+            upper_bounds = _thresholds(rules, upper_column)
+            canonical[field] = _bracket(number, lower_bounds, upper_bounds, step)
+        elif isinstance(value, (list, tuple)):
+            canonical[field] = sorted(str(v).strip().lower() for v in value)
+        else:
+            text = str(value).strip()
+            canonical[field] = parse_field_value(field, text) or " ".join(text.lower().split())
+    return canonical
+
+
+class SpecialistCache:
+    """LRU + Redis cache of specialist results keyed by lender, canonical scenario and corpus generation."""
+
+    def __init__(self, max_size: int | None = None, ttl_seconds: int | None = None):
+        self.max_size = max_size if max_size is not None else settings.specialist_cache_size
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.specialist_cache_ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        # Generations bumped in this process (used when Redis is unavailable)
+        self._generations: dict[str, int] = {}
+        # lender + scenario digest -> newest generation stored, to spot invalidated misses
+        self._stored_generation: dict[str, int] = {}
+        self.clear()
+
+    # --- Corpus generation ---
+
+    @staticmethod
+    def _generation_key(lender: str) -> str:
+        return f"owly:corpus_gen:{lender.strip().lower()}"
+
+    async def generation(self, lender: str) -> int:
+        """Current corpus generation for lender (0 until its corpus first changes)."""
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(self._generation_key(lender))
+                return int(raw) if raw else 0
+            except Exception as e:
+                mark_redis_unavailable(e)
+        return self._generations.get(lender.strip().lower(), 0)
+
+    async def bump_generation(self, *lenders: str | None) -> None:
+        """Invalidate every cached result for these lenders (call after the change is committed)."""
+        for lender in {l.strip().lower() for l in lenders if l}:
+            self._generations[lender] = self._generations.get(lender, 0) + 1
+            self.generation_bumps += 1
+            redis = get_redis()
+            if redis is not None:
+                try:
+                    await redis.incr(self._generation_key(lender))
+                except Exception as e:
+                    mark_redis_unavailable(e)
+
+    # --- Results ---
+
+    async def key(self, lender: str, scenario: dict, rules: list) -> str:
+        canonical = json.dumps(canonical_scenario(scenario, rules), sort_keys=True, ensure_ascii=False)
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        generation = await self.generation(lender)
+        return f"owly:specialist:{lender.strip().lower()}:{digest}:g{generation}"
+
+    async def get(self, key: str) -> dict | None:
+        """Return a copy of the cached result for key, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return self._hit(entry[1])
+        if entry is not None:
+            del self._entries[key]
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(key)
+            except Exception as e:
+                mark_redis_unavailable(e)
+                raw = None
+            if raw:
+                payload = raw.decode("utf-8")
+                self._remember(key, payload)
+                self.redis_hits += 1
+                return self._hit(payload)
+
+        self.misses += 1
+        identity, generation = key.rsplit(":g", 1)
+        if self._stored_generation.get(identity, int(generation)) < int(generation):
+            self.stale_misses += 1
+        return None
+
+    async def set(self, key: str, result: dict) -> None:
+        """Store a successful specialist result in both tiers."""
+        payload = json.dumps({"stored_at": time.time(), "result": result}, ensure_ascii=False, default=str)
+        self._remember(key, payload)
+        identity, generation = key.rsplit(":g", 1)
+        self._stored_generation.pop(identity, None)
+        self._stored_generation[identity] = int(generation)
+        while len(self._stored_generation) > self.max_size * 4:
+            self._stored_generation.pop(next(iter(self._stored_generation)))
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(key, payload.encode("utf-8"), ex=self.ttl_seconds)
+            except Exception as e:
+                mark_redis_unavailable(e)
+
+    def _hit(self, payload: str) -> dict:
+        entry = json.loads(payload)
+        age = time.time() - entry["stored_at"]
+        self.total_hit_age += age
+        self.max_hit_age = max(self.max_hit_age, age)
+        return entry["result"]
+
+    def _remember(self, key: str, payload: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop the in-process tier and reset counters."""
+        self._entries.clear()
+        self._generations.clear()
+        self._stored_generation.clear()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.stale_misses = 0
+        self.generation_bumps = 0
+        self.total_hit_age = 0.0
+        self.max_hit_age = 0.0
+
+    def stats(self) -> dict:
+        """Hit rate and staleness for the admin metrics endpoint."""
+        hits = self.memory_hits + self.redis_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            # Misses on a scenario cached before its lender's corpus changed
+            "invalidated_misses": self.stale_misses,
+            "generation_bumps": self.generation_bumps,
+            "avg_hit_age_seconds": round(self.total_hit_age / hits, 1) if hits else 0.0,
+            "max_hit_age_seconds": round(self.max_hit_age, 1)
+        }
+
+
+# Process-wide cache shared by every specialist
+specialist_cache = SpecialistCache()
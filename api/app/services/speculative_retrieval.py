@@ -0,0 +1,62 @@
+"""
+Speculative Retrieval - Start the chunk search before the intent is known
+
+Product-search and eligibility turns search chunks with the raw user
+message, which does not depend on the classifier's answer. ChatService
+starts that search while the intent is being classified; the result is
+used if the routed handler needs it and cancelled otherwise. Counters
+show how often the speculation paid off.
+"""
+import asyncio
+
+from app.services.retrieval_service import RetrievalService
+
+
+class SpeculativeRetrieval:
+    """Starts, hands over or discards speculative searches; keeps counters."""
+
+    def __init__(self):
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+
+    def start(self, retrieval: RetrievalService, query: str, top_k: int) -> asyncio.Task:
+        """Start retrieval.search(query) in the background."""
+        self.started += 1
+        return asyncio.ensure_future(retrieval.search(query, top_k=top_k, lender_match="contains"))
+
+    async def use(self, task: asyncio.Task, limit: int) -> list[dict] | None:
+        """
+        Top `limit` chunks of a speculative search, or None when it came back
+        empty (search() swallows errors) and the caller should search itself.
+        """
+        chunks = await task
+        if not chunks:
+            self.wasted += 1
+            return None
+        self.used += 1
+        return chunks[:limit]
+
+    def discard(self, task: asyncio.Task) -> None:
+        """The routed handler does not need the chunks; stop the search."""
+        task.cancel()
+        self.wasted += 1
+
+    def reset_stats(self) -> None:
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+
+    def stats(self) -> dict:
+        """Used/wasted counters for the admin metrics endpoint."""
+        settled = self.used + self.wasted
+        return {
+            "started": self.started,
+            "used": self.used,
+            "wasted": self.wasted,
+            "use_rate": round(self.used / settled, 3) if settled else 0.0
+        }
+
+
+# Process-wide counters shared by every ChatService
+speculative_retrieval = SpeculativeRetrieval()
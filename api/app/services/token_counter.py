@@ -0,0 +1,47 @@
+"""
+Token counting helpers backed by tiktoken.
+
+cl100k_base is the tokenizer of text-embedding-3-* and a close estimate for
+GPT-4o prompts (tiktoken 0.5 predates o200k_base). If the BPE file cannot be
+loaded (offline container), we fall back to the ~4 chars/token heuristic.
+"""
+import tiktoken
+
+ENCODING_NAME = "cl100k_base"
+CHARS_PER_TOKEN = 4
+
+_encoding: tiktoken.Encoding | None = None
+_encoding_failed = False
+
+
+def _get_encoding() -> tiktoken.Encoding | None:
+    """Load the tokenizer once; remember failures so we don't retry every call."""
+    global _encoding, _encoding_failed
+
+    if _encoding is None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding(ENCODING_NAME)
+        except Exception as e:
+            print(f"token_counter: tiktoken unavailable, estimating tokens: {e}")
+            _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -0,0 +1,89 @@
+"""
+Vector Index Service - Lifecycle of the ANN index on chunks.embedding
+
+Without an HNSW/IVFFlat index, `ORDER BY embedding <=> ...` is a sequential
+scan that grows with every uploaded guideline. Index type and build
+parameters come from settings; rebuilds run CONCURRENTLY so searches keep
+working while the new index is built.
+
+With settings.retrieval_backend = "local" both operations act on the
+in-process memory-mapped index instead.
+"""
+import time
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import engine, VECTOR_INDEX_NAME, vector_index_ddl
+from app.services.local_vector_index import local_vector_index
+
+
+class VectorIndexService:
+    """Create, inspect and rebuild the chunks.embedding ANN index."""
+
+    async def status(self) -> dict:
+        """Report the index as built (method and definition from pg_indexes), its size and the number of chunks."""
+        if settings.retrieval_backend == "local":
+            return local_vector_index.status()
+
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                text("""
+                    SELECT
+                        i.indexdef,
+                        am.amname AS method,
+                        pg_relation_size(c.oid) AS size_bytes,
+                        pg_size_pretty(pg_relation_size(c.oid)) AS size
+                    FROM pg_indexes i
+                    JOIN pg_class c ON c.relname = i.indexname
+                    JOIN pg_am am ON am.oid = c.relam
+                    WHERE i.tablename = 'chunks' AND i.indexname = :name
+                """),
+                {"name": VECTOR_INDEX_NAME}
+            )
+            row = result.first()
+
+            count_result = await conn.execute(text("SELECT count(*) FROM chunks"))
+            chunks_count = count_result.scalar() or 0
+
+        return {
+            "name": VECTOR_INDEX_NAME,
+            # The built index, which differs from settings until the next rebuild
+            "method": row.method if row else None,
+            "exists": row is not None,
+            "definition": row.indexdef if row else None,
+            "size_bytes": int(row.size_bytes) if row else 0,
+            "size": row.size if row else "0 bytes",
+            "chunks_count": chunks_count,
+            "build_seconds": None
+        }
+
+    async def rebuild(self) -> dict:
+        """
+        Rebuild the index with the current settings without blocking searches.
+
+        Builds a new index CONCURRENTLY, then swaps it in for the old one.
+        This also applies changes to the index type or build parameters.
+        """
+        if settings.retrieval_backend == "local":
+            return await local_vector_index.rebuild()
+
+        new_name = f"{VECTOR_INDEX_NAME}_new"
+
+        # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+            # Leftover from an interrupted rebuild would be INVALID - drop it
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {new_name}"))
+
+            started = time.perf_counter()
+            await conn.execute(text(vector_index_ddl(name=new_name, concurrently=True)))
+            build_seconds = time.perf_counter() - started
+
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {VECTOR_INDEX_NAME}"))
+            await conn.execute(text(f"ALTER INDEX {new_name} RENAME TO {VECTOR_INDEX_NAME}"))
+
+        result = await self.status()
+        result["build_seconds"] = round(build_seconds, 3)
+        return result
@@ -0,0 +1,94 @@
+"""
+Benchmark: text-encoded ORM vector search vs the asyncpg binary fast path.
+
+Usage (from api/):
+    python -m benchmarks.bench_retrieval                 # encoding only, no DB needed
+    python -m benchmarks.bench_retrieval --db -n 200     # also run both query paths
+
+With --db the query vector is random (unit length) unless --query is given,
+in which case it is embedded once through OpenAI.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import numpy as np
+from pgvector.utils import to_db_binary
+
+from app.config import settings
+from app.db import close_vector_pool
+from app.services.retrieval_service import RetrievalService
+
+DIMENSIONS = 1536
+
+
+def _percentiles(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2]
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"mean {statistics.mean(ordered):8.3f} ms | p50 {p50:8.3f} ms | p95 {p95:8.3f} ms"
+
+
+def bench_encoding(iterations: int) -> None:
+    """CPU cost and payload size of sending one embedding per query."""
+    embedding = np.random.default_rng(0).standard_normal(DIMENSIONS).astype(np.float32)
+
+    text_times, binary_times = [], []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        literal = "[" + ",".join(str(x) for x in embedding) + "]"
+        text_times.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        payload = to_db_binary(embedding)
+        binary_times.append((time.perf_counter() - started) * 1000)
+
+    print("Embedding encoding")
+    print(f"  text literal  ({len(literal):>6} bytes): {_percentiles(text_times)}")
+    print(f"  binary codec  ({len(payload):>6} bytes): {_percentiles(binary_times)}")
+
+
+async def bench_queries(iterations: int, top_k: int, query: str | None) -> None:
+    """End-to-end latency of both vector query paths against the configured database."""
+    service = RetrievalService(db=None)
+    if query:
+        embedding = await service._embed(query)
+    else:
+        embedding = np.random.default_rng(1).standard_normal(DIMENSIONS).astype(np.float32)
+        embedding /= np.linalg.norm(embedding)
+
+    where, params = service._build_filters(None, None, None)
+    paths = {
+        "orm (text)": service._vector_search_orm,
+        "asyncpg (binary)": service._vector_search_fast,
+    }
+
+    print(f"Vector query, top_k={top_k}, {iterations} iterations ({settings.vector_index_type})")
+    for name, search in paths.items():
+        await search(embedding, top_k, where, params)  # warm up pools / statement cache
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            await search(embedding, top_k, where, params)
+            samples.append((time.perf_counter() - started) * 1000)
+        print(f"  {name:<17}: {_percentiles(samples)}")
+
+    await close_vector_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--db", action="store_true", help="Benchmark both query paths against DATABASE_URL")
+    parser.add_argument("--query", help="Embed this text instead of using a random vector")
+    args = parser.parse_args()
+
+    bench_encoding(args.iterations)
+    if args.db:
+        asyncio.run(bench_queries(args.iterations, args.top_k, args.query))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+-- Migration: Index chunks by document
+-- Date: 2026-10-17
+-- Description: Lender/document-filtered vector searches join chunks to a
+--              handful of documents. Without this index the planner has to
+--              scan every chunk to find the ones belonging to them.
+--
+-- New databases get this index from create_all (Chunk.document_id index=True).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chunks_document_id
+ON chunks (document_id);
@@ -0,0 +1,9 @@
+-- Migration: Keep the last analysis on the conversation
+-- Date: 2026-10-17
+-- Description: Adds analysis_state to conversations: the scenario, Leader
+--              candidates and per-lender specialist results of the last
+--              full analysis. A what-if follow-up ("what if LTV is 75?")
+--              re-runs only the specialists the changed fact affects.
+
+ALTER TABLE conversations
+ADD COLUMN IF NOT EXISTS analysis_state JSONB NULL;
@@ -9,6 +9,19 @@ from uuid import uuid4
 from app.services.intent_classifier import IntentClassifier, IntentType
 from app.services.general_qa_service import GeneralQAService
 from app.services.chat_service import ChatService
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_batcher import embedding_batcher
+from app.services.llm_cache import llm_cache
+from app.services.local_intent_classifier import local_intent_classifier
+from app.services.speculative_retrieval import speculative_retrieval
+from app.services.pipeline import pipeline_stats
+from app.services.prompt_packer import packing_stats
+from app.services.llm_scheduler import llm_scheduler, RateLimiter
+from app.services.specialist_cache import specialist_cache
+from app.services.incremental_analysis import incremental_analysis
+from app.services.deadline import Deadline, stage_latency
+from app.config import settings
+from app import db as db_module
 
 
 @pytest.fixture(scope="session")
@@ -19,6 +32,28 @@ def event_loop():
     loop.close()
 
 
+@pytest.fixture(autouse=True)
+def isolated_caches(monkeypatch):
+    """Keep tests off the real Redis and start every test with empty caches."""
+    monkeypatch.setattr(settings, "redis_cache_enabled", False)
+    embedding_cache.clear()
+    embedding_batcher.reset_stats()
+    llm_cache.clear()
+    specialist_cache.clear()
+    local_intent_classifier.reset_stats()
+    speculative_retrieval.reset_stats()
+    pipeline_stats.reset_stats()
+    packing_stats.reset_stats()
+    llm_scheduler.reset_stats()
+    incremental_analysis.reset_stats()
+    stage_latency.reset_stats()
+    monkeypatch.setattr(llm_scheduler, "limiter", RateLimiter())
+    monkeypatch.setattr(db_module, "pgvector_version", None)
+    yield
+    embedding_cache.clear()
+    llm_cache.clear()
+
+
 @pytest.fixture
 def mock_db():
     """Mock database session."""
@@ -55,4 +90,9 @@ def general_qa_service(mock_db):
 @pytest.fixture
 def chat_service(mock_db):
     """Create ChatService with mocked DB."""
-    return ChatService(mock_db)
+    service = ChatService(mock_db)
+    # process_message sets one per turn; tests that call the stages directly share this one
+    service.deadline = Deadline(settings.chat_deadline_seconds)
+    # Lender lookup opens its own session; keep it off the real database
+    service.agent_factory.get_available_lenders = AsyncMock(return_value=[])
+    return service
@@ -0,0 +1,138 @@
+"""
+Tests for the streaming chat endpoint.
+
+These tests verify that:
+1. The evaluator hands tokens to the caller as the model streams them
+2. ChatService emits progress events while a turn runs
+3. The SSE generator relays events and ends with the final payload
+"""
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.routers import chat as chat_router
+from app.services.evaluator_agent import EvaluatorAgent
+from app.services.intent_classifier import IntentType
+
+
+def _stream_chunk(text: str):
+    chunk = MagicMock()
+    chunk.choices = [MagicMock()]
+    chunk.choices[0].delta.content = text
+    return chunk
+
+
+async def _fake_stream(texts):
+    for text in texts:
+        yield _stream_chunk(text)
+
+
+def _parse_sse(raw: list[str]) -> list[tuple[str, dict]]:
+    events = []
+    for message in raw:
+        event_line, data_line = message.strip().split("\n")
+        events.append((event_line.removeprefix("event: "), json.loads(data_line.removeprefix("data: "))))
+    return events
+
+
+class TestEvaluatorStreaming:
+    """The evaluator's analysis is streamed token by token."""
+
+    @pytest.mark.asyncio
+    async def test_tokens_are_forwarded(self):
+        evaluator = EvaluatorAgent()
+        tokens = []
+
+        async def on_token(token):
+            tokens.append(token)
+
+        with patch.object(evaluator.client.chat.completions, 'create', new_callable=AsyncMock) as mock_create:
+            mock_create.return_value = _fake_stream(["Go with ", "Lender A", "."])
+            result = await evaluator.analyze(
+                {"fico": 740},
+                context={"specialist_analyses": [{"lender": "Lender A"}], "on_token": on_token}
+            )
+
+        assert tokens == ["Go with ", "Lender A", "."]
+        assert result["analysis"] == "Go with Lender A."
+        assert mock_create.call_args.kwargs["stream"] is True
+
+
+class TestChatServiceEvents:
+    """process_message reports progress through emit."""
+
+    @pytest.mark.asyncio
+    async def test_intent_event(self, chat_service, monkeypatch):
+        monkeypatch.setattr(chat_service, "_get_last_assistant_message", AsyncMock(return_value=None))
+        events = []
+
+        async def emit(event, data):
+            events.append((event, data))
+
+        await chat_service.process_message("summarize what you know", emit=emit)
+
+        assert events[0] == ("intent", {"intent": IntentType.SUMMARY_REQUEST, "confidence": 0.95})
+
+    @pytest.mark.asyncio
+    async def test_specialist_event_on_completion(self, chat_service):
+        events = []
+
+        async def emit(event, data):
+            events.append((event, data))
+
+        chat_service.emit = emit
+        agent = MagicMock(lender_name="Lender A")
+        agent.analyze = AsyncMock(return_value={"lender": "Lender A", "eligible_products": [{"program": "Prime"}]})
+
+        await chat_service._run_specialist_with_timeout(agent, {"fico": 740})
+
+        assert events == [("specialist", {
+            "lender": "Lender A",
+            "eligible_products": [{"program": "Prime"}],
+            "summary": None,
+            "error": None
+        })]
+
+
+class TestChatStreamEndpoint:
+    """The SSE generator relays events and commits before the final event."""
+
+    @pytest.mark.asyncio
+    async def test_events_end_with_done(self, mock_db):
+        async def process_message(message, conversation_id=None, emit=None, deadline=None):
+            await emit("intent", {"intent": "scenario_input", "confidence": 0.9})
+            await emit("token", {"text": "Hello"})
+            return {"response": "Hello", "conversation_id": "abc", "facts": {"fico": 740}, "missing_fields": []}
+
+        session = MagicMock()
+        session.__aenter__ = AsyncMock(return_value=mock_db)
+        session.__aexit__ = AsyncMock(return_value=False)
+        service = MagicMock()
+        service.process_message = process_message
+
+        with patch.object(chat_router, "async_session", return_value=session), \
+             patch.object(chat_router, "ChatService", return_value=service):
+            request = chat_router.ChatRequest(message="740 FICO")
+            raw = [message async for message in chat_router._chat_events(request)]
+
+        events = _parse_sse(raw)
+        assert [name for name, _ in events] == ["intent", "token", "done"]
+        assert events[-1][1]["facts"] == {"fico": 740}
+        mock_db.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failure_ends_with_error(self, mock_db):
+        session = MagicMock()
+        session.__aenter__ = AsyncMock(return_value=mock_db)
+        session.__aexit__ = AsyncMock(return_value=False)
+        service = MagicMock()
+        service.process_message = AsyncMock(side_effect=RuntimeError("boom"))
+
+        with patch.object(chat_router, "async_session", return_value=session), \
+             patch.object(chat_router, "ChatService", return_value=service):
+            request = chat_router.ChatRequest(message="740 FICO")
+            raw = [message async for message in chat_router._chat_events(request)]
+
+        events = _parse_sse(raw)
+        assert [name for name, _ in events] == ["error"]
+        mock_db.rollback.assert_awaited_once()
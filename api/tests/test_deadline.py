@@ -0,0 +1,244 @@
+"""
+Tests for request deadline propagation.
+
+These tests verify that:
+1. Stage budgets reserve the observed median of the stages still to run
+2. LLM calls inside a request stop at its deadline instead of retrying past it
+3. Vector queries fail fast once the deadline has passed
+4. A low budget runs fewer specialists and skips the evaluator prose
+5. A slow Leader falls back to the available lenders
+6. A client disconnect cancels the running turn
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+import httpx
+import openai
+import pytest
+from tenacity import wait_fixed
+
+from app.config import settings
+from app.routers import chat as chat_router
+from app.services.deadline import Deadline, current_deadline, stage_latency
+from app.services.llm_scheduler import llm_scheduler, Priority
+from app.services.retrieval_service import _query_timeout
+
+
+def _seed(stage: str, seconds: float) -> None:
+    for _ in range(settings.latency_min_samples):
+        stage_latency.record(stage, seconds)
+
+
+def _result(lender: str) -> dict:
+    return {"lender": lender, "eligible_products": [{"program": "DSCR"}], "summary": f"{lender} works"}
+
+
+class TestBudgets:
+
+    def test_no_budget_shaping_without_samples(self):
+        stage_latency.record("evaluator", 5)
+        deadline = Deadline(10)
+
+        assert stage_latency.percentile("evaluator", 50) is None
+        assert deadline.budget("leader", after=("evaluator",)) == pytest.approx(10, abs=0.1)
+        assert not deadline.tight("evaluator")
+
+    def test_later_stages_are_reserved(self):
+        _seed("specialist", 4)
+        _seed("evaluator", 3)
+        deadline = Deadline(10)
+
+        assert deadline.budget("leader", after=("specialist", "evaluator")) == pytest.approx(3, abs=0.1)
+        assert deadline.budget("specialist", after=("evaluator",), cap=5) == pytest.approx(5)
+
+    def test_minimum_share_of_the_time_left(self, monkeypatch):
+        monkeypatch.setattr(settings, "deadline_min_stage_share", 0.3)
+        _seed("evaluator", 20)
+
+        assert Deadline(10).budget("leader", after=("evaluator",)) == pytest.approx(3, abs=0.1)
+
+    def test_tight_compares_p90_with_time_left(self):
+        _seed("specialist", 4)
+        _seed("evaluator", 3)
+
+        assert Deadline(5).tight("specialist", "evaluator")
+        assert not Deadline(10).tight("specialist", "evaluator")
+
+
+class TestDeadlinePropagation:
+
+    @pytest.mark.asyncio
+    async def test_llm_call_stops_at_the_deadline(self):
+        calls = []
+
+        async def slow_call():
+            calls.append(1)
+            await asyncio.sleep(1)
+
+        token = current_deadline.set(Deadline(0.02))
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await llm_scheduler.call(slow_call, model="gpt-4o", tokens=10, priority=Priority.INTERACTIVE)
+        finally:
+            current_deadline.reset(token)
+
+        assert len(calls) == 1
+        assert llm_scheduler.stats()["deadline_exceeded"] == 1
+
+    @pytest.mark.asyncio
+    async def test_no_retry_after_the_deadline(self):
+        request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        fn = AsyncMock(side_effect=openai.APIConnectionError(request=request))
+
+        token = current_deadline.set(Deadline(0.02))
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await llm_scheduler.call(
+                    fn, model="gpt-4o", tokens=10, priority=Priority.INTERACTIVE, wait=wait_fixed(0.05)
+                )
+        finally:
+            current_deadline.reset(token)
+
+        assert fn.await_count == 1
+
+    def test_query_timeout_follows_the_deadline(self):
+        assert _query_timeout() is None
+
+        token = current_deadline.set(Deadline(5))
+        try:
+            assert 4 < _query_timeout() <= 5
+        finally:
+            current_deadline.reset(token)
+
+        token = current_deadline.set(Deadline(-1))
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                _query_timeout()
+        finally:
+            current_deadline.reset(token)
+
+
+class TestDegradedAnalysis:
+
+    def _wire(self, chat_service, lenders: list[str]):
+        leader = MagicMock(available_lenders=lenders)
+        leader.analyze = AsyncMock(return_value={
+            "understanding": "DSCR purchase",
+            "top_candidates": [{"lender": lender} for lender in lenders],
+            "sources": []
+        })
+        specialists = {}
+        for lender in lenders:
+            agent = MagicMock(lender_name=lender)
+            agent.analyze = AsyncMock(return_value=_result(lender))
+            specialists[lender] = agent
+        evaluator = MagicMock()
+        evaluator.analyze = AsyncMock(return_value={"analysis": "Go with A"})
+        evaluator.rank = MagicMock(return_value={"recommendation": {"lender": "A"}, "alternatives": [], "sources": []})
+
+        chat_service.agent_factory.create_leader_agent = AsyncMock(return_value=leader)
+        chat_service.agent_factory.create_specialists_for_lenders = AsyncMock(
+            side_effect=lambda names, available=None: {name: specialists[name] for name in names}
+        )
+        chat_service.agent_factory.create_evaluator_agent = MagicMock(return_value=evaluator)
+        return leader, evaluator
+
+    @pytest.mark.asyncio
+    async def test_low_budget_runs_fewer_specialists_without_prose(self, chat_service, monkeypatch):
+        monkeypatch.setattr(settings, "degraded_max_specialists", 2)
+        _seed("specialist", 10)
+        _seed("evaluator", settings.chat_deadline_seconds + 5)
+        _, evaluator = self._wire(chat_service, ["A", "B", "C", "D"])
+
+        with patch.object(chat_service.retrieval, "search_by_lenders", AsyncMock(return_value={})):
+            result = await chat_service._run_multi_agent_analysis({"fico": 720, "doc_type": "dscr"})
+
+        chat_service.agent_factory.create_specialists_for_lenders.assert_called_once_with(["A", "B"], None)
+        evaluator.analyze.assert_not_called()
+        evaluator.rank.assert_called()
+        assert set(result["analysis_state"]["results"]) == {"A", "B"}
+
+    @pytest.mark.asyncio
+    async def test_full_fan_out_with_time_to_spare(self, chat_service):
+        _seed("specialist", 1)
+        _seed("evaluator", 1)
+        _, evaluator = self._wire(chat_service, ["A", "B", "C", "D"])
+
+        with patch.object(chat_service.retrieval, "search_by_lenders", AsyncMock(return_value={})):
+            await chat_service._run_multi_agent_analysis({"fico": 720, "doc_type": "dscr"})
+
+        chat_service.agent_factory.create_specialists_for_lenders.assert_called_once_with(["A", "B", "C", "D"], None)
+        evaluator.analyze.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_slow_leader_falls_back_to_available_lenders(self, chat_service):
+        leader = MagicMock(available_lenders=["A", "B"])
+
+        async def slow_analyze(scenario):
+            await asyncio.sleep(1)
+
+        leader.analyze = slow_analyze
+        chat_service.deadline = Deadline(0.02)
+
+        result = await chat_service._run_leader(leader, {"fico": 720})
+
+        assert [c["lender"] for c in result["top_candidates"]] == ["A", "B"]
+        assert result["error"] == "timeout"
+
+    @pytest.mark.asyncio
+    async def test_slow_retrieval_falls_back_to_rules(self, chat_service, monkeypatch):
+        monkeypatch.setattr(settings, "retrieval_timeout_seconds", 0.01)
+
+        async def slow_search(*args, **kwargs):
+            await asyncio.sleep(1)
+
+        rules = {"A": ["rule"]}
+        with patch.object(chat_service.retrieval, "search_by_lenders", slow_search), \
+                patch.object(chat_service.rules, "get_by_lenders", AsyncMock(return_value=rules)):
+            prefetched = await chat_service._prefetch_specialist_context({"fico": 720}, ["A", "B"])
+
+        assert prefetched == {"A": {"chunks": [], "rules": ["rule"]}, "B": {"chunks": [], "rules": []}}
+
+    @pytest.mark.asyncio
+    async def test_query_timeout_falls_back_to_rules(self, chat_service, monkeypatch):
+        monkeypatch.setattr(settings, "retrieval_fast_path", True)
+        fast = AsyncMock(side_effect=asyncio.TimeoutError)
+
+        with patch.object(chat_service.retrieval, "_search_by_lenders_fast", fast), \
+                patch.object(chat_service.rules, "get_by_lenders", AsyncMock(return_value={"A": ["rule"]})):
+            prefetched = await chat_service._prefetch_specialist_context({"fico": 720}, ["A"])
+
+        assert prefetched == {"A": {"chunks": [], "rules": ["rule"]}}
+
+
+class TestDisconnect:
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_the_turn(self, monkeypatch):
+        monkeypatch.setattr(chat_router, "DISCONNECT_POLL_SECONDS", 0.01)
+        http_request = MagicMock()
+        http_request.is_disconnected = AsyncMock(return_value=True)
+        cancelled = asyncio.Event()
+
+        async def turn():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(asyncio.CancelledError):
+            await chat_router._cancel_on_disconnect(http_request, turn())
+
+        assert cancelled.is_set()
+
+    @pytest.mark.asyncio
+    async def test_connected_client_gets_the_result(self, monkeypatch):
+        monkeypatch.setattr(chat_router, "DISCONNECT_POLL_SECONDS", 0.01)
+        http_request = MagicMock()
+        http_request.is_disconnected = AsyncMock(return_value=False)
+
+        async def turn():
+            await asyncio.sleep(0.03)
+            return {"response": "ok"}
+
+        assert await chat_router._cancel_on_disconnect(http_request, turn()) == {"response": "ok"}
@@ -183,13 +183,16 @@ class TestGenericProductQuestions:
 # Helper functions
 
 def _create_mock_chunk(lender: str, content: str):
-    """Create a mock chunk object."""
-    chunk = MagicMock()
-    chunk.content = content
-    chunk.document = MagicMock()
-    chunk.document.lender = lender
-    chunk.document.filename = f"{lender.lower()}_guidelines.pdf"
-    return chunk
+    """Create a mock chunk row as returned by RetrievalService.search."""
+    return {
+        "id": str(uuid4()),
+        "content": content,
+        "section_path": None,
+        "document_id": str(uuid4()),
+        "filename": f"{lender.lower()}_guidelines.pdf",
+        "lender": lender,
+        "similarity": 0.8
+    }
 
 
 def _create_mock_rule(lender: str, program: str, fico_min: int, ltv_max: int):
@@ -0,0 +1,214 @@
+"""
+Tests for the query embedding cache.
+
+These tests verify that:
+1. Repeated queries are embedded only once
+2. Keys are normalized (case/whitespace) and scoped to the embedding model
+3. The in-process LRU stays bounded and Redis backs it up
+4. Concurrent cache misses are micro-batched into one API call, which is
+   cancelled once every caller has given up
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import numpy as np
+
+from app.config import settings
+from app.services import embedding_cache as embedding_cache_module
+from app.services.embedding_cache import EmbeddingCache, embedding_cache
+from app.services.embedding_batcher import EmbeddingBatcher, embedding_batcher
+from app.services.retrieval_service import RetrievalService
+
+
+class FakeRedis:
+    """Minimal async stand-in for the Redis commands the cache uses."""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+
+class TestRetrievalEmbedCache:
+    """RetrievalService._embed should only call OpenAI on a cache miss."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_query_embedded_once(self, mock_db):
+        service = RetrievalService(mock_db)
+
+        with patch.object(service.client.embeddings, 'create', new_callable=AsyncMock) as mock_create:
+            mock_create.return_value = _create_embedding_response([0.1, 0.2, 0.3])
+
+            first = await service._embed("Angel Oak bank_statement purchase eligibility")
+            second = await service._embed("  angel oak BANK_STATEMENT purchase   eligibility ")
+
+            assert first.dtype == np.float32
+            assert np.array_equal(first, second)
+            mock_create.assert_called_once()
+
+        stats = embedding_cache.stats()
+        assert stats["memory_hits"] == 1
+        assert stats["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_document_chunks_bypass_cache(self, mock_db):
+        """Ingested chunks are embedded once and must not evict query entries."""
+        service = RetrievalService(mock_db)
+
+        with patch.object(service.client.embeddings, 'create', new_callable=AsyncMock) as mock_create:
+            mock_create.return_value = _create_embedding_response([0.1, 0.2, 0.3])
+            await service._embed_uncached("Chunk text")
+
+        assert embedding_cache.stats()["size"] == 0
+
+
+class TestEmbeddingCache:
+    """Unit tests for the two cache tiers."""
+
+    def test_key_includes_model(self, monkeypatch):
+        cache = EmbeddingCache(max_size=10)
+        key_small = cache.key("DSCR 0.75")
+
+        monkeypatch.setattr(settings, "embedding_model", "text-embedding-3-large")
+        assert cache.key("DSCR 0.75") != key_small
+
+    @pytest.mark.asyncio
+    async def test_lru_is_bounded(self):
+        cache = EmbeddingCache(max_size=2)
+
+        await cache.set("a", [1.0])
+        await cache.set("b", [2.0])
+        await cache.get("a")  # "a" is now most recently used
+        await cache.set("c", [3.0])
+
+        assert np.array_equal(await cache.get("a"), [1.0])
+        assert await cache.get("b") is None
+        assert cache.stats()["size"] == 2
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_backs_memory(self, monkeypatch):
+        fake_redis = FakeRedis()
+        monkeypatch.setattr(embedding_cache_module, "get_redis", lambda: fake_redis)
+
+        writer = EmbeddingCache(max_size=10)
+        await writer.set("FICO 740 eligibility", [0.5, 0.25])
+
+        # A fresh worker has an empty LRU but shares Redis
+        reader = EmbeddingCache(max_size=10)
+        assert np.array_equal(await reader.get("FICO 740 eligibility"), [0.5, 0.25])
+        assert reader.stats()["redis_hits"] == 1
+
+        # Second lookup is served from memory
+        await reader.get("FICO 740 eligibility")
+        assert reader.stats()["memory_hits"] == 1
+
+
+class TestEmbeddingBatcher:
+    """Concurrent query embeddings should share batched API calls."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_call(self, mock_db):
+        leader = RetrievalService(mock_db)
+        specialist = RetrievalService(mock_db)
+
+        with patch.object(leader.client.embeddings, 'create', new_callable=AsyncMock) as mock_create:
+            mock_create.side_effect = _echo_batch
+            results = await asyncio.gather(
+                leader._embed("UWM dscr purchase eligibility"),
+                specialist._embed("Acra dscr purchase eligibility"),
+                specialist._embed("UWM dscr purchase eligibility"),
+            )
+
+        mock_create.assert_called_once()
+        # Duplicate texts in the same window are sent once
+        assert mock_create.call_args.kwargs["input"] == [
+            "UWM dscr purchase eligibility", "Acra dscr purchase eligibility"
+        ]
+        assert results[0][0] == len("UWM dscr purchase eligibility")
+        assert results[1][0] == len("Acra dscr purchase eligibility")
+        assert np.array_equal(results[0], results[2])
+        assert embedding_batcher.stats()["avg_batch_size"] == 2.0
+
+    @pytest.mark.asyncio
+    async def test_full_batch_is_sent_immediately(self):
+        batcher = EmbeddingBatcher(window_ms=60_000, max_batch=2)
+        client = MagicMock()
+        client.embeddings.create = AsyncMock(side_effect=_echo_batch)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.embed(client, "a"), batcher.embed(client, "bb")),
+            timeout=1
+        )
+
+        assert [r[0] for r in results] == [1.0, 2.0]
+
+    @pytest.mark.asyncio
+    async def test_error_reaches_every_waiter(self):
+        batcher = EmbeddingBatcher(window_ms=1, max_batch=10)
+        client = MagicMock()
+        client.embeddings.create = AsyncMock(side_effect=RuntimeError("API down"))
+
+        results = await asyncio.gather(
+            batcher.embed(client, "a"), batcher.embed(client, "b"), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_call_cancelled_when_every_caller_gives_up(self):
+        batcher = EmbeddingBatcher(window_ms=1, max_batch=10)
+        cancelled = asyncio.Event()
+
+        async def slow_create(model, input):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        client = MagicMock()
+        client.embeddings.create = AsyncMock(side_effect=slow_create)
+        waiters = [asyncio.ensure_future(batcher.embed(client, text)) for text in ("a", "b")]
+        await asyncio.sleep(0.02)
+
+        waiters[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()
+
+        waiters[1].cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_texts_are_not_sent(self):
+        batcher = EmbeddingBatcher(window_ms=1, max_batch=10)
+        client = MagicMock()
+        client.embeddings.create = AsyncMock(side_effect=_echo_batch)
+
+        abandoned = asyncio.ensure_future(batcher.embed(client, "discarded speculation"))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        result = await batcher.embed(client, "kept")
+
+        assert result[0] == len("kept")
+        assert client.embeddings.create.call_args.kwargs["input"] == ["kept"]
+
+
+def _echo_batch(model, input):
+    """Fake batched response: one vector per input encoding its length, out of order."""
+    response = MagicMock()
+    response.data = [
+        MagicMock(index=i, embedding=[float(len(text)), 0.0])
+        for i, text in reversed(list(enumerate(input)))
+    ]
+    return response
+
+
+def _create_embedding_response(embedding: list[float]):
+    """Create a mock embeddings API response."""
+    response = MagicMock()
+    response.data = [MagicMock(embedding=embedding)]
+    return response
@@ -0,0 +1,148 @@
+"""
+Tests for the deterministic fact parser.
+
+These tests verify that:
+1. Free-text scenarios (English and Spanish) yield the expected key facts
+2. Short answers map to the same values as the LLM mapping guide; a
+   number is an answer only as the whole message and within range
+3. extract_facts only calls the LLM when a mentioned field is unresolved
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.config import settings
+from app.services.fact_parser import US_STATES, parse_facts, unresolved_fields
+from app.services.llm_service import LLMService
+from tests.test_questions import ALL_QUESTIONS
+
+
+# test_questions uses a few labels that differ from the normalized values
+ENTITY_ALIASES = {"asset_depletion": "asset_utilization"}
+
+
+def _normalize_expected(entities: dict) -> dict:
+    expected = {}
+    for field, value in entities.items():
+        if field == "state":
+            value = US_STATES[value]
+        expected[field] = ENTITY_ALIASES.get(value, value)
+    return expected
+
+
+class TestParseFacts:
+    """Regex extraction against the real LO questions."""
+
+    @pytest.mark.parametrize("case", ALL_QUESTIONS)
+    def test_key_entities(self, case):
+        facts = parse_facts(case["question"])
+
+        for field, value in _normalize_expected(case["key_entities"]).items():
+            assert facts.get(field) == value, f"{case['question']}: {field}"
+
+    def test_down_payment_and_price_give_ltv_and_loan_amount(self):
+        facts = parse_facts("Credit score de 740, 20% de down payment en una casa de $400,000")
+
+        assert facts["ltv"] == 80
+        assert facts["loan_amount"] == 320000
+        assert facts["loan_purpose"] == "purchase"
+
+    def test_english_scenario(self):
+        facts = parse_facts("Cash-out refi on a duplex in TX, 700 FICO, 75 LTV, bank statements")
+
+        assert facts == {
+            "fico": 700, "ltv": 75, "state": "texas", "loan_purpose": "cashout",
+            "property_type": "2-4_unit", "doc_type": "bank_statement"
+        }
+
+    def test_program_names_are_not_states(self):
+        assert "state" not in parse_facts("Score 590, ¿VA loan opciones?")
+
+    @pytest.mark.parametrize("message,field,expected", [
+        ("California", "state", {"state": "california"}),
+        ("740", "fico", {"fico": 740}),
+        ("20% down", "ltv", {"ltv": 80}),
+        ("$450k", "loan_amount", {"loan_amount": 450000}),
+        ("No", "credit_events", {"credit_events": "none"}),
+        ("A house", "property_type", {"property_type": "sfr"}),
+    ])
+    def test_short_answers(self, message, field, expected):
+        assert parse_facts(message, last_question_field=field) == expected
+
+    @pytest.mark.parametrize("message,field", [
+        ("Top 3 lenders", "loan_amount"),
+        ("Show me 10 lenders", "ltv"),
+        ("5000", "loan_amount"),
+        ("$400,000", "ltv"),
+        ("0%", "ltv"),
+        ("120", "ltv"),
+        ("250", "fico"),
+        ("900", "fico"),
+        ("80%", "fico"),
+    ])
+    def test_numbers_that_are_not_the_answer(self, message, field):
+        assert field not in parse_facts(message, last_question_field=field)
+
+    def test_bare_answers_need_the_matching_question(self):
+        assert parse_facts("No", last_question_field="occupancy") == {}
+        assert parse_facts("No") == {}
+
+    @pytest.mark.parametrize("message,expected", [
+        ("It is a second home", {"occupancy": "second_home"}),
+        ("They want to refinance their home", {"loan_purpose": "rate_term_refi"}),
+    ])
+    def test_home_is_not_a_property_type(self, message, expected):
+        assert parse_facts(message) == expected
+
+    def test_what_if_ltv(self):
+        assert parse_facts("what if LTV is 75?") == {"ltv": 75}
+
+    def test_unresolved_fields(self):
+        message = "Escuchó que USDA no requiere down payment, credit score 700"
+
+        assert unresolved_fields(message, parse_facts(message)) == ["ltv"]
+
+    def test_price_is_a_loan_amount_cue(self):
+        assert parse_facts("Price 500,000 with 20% down") == {"ltv": 80, "loan_amount": 400000}
+        assert parse_facts("Purchase price is $650k, 700 FICO")["loan_purpose"] == "purchase"
+        # Without a down payment the price alone does not give the loan amount
+        message = "Purchase price is $650k, 700 FICO"
+        assert unresolved_fields(message, parse_facts(message)) == ["loan_amount"]
+
+
+class TestExtractFactsFastPath:
+    """LLMService.extract_facts skips the LLM when the parser resolves everything."""
+
+    @pytest.mark.asyncio
+    async def test_resolved_message_skips_llm(self):
+        service = LLMService()
+
+        with patch.object(service.client.chat.completions, 'create', new_callable=AsyncMock) as mock_create:
+            facts = await service.extract_facts("Florida", {}, last_question_field="state")
+
+        mock_create.assert_not_called()
+        assert facts == {"state": "florida"}
+
+    @pytest.mark.asyncio
+    async def test_unresolved_field_calls_llm_and_merges(self, mock_openai_response):
+        service = LLMService()
+
+        with patch.object(service.client.chat.completions, 'create', new_callable=AsyncMock) as mock_create:
+            mock_create.return_value = mock_openai_response('{"ltv": 100}')
+            facts = await service.extract_facts(
+                "Escuchó que USDA no requiere down payment, credit score 700", {}
+            )
+
+        mock_create.assert_called_once()
+        assert facts["fico"] == 700
+        assert facts["ltv"] == 100
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_setting(self, mock_openai_response, monkeypatch):
+        monkeypatch.setattr(settings, "local_fact_parser_enabled", False)
+        service = LLMService()
+
+        with patch.object(service.client.chat.completions, 'create', new_callable=AsyncMock) as mock_create:
+            mock_create.return_value = mock_openai_response('{"state": "florida"}')
+            await service.extract_facts("Florida", {}, last_question_field="state")
+
+        mock_create.assert_called_once()
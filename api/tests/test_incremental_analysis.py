@@ -0,0 +1,117 @@
+"""
+Tests for incremental re-analysis of what-if follow-ups.
+
+These tests verify that:
+1. Only lenders whose rule brackets the changed fact crosses are re-run
+2. Corpus changes and missing results force a re-run
+3. Too many changed facts, or any enum change, fall back to the full analysis
+4. The chat flow reuses the Leader and untouched specialist results
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+
+from app.models.document import Rule
+from app.services.incremental_analysis import incremental_analysis
+from app.services.specialist_cache import specialist_cache
+
+
+SCENARIO = {
+    "state": "florida", "loan_purpose": "purchase", "occupancy": "investment", "property_type": "sfr",
+    "loan_amount": 400000, "ltv": 80, "fico": 720, "doc_type": "dscr", "credit_events": "none"
+}
+
+# UWM tops out at 75% LTV; Acra allows 80% and 85%
+RULES = {
+    "UWM": [Rule(lender="UWM", program="DSCR", fico_min=660, ltv_max=75)],
+    "Acra": [Rule(lender="Acra", program="DSCR", fico_min=660, ltv_max=80),
+             Rule(lender="Acra", program="DSCR Plus", fico_min=700, ltv_max=85)],
+}
+
+
+def _result(lender: str) -> dict:
+    return {"lender": lender, "eligible_products": [{"program": "DSCR"}], "summary": f"{lender} works"}
+
+
+async def _previous_state() -> dict:
+    leader = {"understanding": "DSCR purchase", "top_candidates": [{"lender": "UWM"}, {"lender": "Acra"}], "sources": []}
+    return await incremental_analysis.snapshot(SCENARIO, leader, [_result("UWM"), _result("Acra")])
+
+
+class TestIncrementalPlan:
+
+    @pytest.mark.asyncio
+    async def test_only_lenders_crossing_a_threshold_rerun(self):
+        plan = await incremental_analysis.plan(await _previous_state(), {**SCENARIO, "ltv": 75}, RULES)
+
+        # 80 -> 75 crosses UWM's 75% limit but stays inside Acra's (..80] bracket
+        assert plan["rerun"] == ["UWM"]
+        assert plan["reused"] == {"Acra": _result("Acra")}
+        assert incremental_analysis.stats()["reuse_rate"] == 0.5
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("field,value", [
+        ("occupancy", "primary"), ("doc_type", "bank_statement"), ("loan_purpose", "cashout"), ("state", "texas"),
+    ])
+    async def test_enum_change_runs_full_analysis(self, field, value):
+        # The Leader picked its candidates for the old value; only numeric changes reuse them
+        assert await incremental_analysis.plan(await _previous_state(), {**SCENARIO, field: value}, RULES) is None
+
+    @pytest.mark.asyncio
+    async def test_numeric_changes_reuse_the_leader(self):
+        plan = await incremental_analysis.plan(await _previous_state(), {**SCENARIO, "ltv": 85, "fico": 700}, RULES)
+
+        assert plan["leader"]["top_candidates"] == [{"lender": "UWM"}, {"lender": "Acra"}]
+        assert plan["rerun"] == ["Acra"]
+
+    @pytest.mark.asyncio
+    async def test_corpus_change_reruns_that_lender(self):
+        previous = await _previous_state()
+        await specialist_cache.bump_generation("Acra")
+
+        plan = await incremental_analysis.plan(previous, SCENARIO, RULES)
+
+        assert plan["rerun"] == ["Acra"]
+        assert list(plan["reused"]) == ["UWM"]
+
+    @pytest.mark.asyncio
+    async def test_missing_result_reruns(self):
+        previous = await _previous_state()
+        del previous["results"]["UWM"]
+
+        plan = await incremental_analysis.plan(previous, SCENARIO, RULES)
+
+        assert plan["rerun"] == ["UWM"]
+
+    @pytest.mark.asyncio
+    async def test_many_changes_run_full_analysis(self):
+        changed = {**SCENARIO, "ltv": 75, "fico": 680, "state": "texas"}
+
+        assert await incremental_analysis.plan(await _previous_state(), changed, RULES) is None
+        assert await incremental_analysis.plan(None, SCENARIO, RULES) is None
+
+
+class TestIncrementalChatFlow:
+
+    @pytest.mark.asyncio
+    async def test_what_if_reruns_one_specialist(self, chat_service):
+        previous = await _previous_state()
+        uwm = MagicMock(lender_name="UWM")
+        uwm.analyze = AsyncMock(return_value={**_result("UWM"), "summary": "UWM at 75%"})
+        evaluator = MagicMock()
+        evaluator.analyze = AsyncMock(return_value={"analysis": "Both work"})
+        chat_service.agent_factory.create_leader_agent = AsyncMock()
+        chat_service.agent_factory.create_specialists_for_lenders = AsyncMock(return_value={"UWM": uwm})
+        chat_service.agent_factory.create_evaluator_agent = MagicMock(return_value=evaluator)
+
+        with patch.object(chat_service.rules, "get_by_lenders", AsyncMock(return_value=RULES)), \
+                patch.object(chat_service.retrieval, "search_by_lenders", new_callable=AsyncMock) as mock_search:
+            mock_search.return_value = {"UWM": {"chunks": [], "rules": RULES["UWM"]}}
+            result = await chat_service._run_multi_agent_analysis({**SCENARIO, "ltv": 75}, previous)
+
+        chat_service.agent_factory.create_leader_agent.assert_not_called()
+        chat_service.agent_factory.create_specialists_for_lenders.assert_called_once_with(["UWM"], None)
+        assert mock_search.call_args.args[1] == ["UWM"]
+        analyses = evaluator.analyze.call_args.kwargs["context"]["specialist_analyses"]
+        assert {a["summary"] for a in analyses} == {"UWM at 75%", "Acra works"}
+        assert result["analysis_state"]["scenario"]["ltv"] == 75
+        assert result["analysis_state"]["results"]["UWM"]["summary"] == "UWM at 75%"
@@ -5,12 +5,20 @@ These tests verify that:
 1. Eligibility questions are correctly classified (not as product search)
 2. Context carryover doesn't break intent classification
 3. Generic questions about Conventional/VA/FHA work correctly
+4. The combined understanding call replaces classify + extract_facts
+5. Local rules answer trivial messages and agree with the labeled set
+6. A bare number is a field answer only when it is the whole message, in
+   range, for the field the last assistant message asked for
 """
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 import json
 
+from app.config import settings
 from app.services.intent_classifier import IntentClassifier, IntentType
+from app.services.local_intent_classifier import LocalIntentClassifier, local_intent_classifier
+from app.services.chat_service import asked_field
+from tests.test_questions import ALL_QUESTIONS
 
 
 class TestIntentClassification:
@@ -173,3 +181,192 @@ class TestContextCarryover:
             # The key assertion: eligibility check should not inherit lender filter
             assert result2["intent"] == IntentType.ELIGIBILITY_CHECK
             assert result2["extracted_entities"].get("lender_asked") is None
+
+
+class TestCombinedUnderstanding:
+    """Intent and scenario facts come back from a single LLM call."""
+    
+    @pytest.mark.asyncio
+    async def test_understand_returns_intent_and_facts(self, intent_classifier, mock_openai_response):
+        response = json.dumps({
+            "intent": "follow_up",
+            "confidence": 0.95,
+            "reasoning": "Answer to the property type question with extra details",
+            "extracted_entities": {"property_type": "single family", "loan_purpose": "purchase"},
+            "facts": {"property_type": "sfr", "loan_purpose": "purchase"}
+        })
+        
+        with patch.object(intent_classifier.client.chat.completions, 'create',
+                         new_callable=AsyncMock) as mock_create:
+            mock_create.return_value = mock_openai_response(response)
+            result = await intent_classifier.understand(
+                "It's a single family home and they are buying",
+                last_question="What type of property is it?",
+                last_question_field="property_type"
+            )
+        
+        assert result["intent"] == IntentType.FOLLOW_UP
+        assert result["facts"] == {"property_type": "sfr", "loan_purpose": "purchase"}
+        mock_create.assert_called_once()
+        system_prompt = mock_create.call_args.kwargs["messages"][0]["content"]
+        assert "MAPPING GUIDE" in system_prompt
+        assert 'just asked about "property_type"' in system_prompt
+    
+    @pytest.mark.asyncio
+    async def test_chat_turn_skips_extract_facts(self, chat_service, monkeypatch):
+        monkeypatch.setattr(settings, "combined_understanding", True)
+        monkeypatch.setattr(chat_service, "_get_last_assistant_message", AsyncMock(return_value=None))
+        
+        with patch.object(chat_service.intent_classifier, 'understand', new_callable=AsyncMock) as mock_understand:
+            with patch.object(chat_service.llm, 'extract_facts', new_callable=AsyncMock) as mock_extract:
+                with patch.object(chat_service, '_generate_scenario_response', new_callable=AsyncMock) as mock_respond:
+                    mock_understand.return_value = {
+                        "intent": "scenario_input",
+                        "extracted_entities": {"fico": 740},
+                        "facts": {"fico": 740, "state": "california"}
+                    }
+                    mock_respond.return_value = {"response": "ok", "citations": []}
+                    
+                    result = await chat_service.process_message("740 score in California")
+        
+        mock_extract.assert_not_called()
+        assert result["facts"] == {"fico": 740, "state": "california"}
+    
+    @pytest.mark.asyncio
+    async def test_two_call_path_behind_setting(self, chat_service, monkeypatch):
+        monkeypatch.setattr(settings, "combined_understanding", False)
+        monkeypatch.setattr(chat_service, "_get_last_assistant_message", AsyncMock(return_value=None))
+        
+        with patch.object(chat_service.intent_classifier, 'classify', new_callable=AsyncMock) as mock_classify:
+            with patch.object(chat_service.llm, 'extract_facts', new_callable=AsyncMock) as mock_extract:
+                with patch.object(chat_service, '_generate_scenario_response', new_callable=AsyncMock) as mock_respond:
+                    mock_classify.return_value = {"intent": "scenario_input", "extracted_entities": {}}
+                    mock_extract.return_value = {"fico": 740}
+                    mock_respond.return_value = {"response": "ok", "citations": []}
+                    
+                    result = await chat_service.process_message("740 score")
+        
+        mock_extract.assert_called_once()
+        assert result["facts"] == {"fico": 740}
+    
+    @pytest.mark.asyncio
+    async def test_asked_field_comes_from_last_assistant_message(self, chat_service, monkeypatch):
+        monkeypatch.setattr(settings, "combined_understanding", True)
+        monkeypatch.setattr(chat_service, "_get_last_assistant_message", AsyncMock(
+            return_value="I'm analyzing your scenario. To give better recommendations, could you tell me:\n- credit score"
+        ))
+        conversation = MagicMock(facts={}, missing_fields=["state", "fico"], analysis_state=None)
+        monkeypatch.setattr(chat_service, "_get_or_create_conversation", AsyncMock(return_value=conversation))
+        
+        with patch.object(chat_service.intent_classifier, 'understand', new_callable=AsyncMock) as mock_understand:
+            with patch.object(chat_service, '_generate_scenario_response', new_callable=AsyncMock) as mock_respond:
+                mock_understand.return_value = {"intent": "follow_up", "extracted_entities": {}, "facts": {"fico": 740}}
+                mock_respond.return_value = {"response": "ok", "citations": []}
+                
+                await chat_service.process_message("740")
+        
+        assert mock_understand.call_args.kwargs["last_question_field"] == "fico"
+    
+    def test_asked_field(self):
+        assert asked_field("To give better recommendations, could you tell me:\n- credit score") == "fico"
+        assert asked_field("## Preliminary Analysis\n\n**Missing Information:**\n- property state\n- LTV percentage") == "state"
+        assert asked_field("## ❓ Missing Information\n\n- Loan Amount") == "loan_amount"
+        # Answers that list facts, or ask nothing, leave short numbers to the LLM
+        assert asked_field("**Client Profile:**\n- Credit Score: 740") is None
+        assert asked_field("Angel Oak offers bank statement loans.") is None
+        assert asked_field(None) is None
+
+
+# (message, last asked field, labeled intent) - questions from the tests above
+# plus the short follow-up answers seen in the follow-up loop
+LABELED_MESSAGES = [
+    ("What are the requirements for a Conventional loan?", None, IntentType.ELIGIBILITY_CHECK),
+    ("What is the minimum credit score for Conventional?", None, IntentType.ELIGIBILITY_CHECK),
+    ("Does Conventional allow 5% down?", None, IntentType.ELIGIBILITY_CHECK),
+    ("What are VA loan requirements?", None, IntentType.ELIGIBILITY_CHECK),
+    ("Can I use VA loan for investment property?", None, IntentType.ELIGIBILITY_CHECK),
+    ("Best lender for bank statement loans?", None, IntentType.PRODUCT_SEARCH),
+    ("Tell me about Angel Oak", None, IntentType.PRODUCT_SEARCH),
+    ("How many lenders do you have?", None, IntentType.GENERAL_QUESTION),
+    ("What is LTV?", "ltv", IntentType.GENERAL_QUESTION),
+    ("Explain DTI ratio", None, IntentType.GENERAL_QUESTION),
+    ("Summarize what you know", None, IntentType.SUMMARY_REQUEST),
+    ("What info do you have?", None, IntentType.SUMMARY_REQUEST),
+    ("What am I missing?", "state", IntentType.SUMMARY_REQUEST),
+    ("Show me the client profile", None, IntentType.SUMMARY_REQUEST),
+    ("What information have I provided?", None, IntentType.SUMMARY_REQUEST),
+    ("California", "state", IntentType.FOLLOW_UP),
+    ("TX", "state", IntentType.FOLLOW_UP),
+    ("740", "fico", IntentType.FOLLOW_UP),
+    ("Purchase", "loan_purpose", IntentType.FOLLOW_UP),
+    ("Single family", "property_type", IntentType.FOLLOW_UP),
+    ("Investment", "occupancy", IntentType.FOLLOW_UP),
+    ("80%", "ltv", IntentType.FOLLOW_UP),
+    ("$400,000", "loan_amount", IntentType.FOLLOW_UP),
+    ("Bank statements", "doc_type", IntentType.FOLLOW_UP),
+    ("None", "credit_events", IntentType.FOLLOW_UP),
+    ("Yes", "occupancy", IntentType.FOLLOW_UP),
+] + [(case["question"], None, IntentType.SCENARIO_INPUT) for case in ALL_QUESTIONS]
+
+
+class TestLocalIntentFastPath:
+    """Trivial messages skip the LLM; everything else is deferred to it."""
+    
+    def test_agrees_with_labeled_set(self):
+        local = LocalIntentClassifier()
+        
+        for message, field, expected in LABELED_MESSAGES:
+            result = local.classify(message, last_question_field=field)
+            if result is not None:
+                local.record_agreement(result["rule"], result["intent"], expected)
+        
+        stats = local.stats()
+        for rule, rule_stats in stats["rules"].items():
+            assert rule_stats["agreement"] == 1.0, f"rule {rule} disagrees with the labeled set"
+        # Every summary request and short follow-up answer is handled locally
+        trivial = [m for m in LABELED_MESSAGES if m[2] in (IntentType.SUMMARY_REQUEST, IntentType.FOLLOW_UP)]
+        assert stats["local_hits"] == len(trivial)
+    
+    def test_short_answer_is_normalized(self):
+        local = LocalIntentClassifier()
+        
+        assert local.classify("CA", "state")["extracted_entities"] == {"state": "california"}
+        assert local.classify("20% down", "ltv")["extracted_entities"] == {"ltv": 80}
+        assert local.classify("Duplex", "property_type")["extracted_entities"] == {"property_type": "2-4_unit"}
+        # A value for a field that was not asked is left to the LLM
+        assert local.classify("California", None) is None
+    
+    @pytest.mark.parametrize("message,field", [
+        ("Top 3 lenders", "loan_amount"),
+        ("Show me 10 lenders", "ltv"),
+        ("500", "loan_amount"),
+        ("120%", "ltv"),
+        ("250", "fico"),
+        ("740 and 20% down", "fico"),
+    ])
+    def test_other_numbers_are_not_field_answers(self, message, field):
+        result = LocalIntentClassifier().classify(message, field)
+        
+        assert result is None or field not in result["extracted_entities"]
+    
+    @pytest.mark.asyncio
+    async def test_local_hit_skips_llm(self, intent_classifier):
+        with patch.object(intent_classifier.client.chat.completions, 'create',
+                         new_callable=AsyncMock) as mock_create:
+            result = await intent_classifier.understand("Florida", last_question_field="state")
+        
+        mock_create.assert_not_called()
+        assert result["intent"] == IntentType.FOLLOW_UP
+        assert result["facts"] == {"state": "florida"}
+        assert local_intent_classifier.stats()["rules"]["field_answer"]["hits"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_disabled_by_setting(self, intent_classifier, mock_openai_response, monkeypatch):
+        monkeypatch.setattr(settings, "local_intent_enabled", False)
+        
+        with patch.object(intent_classifier.client.chat.completions, 'create',
+                         new_callable=AsyncMock) as mock_create:
+            mock_create.return_value = mock_openai_response(json.dumps({"intent": "follow_up"}))
+            await intent_classifier.classify("Florida", last_question_field="state")
+        
+        mock_create.assert_called_once()
@@ -0,0 +1,127 @@
+"""
+Tests for the rules-based Leader prefilter.
+
+These tests verify that:
+1. Lenders are ranked by their best matching rule plus coverage
+2. Enough covered lenders skip the LLM triage entirely, counting only
+   lenders whose cited rule covers the doc type, occupancy and purpose
+3. Thin rule coverage falls back to the LLM triage
+"""
+from unittest.mock import AsyncMock, patch
+import pytest
+
+from app.config import settings
+from app.models.document import Rule
+from app.services.leader_agent import LeaderAgent
+from app.services.rules_service import RulesService
+
+
+SCENARIO = {"doc_type": "dscr", "occupancy": "investment", "loan_purpose": "purchase", "fico": 720, "ltv": 75}
+
+
+def _rule(
+    lender: str,
+    program: str,
+    doc_types: list[str],
+    occupancies: list[str] | None = None,
+    fico_min: int = 660,
+    purposes: list[str] | None = None
+) -> Rule:
+    return Rule(
+        lender=lender, program=program, fico_min=fico_min, ltv_max=80,
+        doc_types=doc_types, occupancies=occupancies or ["investment"], purposes=purposes or ["purchase"]
+    )
+
+
+MATCHED_RULES = [
+    _rule("Angel Oak", "DSCR Select", ["dscr"], fico_min=700),
+    _rule("UWM", "DSCR Plus", ["dscr"]),
+    _rule("UWM", "DSCR Lite", ["dscr"]),
+    _rule("Acra", "Bank Statement", ["bank_statement"]),
+    _rule("Not Loaded", "DSCR", ["dscr"]),
+]
+
+
+@pytest.fixture
+def matched_rules():
+    """RulesService.match returning MATCHED_RULES (best first), no document lookup."""
+    async def match(self, facts):
+        return sorted(MATCHED_RULES, key=lambda r: self._score_rule(r, facts), reverse=True)
+
+    with patch.object(RulesService, "match", match), \
+            patch.object(RulesService, "_document_filenames", AsyncMock(return_value={})):
+        yield
+
+
+class TestRankLenders:
+
+    @pytest.mark.asyncio
+    async def test_ranks_by_rule_fit_and_coverage(self, mock_db, matched_rules):
+        ranked = await RulesService(mock_db).rank_lenders(SCENARIO, ["UWM", "Angel Oak", "Acra"])
+
+        assert [entry["lender"] for entry in ranked[:2]] == ["UWM", "Angel Oak"]
+        assert ranked[-1]["lender"] == "Acra"
+        assert ranked[-1]["covers_doc_type"] is False
+        assert all(entry["lender"] != "Not Loaded" for entry in ranked)
+
+    @pytest.mark.asyncio
+    async def test_missing_facts_are_not_coverage_failures(self, mock_db, matched_rules):
+        ranked = await RulesService(mock_db).rank_lenders({"fico": 720}, ["Acra"])
+
+        assert ranked[0]["covers_doc_type"] is None
+
+
+class TestLeaderPrefilter:
+
+    @pytest.mark.asyncio
+    async def test_covered_scenario_skips_llm(self, mock_db, matched_rules, monkeypatch):
+        monkeypatch.setattr(settings, "leader_min_rule_candidates", 2)
+        leader = LeaderAgent(mock_db, ["UWM", "Angel Oak", "Acra"])
+
+        with patch.object(leader, "_llm_triage", new_callable=AsyncMock) as mock_llm:
+            result = await leader.analyze(SCENARIO)
+
+        mock_llm.assert_not_called()
+        assert result["method"] == "rules"
+        assert [c["lender"] for c in result["top_candidates"]] == ["UWM", "Angel Oak"]
+        assert "[1]" in result["top_candidates"][0]["reason"]
+        assert [s["id"] for s in result["sources"]] == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_thin_coverage_falls_back_to_llm(self, mock_db, matched_rules, monkeypatch):
+        monkeypatch.setattr(settings, "leader_min_rule_candidates", 3)
+        leader = LeaderAgent(mock_db, ["UWM", "Angel Oak", "Acra"])
+
+        with patch.object(leader, "_llm_triage", new_callable=AsyncMock) as mock_llm:
+            mock_llm.return_value = {"top_candidates": [], "method": "llm"}
+            result = await leader.analyze(SCENARIO)
+
+        mock_llm.assert_called_once_with(SCENARIO)
+        assert result["method"] == "llm"
+
+    @pytest.mark.asyncio
+    async def test_few_loaded_lenders_lower_the_bar(self, mock_db, matched_rules, monkeypatch):
+        monkeypatch.setattr(settings, "leader_min_rule_candidates", 3)
+        leader = LeaderAgent(mock_db, ["UWM"])
+
+        with patch.object(leader, "_llm_triage", new_callable=AsyncMock) as mock_llm:
+            result = await leader.analyze(SCENARIO)
+
+        mock_llm.assert_not_called()
+        assert [c["lender"] for c in result["top_candidates"]] == ["UWM"]
+
+    @pytest.mark.asyncio
+    async def test_cited_rule_must_cover_the_scenario(self, mock_db, monkeypatch):
+        monkeypatch.setattr(settings, "leader_min_rule_candidates", 1)
+        leader = LeaderAgent(mock_db, ["UWM", "Angel Oak"])
+        # UWM's best (cited) rule is a cash-out program; a later purchase rule does not count
+        uwm_rules = [_rule("UWM", "DSCR Cash-Out", ["dscr"], purposes=["cashout"]), _rule("UWM", "DSCR Plus", ["dscr"])]
+        ranked = [
+            {"lender": "UWM", "score": 90, "rules": uwm_rules, "filename": "uwm.pdf"},
+            {"lender": "Angel Oak", "score": 80, "rules": [_rule("Angel Oak", "DSCR Select", ["dscr"])], "filename": "angel.pdf"},
+        ]
+
+        with patch.object(leader.rules, "rank_lenders", AsyncMock(return_value=ranked)):
+            result = await leader.analyze(SCENARIO)
+
+        assert [c["lender"] for c in result["top_candidates"]] == ["Angel Oak"]
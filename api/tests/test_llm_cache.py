@@ -0,0 +1,172 @@
+"""
+Tests for the temperature-0 LLM response cache.
+
+These tests verify that:
+1. Repeated classification/extraction prompts call the API once
+2. Non-deterministic and unparseable responses are never cached
+3. Identical in-flight requests share one API call, which is cancelled
+   once all of its callers are
+4. Redis backs the in-process tier across workers
+"""
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.config import settings
+from app.services import llm_cache as llm_cache_module
+from app.services.llm_cache import LLMCache, llm_cache
+from app.services.llm_service import LLMService
+
+
+class FakeRedis:
+    """Minimal async stand-in for the Redis commands the cache uses."""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+
+class TestCachedCalls:
+    """Services route their temperature-0 calls through the cache."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_classification_calls_api_once(self, intent_classifier, mock_openai_response):
+        with patch.object(intent_classifier.client.chat.completions, 'create', new_callable=AsyncMock) as mock_create:
+            mock_create.return_value = mock_openai_response(
+                json.dumps({"intent": "follow_up", "confidence": 0.9, "extracted_entities": {}})
+            )
+
+            first = await intent_classifier.classify("California", last_question="What state?")
+            second = await intent_classifier.classify("California", last_question="What state?")
+            # Different context is a different prompt
+            await intent_classifier.classify("California")
+
+        assert first == second
+        assert mock_create.call_count == 2
+        assert llm_cache.stats()["memory_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_extract_facts_is_cached(self, mock_openai_response, monkeypatch):
+        monkeypatch.setattr(settings, "local_fact_parser_enabled", False)
+        service = LLMService()
+
+        with patch.object(service.client.chat.completions, 'create', new_callable=AsyncMock) as mock_create:
+            mock_create.return_value = mock_openai_response('{"property_type": "sfr"}')
+
+            for _ in range(3):
+                facts = await service.extract_facts("Single family", {}, last_question_field="property_type")
+
+        assert facts == {"property_type": "sfr"}
+        mock_create.assert_called_once()
+
+
+class TestLLMCache:
+    """Unit tests for cache policy, single-flight and tiers."""
+
+    @pytest.mark.asyncio
+    async def test_only_temperature_zero_is_cached(self, mock_openai_response):
+        client = _client(mock_openai_response("hello"))
+        cache = LLMCache(max_size=10)
+
+        for _ in range(2):
+            await cache.complete(client, model="m", messages=[], temperature=0.3)
+
+        assert client.chat.completions.create.call_count == 2
+        assert cache.stats()["size"] == 0
+
+    @pytest.mark.asyncio
+    async def test_invalid_json_not_cached(self, mock_openai_response):
+        client = _client(mock_openai_response("not json"))
+        cache = LLMCache(max_size=10)
+        request = {"model": "m", "messages": [], "temperature": 0, "response_format": {"type": "json_object"}}
+
+        await cache.complete(client, **request)
+        await cache.complete(client, **request)
+
+        assert client.chat.completions.create.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_share_one_call(self, mock_openai_response):
+        release = asyncio.Event()
+
+        async def slow_create(**request):
+            await release.wait()
+            return mock_openai_response('{"lender": "UWM"}')
+
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(side_effect=slow_create)
+        cache = LLMCache(max_size=10)
+        request = {"model": "m", "messages": [{"role": "user", "content": "UWM Matrix.pdf"}], "temperature": 0}
+
+        waiters = [asyncio.ensure_future(cache.complete(client, **request)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert results == ['{"lender": "UWM"}'] * 3
+        client.chat.completions.create.assert_called_once()
+        assert cache.stats()["coalesced"] == 2
+
+    @pytest.mark.asyncio
+    async def test_call_outlives_a_cancelled_caller_but_not_all(self, mock_openai_response):
+        release = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def slow_create(**request):
+            try:
+                await release.wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return mock_openai_response('{"lender": "UWM"}')
+
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(side_effect=slow_create)
+        cache = LLMCache(max_size=10)
+        request = {"model": "m", "messages": [{"role": "user", "content": "UWM Matrix.pdf"}], "temperature": 0}
+
+        first, second = (asyncio.ensure_future(cache.complete(client, **request)) for _ in range(2))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()
+
+        second.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled.is_set()
+        assert cache.stats()["size"] == 0
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_backs_memory(self, monkeypatch, mock_openai_response):
+        fake_redis = FakeRedis()
+        monkeypatch.setattr(llm_cache_module, "get_redis", lambda: fake_redis)
+        client = _client(mock_openai_response('{"intent": "follow_up"}'))
+        request = {"model": "m", "messages": [], "temperature": 0}
+
+        await LLMCache(max_size=10).complete(client, **request)
+        # A fresh worker has an empty LRU but shares Redis
+        reader = LLMCache(max_size=10)
+        assert await reader.complete(client, **request) == '{"intent": "follow_up"}'
+
+        client.chat.completions.create.assert_called_once()
+        assert reader.stats()["redis_hits"] == 1
+
+    def test_key_includes_model(self):
+        cache = LLMCache(max_size=10)
+        messages = [{"role": "user", "content": "Purchase"}]
+
+        assert cache.key({"model": "gpt-4o", "messages": messages}) != cache.key(
+            {"model": "gpt-4o-mini", "messages": messages}
+        )
+
+
+def _client(response):
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=response)
+    return client
@@ -0,0 +1,45 @@
+"""
+Tests for the shared OpenAI client.
+
+These tests verify that:
+1. Every service and agent of a chat request uses one pooled client
+2. Closing the client (app shutdown) releases it for re-creation
+"""
+import pytest
+
+from app import llm_client
+from app.llm_client import get_openai_client, close_openai_client
+from app.services.chat_service import ChatService
+
+
+class TestSharedClient:
+    """One AsyncOpenAI (and one connection pool) per process."""
+
+    @pytest.mark.asyncio
+    async def test_chat_request_shares_one_client(self, mock_db):
+        service = ChatService(mock_db)
+        leader = await service.agent_factory.create_leader_agent()
+        evaluator = service.agent_factory.create_evaluator_agent()
+
+        clients = {
+            id(service.intent_classifier.client),
+            id(service.general_qa.client),
+            id(service.general_qa.retrieval.client),
+            id(service.llm.client),
+            id(leader.client),
+            id(leader.retrieval.client),
+            id(evaluator.client),
+        }
+
+        assert clients == {id(get_openai_client())}
+
+    @pytest.mark.asyncio
+    async def test_close_releases_client(self, monkeypatch):
+        monkeypatch.setattr(llm_client, "_client", None)
+        first = get_openai_client()
+
+        await close_openai_client()
+
+        assert llm_client._client is None
+        assert get_openai_client() is not first
+        await close_openai_client()
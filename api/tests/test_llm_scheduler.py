@@ -0,0 +1,151 @@
+"""
+Tests for the shared LLM rate limiter and priority scheduler.
+
+These tests verify that:
+1. Token buckets refill per minute and report how long to wait
+2. Queued requests are granted in priority order
+3. Rate-limited and transient failures are retried with backoff
+4. Models without limits (or a disabled scheduler) are not queued
+"""
+from unittest.mock import AsyncMock, MagicMock
+import asyncio
+
+import httpx
+import openai
+import pytest
+from tenacity import wait_none
+
+from app.config import settings
+from app.services.llm_scheduler import LLMScheduler, Priority, RateLimiter
+
+
+def _rate_limit_error() -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return openai.RateLimitError("rate limited", response=httpx.Response(429, request=request), body=None)
+
+
+class GateLimiter(RateLimiter):
+    """Blocks every request until opened, then grants them all."""
+
+    def __init__(self):
+        super().__init__()
+        self.open = False
+
+    async def reserve(self, model, tokens, limits):
+        return 0 if self.open else 0.01
+
+
+class TestRateLimiter:
+
+    def test_tokens_per_minute_bucket(self):
+        limiter = RateLimiter()
+        limits = {"rpm": 100, "tpm": 600}
+
+        assert limiter._reserve_local("m", 500, limits) == 0
+        wait = limiter._reserve_local("m", 500, limits)
+
+        # 400 tokens short at 10 tokens/second
+        assert wait == pytest.approx(40, abs=0.5)
+
+    def test_requests_per_minute_bucket(self):
+        limiter = RateLimiter()
+        limits = {"rpm": 2, "tpm": 10000}
+
+        assert limiter._reserve_local("m", 1, limits) == 0
+        assert limiter._reserve_local("m", 1, limits) == 0
+        assert limiter._reserve_local("m", 1, limits) == pytest.approx(30, abs=0.5)
+
+    def test_oversized_request_is_clamped_to_capacity(self):
+        assert RateLimiter()._reserve_local("m", 10**6, {"rpm": 10, "tpm": 1000}) == 0
+
+
+class TestLLMScheduler:
+
+    @pytest.mark.asyncio
+    async def test_grants_in_priority_order(self, monkeypatch):
+        monkeypatch.setattr(settings, "llm_rate_limits", {"m": {"rpm": 10, "tpm": 1000}})
+        limiter = GateLimiter()
+        scheduler = LLMScheduler(limiter)
+        order = []
+
+        async def request(priority: Priority):
+            await scheduler.acquire("m", 10, priority)
+            order.append(priority)
+
+        tasks = [
+            asyncio.ensure_future(request(p))
+            for p in (Priority.INGESTION, Priority.EVALUATOR, Priority.INTERACTIVE)
+        ]
+        await asyncio.sleep(0.005)
+        assert scheduler.stats()["queue_depth"]["m"] == {"interactive": 1, "evaluator": 1, "ingestion": 1}
+
+        limiter.open = True
+        await asyncio.gather(*tasks)
+
+        assert order == [Priority.INTERACTIVE, Priority.EVALUATOR, Priority.INGESTION]
+        assert scheduler.stats()["wait_ms"]["ingestion"]["requests"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_request_leaves_the_queue(self, monkeypatch):
+        monkeypatch.setattr(settings, "llm_rate_limits", {"m": {"rpm": 10, "tpm": 1000}})
+        limiter = GateLimiter()
+        scheduler = LLMScheduler(limiter)
+
+        task = asyncio.ensure_future(scheduler.acquire("m", 10, Priority.INGESTION))
+        await asyncio.sleep(0.005)
+        task.cancel()
+        limiter.open = True
+        await scheduler.acquire("m", 10, Priority.INTERACTIVE)
+
+        assert scheduler.stats()["queue_depth"] == {}
+
+    @pytest.mark.asyncio
+    async def test_retries_rate_limit_errors(self):
+        scheduler = LLMScheduler()
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(side_effect=[_rate_limit_error(), "ok"])
+
+        result = await scheduler.call(
+            lambda: client.chat.completions.create(model="gpt-4o"),
+            model="gpt-4o", tokens=10, priority=Priority.INTERACTIVE, wait=wait_none()
+        )
+
+        assert result == "ok"
+        assert scheduler.stats()["retries"] == 1
+        assert scheduler.stats()["rate_limited"] == 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self):
+        scheduler = LLMScheduler()
+        fn = AsyncMock(side_effect=_rate_limit_error())
+
+        with pytest.raises(openai.RateLimitError):
+            await scheduler.call(fn, model="gpt-4o", tokens=10, priority=Priority.INGESTION,
+                                 max_attempts=2, wait=wait_none())
+        assert fn.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_other_errors_are_not_retried(self):
+        fn = AsyncMock(side_effect=ValueError("bad request"))
+
+        with pytest.raises(ValueError):
+            await LLMScheduler().call(fn, model="gpt-4o", tokens=10, priority=Priority.INTERACTIVE)
+        assert fn.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_unlimited_model_is_not_queued(self, monkeypatch):
+        monkeypatch.setattr(settings, "llm_rate_limits", {})
+        limiter = GateLimiter()  # Would block forever if consulted
+        scheduler = LLMScheduler(limiter)
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(return_value="response")
+
+        result = await scheduler.chat_completion(
+            client, model="gpt-4o", messages=[{"role": "user", "content": "hi"}], temperature=0
+        )
+
+        assert result == "response"
+        client.chat.completions.create.assert_called_once_with(
+            model="gpt-4o", messages=[{"role": "user", "content": "hi"}], temperature=0
+        )
+        assert scheduler.stats()["wait_ms"] == {}
@@ -0,0 +1,154 @@
+"""
+Tests for the memory-mapped local vector index.
+
+These tests verify that:
+1. Top-k is ranked by cosine similarity and respects the search filters
+2. Appends from another writer are visible to an existing reader
+3. RetrievalService dispatches to the local index; uploads append after commit
+4. Concurrent searches see metadata in line with the vector rows
+"""
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, patch
+import numpy as np
+
+from app.config import settings
+from app.services.local_vector_index import LocalVectorIndex, EMBEDDING_DIMENSIONS
+from app.services.retrieval_service import RetrievalService
+
+
+def _unit(axis: int, noise: float = 0.0) -> np.ndarray:
+    vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+    vector[axis] = 1.0
+    vector[axis + 1] = noise
+    return vector
+
+
+def _row(chunk_id: str, lender: str, archetype: str = "A", document_id: str = "doc-1") -> dict:
+    return {
+        "id": chunk_id,
+        "document_id": document_id,
+        "content": f"content {chunk_id}",
+        "section_path": "Credit",
+        "filename": f"{lender}.pdf",
+        "lender": lender,
+        "archetype": archetype
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LocalVectorIndex(root=str(tmp_path))
+    index.append(
+        [
+            _row("a", "Angel Oak"),
+            _row("b", "Acra Lending", archetype="B", document_id="doc-2"),
+            _row("c", "Angel Oak", archetype="B"),
+        ],
+        np.stack([_unit(0), _unit(0, noise=0.5), _unit(10)])
+    )
+    return index
+
+
+class TestLocalVectorIndex:
+    """Brute-force top-k over the memory-mapped matrix."""
+
+    def test_ranks_by_cosine_similarity(self, index):
+        results = index.search(_unit(0), top_k=2)
+
+        assert [c["id"] for c in results] == ["a", "b"]
+        assert results[0]["similarity"] == pytest.approx(1.0)
+        assert results[0]["lender"] == "Angel Oak"
+
+    def test_filters_rank_within_matching_rows(self, index):
+        assert [c["id"] for c in index.search(_unit(0), top_k=2, lender="angel oak")] == ["a", "c"]
+        assert [c["id"] for c in index.search(_unit(0), lender="Acra", lender_match="contains")] == ["b"]
+        assert [c["id"] for c in index.search(_unit(0), archetypes=["B"])] == ["b", "c"]
+        assert [c["id"] for c in index.search(_unit(0), document_ids=["doc-2"])] == ["b"]
+        assert index.search(_unit(0), lender="Unknown") == []
+
+    def test_reader_sees_appends_from_other_writers(self, index, tmp_path):
+        assert len(index.search(_unit(20))) == 3
+
+        LocalVectorIndex(root=str(tmp_path)).append([_row("d", "UWM")], _unit(20)[None, :])
+
+        assert index.search(_unit(20), top_k=1)[0]["id"] == "d"
+        assert index.status()["chunks_count"] == 4
+
+    def test_concurrent_searches_after_append(self, index, tmp_path):
+        LocalVectorIndex(root=str(tmp_path)).append(
+            [_row(f"n{i}", "UWM") for i in range(20)],
+            np.stack([_unit(30 + i) for i in range(20)])
+        )
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: index.search(_unit(30 + i), top_k=1), range(20)))
+
+        # Every thread saw metadata in line with the vector rows
+        assert [r[0]["id"] for r in results] == [f"n{i}" for i in range(20)]
+
+    def test_float16_storage(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "local_index_dtype", "float16")
+        index = LocalVectorIndex(root=str(tmp_path))
+        index.append([_row("a", "UWM"), _row("b", "UWM")], np.stack([_unit(0), _unit(5)]))
+
+        assert index.search(_unit(5), top_k=1)[0]["id"] == "b"
+        assert index.status()["size_bytes"] == 2 * EMBEDDING_DIMENSIONS * 2
+
+    def test_empty_index(self, tmp_path):
+        index = LocalVectorIndex(root=str(tmp_path))
+
+        assert index.search(_unit(0)) == []
+        assert index.status()["exists"] is False
+
+
+class TestLocalBackend:
+    """RetrievalService routes through the local index when configured."""
+
+    @pytest.mark.asyncio
+    async def test_search_uses_local_index(self, mock_db, index, monkeypatch):
+        monkeypatch.setattr(settings, "retrieval_backend", "local")
+        monkeypatch.setattr("app.services.retrieval_service.local_vector_index", index)
+        service = RetrievalService(mock_db)
+
+        with patch.object(service, '_embed', new_callable=AsyncMock) as mock_embed:
+            with patch.object(service, '_vector_search', new_callable=AsyncMock) as mock_vector:
+                mock_embed.return_value = _unit(10)
+                results = await service.search("BK seasoning", top_k=1, lender="Angel Oak")
+
+        assert [c["id"] for c in results] == ["c"]
+        mock_vector.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_embed_and_store_leaves_index_to_the_commit(self, mock_db, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "retrieval_backend", "local")
+        index = LocalVectorIndex(root=str(tmp_path))
+        monkeypatch.setattr("app.services.retrieval_service.local_vector_index", index)
+        service = RetrievalService(mock_db)
+
+        with patch.object(service, '_embed_many', new_callable=AsyncMock) as mock_embed_many:
+            mock_embed_many.return_value = [_unit(0).tolist(), _unit(5).tolist()]
+            await service.embed_and_store("doc-9", [{"content": "first"}, {"content": "second"}])
+
+        assert index.search(_unit(5), top_k=1) == []
+
+    @pytest.mark.asyncio
+    async def test_append_document_reads_committed_chunks(self, tmp_path):
+        index = LocalVectorIndex(root=str(tmp_path))
+        chunks = [
+            (MagicMock(id="c1", document_id="doc-9", content="first", section_path=None, embedding=_unit(0)), "uwm.pdf", "UWM", None),
+            (MagicMock(id="c2", document_id="doc-9", content="second", section_path=None, embedding=_unit(5)), "uwm.pdf", "UWM", None),
+        ]
+        session = AsyncMock()
+        session.execute.return_value = MagicMock(all=MagicMock(return_value=chunks))
+        session_factory = MagicMock()
+        session_factory.return_value.__aenter__ = AsyncMock(return_value=session)
+        session_factory.return_value.__aexit__ = AsyncMock(return_value=False)
+
+        with patch("app.db.async_session", session_factory):
+            await index.append_document("doc-9")
+
+        results = index.search(_unit(5), top_k=1)
+        assert results[0]["content"] == "second"
+        assert results[0]["lender"] == "UWM"
+        assert results[0]["document_id"] == "doc-9"
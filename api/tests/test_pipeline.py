@@ -0,0 +1,116 @@
+"""
+Tests for the DAG pipeline executor.
+
+These tests verify that:
+1. Independent stages run concurrently and dependents wait for their inputs
+2. Timeouts come from the stage and the request deadline
+3. Optional stages degrade to their default; required ones fail the run
+4. Stages sharing a resource never overlap
+5. The chat intake's lender lookup is handed to the scenario analysis
+"""
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.services.deadline import Deadline
+from app.services.pipeline import Pipeline, Stage, pipeline_stats
+
+
+def _sleeper(seconds: float, value, log: list | None = None, label: str = ""):
+    async def run(**inputs):
+        if log is not None:
+            log.append(f"start {label}")
+        await asyncio.sleep(seconds)
+        if log is not None:
+            log.append(f"end {label}")
+        return value(**inputs) if callable(value) else value
+    return run
+
+
+class TestPipeline:
+
+    @pytest.mark.asyncio
+    async def test_independent_stages_overlap(self):
+        pipeline = Pipeline("test", [
+            Stage("a", _sleeper(0.05, 1)),
+            Stage("b", _sleeper(0.05, 2)),
+            Stage("total", _sleeper(0, lambda a, b, offset: a + b + offset), inputs=("a", "b", "offset")),
+        ])
+
+        started = time.monotonic()
+        result = await pipeline.run(offset=10)
+
+        assert result["total"] == 13
+        assert time.monotonic() - started < 0.09
+        assert set(result.timings) == {"a", "b", "total"}
+        assert pipeline_stats.stats()["test"]["a"]["runs"] == 1
+
+    @pytest.mark.asyncio
+    async def test_optional_stage_times_out_to_default(self):
+        result = await Pipeline("test", [
+            Stage("slow", _sleeper(1, "late"), timeout=0.01, optional=True, default="fallback"),
+        ]).run()
+
+        assert result["slow"] == "fallback"
+        assert result.timings["slow"]["status"] == "timeout"
+
+    @pytest.mark.asyncio
+    async def test_deadline_caps_stage_timeout(self):
+        pipeline = Pipeline("test", [Stage("slow", _sleeper(1, "late"), timeout=10)])
+
+        with pytest.raises(asyncio.TimeoutError):
+            await pipeline.run(deadline=Deadline(0.01))
+
+    @pytest.mark.asyncio
+    async def test_required_failure_cancels_the_rest(self):
+        async def boom():
+            raise RuntimeError("boom")
+
+        log = []
+        pipeline = Pipeline("test", [
+            Stage("fails", boom),
+            Stage("other", _sleeper(1, "x", log, "other")),
+        ])
+
+        with pytest.raises(RuntimeError):
+            await pipeline.run()
+        assert log == ["start other"]
+
+    @pytest.mark.asyncio
+    async def test_shared_resource_serializes(self):
+        log = []
+        await Pipeline("test", [
+            Stage("q1", _sleeper(0.01, 1, log, "q1"), resource="db"),
+            Stage("q2", _sleeper(0.01, 2, log, "q2"), resource="db"),
+        ]).run()
+
+        assert log == ["start q1", "end q1", "start q2", "end q2"]
+
+    def test_invalid_graphs_are_rejected(self):
+        with pytest.raises(ValueError):
+            Pipeline("test", [Stage("a", _sleeper(0, 1), inputs=("b",)), Stage("b", _sleeper(0, 1), inputs=("a",))])
+        with pytest.raises(ValueError):
+            Pipeline("test", [Stage("a", _sleeper(0, 1)), Stage("b", _sleeper(0, 1), output="a")])
+
+    @pytest.mark.asyncio
+    async def test_missing_input_is_rejected(self):
+        with pytest.raises(ValueError):
+            await Pipeline("test", [Stage("a", _sleeper(0, 1), inputs=("nope",))]).run()
+
+
+class TestChatIntake:
+
+    @pytest.mark.asyncio
+    async def test_lender_lookup_feeds_the_analysis(self, chat_service, monkeypatch):
+        monkeypatch.setattr(chat_service, "_get_last_assistant_message", AsyncMock(return_value=None))
+        chat_service.agent_factory.get_available_lenders = AsyncMock(return_value=["UWM", "Acra"])
+        understanding = {"intent": "scenario_input", "extracted_entities": {}, "facts": {"fico": 740}}
+
+        with patch.object(chat_service.intent_classifier, "understand", AsyncMock(return_value=understanding)), \
+                patch.object(chat_service, "_generate_scenario_response", new_callable=AsyncMock) as mock_respond:
+            mock_respond.return_value = {"response": "ok", "citations": []}
+            await chat_service.process_message("740 FICO DSCR purchase in Florida")
+
+        assert mock_respond.call_args.kwargs["available_lenders"] == ["UWM", "Acra"]
+        chat_service.agent_factory.get_available_lenders.assert_awaited_once()
@@ -0,0 +1,147 @@
+"""
+Tests for progressive evaluation of specialist results.
+
+These tests verify that:
+1. A ranking is emitted once a quorum of re-run specialists has answered
+   (reused results do not count towards it)
+2. Results arriving within the grace period are folded in
+3. Specialists still running after the grace period are cancelled
+4. The evaluator runs against a deadline and falls back to the ranking
+"""
+import asyncio
+import time
+from unittest.mock import AsyncMock
+import pytest
+
+from app.config import settings
+from app.services.deadline import Deadline
+from app.services.evaluator_agent import EvaluatorAgent
+
+
+def _result(lender: str, max_ltv: int = 80) -> dict:
+    return {
+        "lender": lender,
+        "eligible_products": [{"program": f"{lender} DSCR", "status": "eligible", "max_ltv": max_ltv}],
+        "summary": f"{lender} works"
+    }
+
+
+async def _specialist(seconds: float, result: dict, finished: list | None = None) -> dict:
+    await asyncio.sleep(seconds)
+    if finished is not None:
+        finished.append(result["lender"])
+    return result
+
+
+@pytest.fixture
+def events(chat_service):
+    received = []
+
+    async def emit(event: str, data: dict):
+        received.append((event, data))
+
+    chat_service.emit = emit
+    return received
+
+
+class TestCollectSpecialists:
+
+    @pytest.mark.asyncio
+    async def test_quorum_then_grace_then_cancel(self, chat_service, events, monkeypatch):
+        monkeypatch.setattr(settings, "specialist_quorum", 2)
+        monkeypatch.setattr(settings, "specialist_grace_seconds", 0.05)
+        finished = []
+
+        started = time.monotonic()
+        results = await chat_service._collect_specialists(EvaluatorAgent(), [
+            _specialist(0.01, _result("A"), finished),
+            _specialist(0.02, _result("B", max_ltv=90), finished),
+            _specialist(0.04, _result("C"), finished),
+            _specialist(5, _result("Slow"), finished),
+        ], reused=[])
+
+        assert time.monotonic() - started < 1
+        assert [r["lender"] for r in results] == ["A", "B", "C"]
+        assert "Slow" not in finished
+
+        rankings = [data for event, data in events if event == "ranking"]
+        assert [r["lenders"] for r in rankings] == [["A", "B"], ["A", "B", "C"]]
+        assert rankings[0]["recommendation"]["lender"] == "B"
+        assert rankings[0]["pending"] == 2
+
+    @pytest.mark.asyncio
+    async def test_waits_for_quorum_of_valid_results(self, chat_service, events, monkeypatch):
+        monkeypatch.setattr(settings, "specialist_quorum", 2)
+        monkeypatch.setattr(settings, "specialist_grace_seconds", 0)
+
+        results = await chat_service._collect_specialists(EvaluatorAgent(), [
+            _specialist(0.01, {"error": "Timeout analyzing A"}),
+            _specialist(0.02, _result("B")),
+            _specialist(0.03, _result("C")),
+        ], reused=[])
+
+        assert [r["lender"] for r in results] == ["B", "C"]
+
+    @pytest.mark.asyncio
+    async def test_reused_results_do_not_count_towards_quorum(self, chat_service, events, monkeypatch):
+        monkeypatch.setattr(settings, "specialist_quorum", 2)
+        monkeypatch.setattr(settings, "specialist_grace_seconds", 0.01)
+
+        results = await chat_service._collect_specialists(EvaluatorAgent(), [
+            _specialist(0.005, _result("B")),
+            _specialist(0.05, _result("C")),
+            _specialist(5, _result("Slow")),
+        ], reused=[_result("A")])
+
+        # The grace period starts once two re-run specialists have answered
+        assert [r["lender"] for r in results] == ["A", "B", "C"]
+        rankings = [data for event, data in events if event == "ranking"]
+        assert rankings[0]["lenders"] == ["A", "B", "C"]
+        assert ("specialist", {
+            "lender": "A", "eligible_products": _result("A")["eligible_products"],
+            "summary": "A works", "error": None, "reused": True
+        }) in events
+
+    @pytest.mark.asyncio
+    async def test_only_reused_results(self, chat_service, events):
+        results = await chat_service._collect_specialists(EvaluatorAgent(), [], reused=[_result("A")])
+
+        assert [r["lender"] for r in results] == ["A"]
+        assert [data["lenders"] for event, data in events if event == "ranking"] == [["A"]]
+
+
+class TestEvaluatorDeadline:
+
+    @pytest.mark.asyncio
+    async def test_slow_evaluator_falls_back_to_ranking(self, chat_service, monkeypatch):
+        monkeypatch.setattr(settings, "evaluator_timeout_seconds", 0.01)
+        evaluator = EvaluatorAgent()
+
+        async def slow_analyze(scenario, context=None):
+            await asyncio.sleep(1)
+
+        evaluator.analyze = slow_analyze
+        result = await chat_service._evaluate(evaluator, {}, [_result("A"), _result("B", max_ltv=90)])
+
+        assert "analysis" not in result
+        assert result["recommendation"]["lender"] == "B"
+
+    @pytest.mark.asyncio
+    async def test_request_deadline_caps_the_evaluator(self, chat_service):
+        evaluator = EvaluatorAgent()
+        evaluator.analyze = AsyncMock()
+        chat_service.deadline = Deadline(-1)
+
+        result = await chat_service._evaluate(evaluator, {}, [_result("A")])
+
+        evaluator.analyze.assert_not_called()
+        assert result["recommendation"]["lender"] == "A"
+
+    @pytest.mark.asyncio
+    async def test_evaluator_answer_is_used(self, chat_service):
+        evaluator = EvaluatorAgent()
+        evaluator.analyze = AsyncMock(return_value={"analysis": "Go with A", "recommendation": None})
+
+        result = await chat_service._evaluate(evaluator, {}, [_result("A")])
+
+        assert result["analysis"] == "Go with A"
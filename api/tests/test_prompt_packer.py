@@ -0,0 +1,75 @@
+"""
+Tests for token-budgeted prompt packing.
+
+These tests verify that:
+1. Packed context never exceeds the budget and reports its token count
+2. Chunks are taken by relevance, overlapping chunks are skipped
+3. Trimming keeps whole sentences and whole table rows
+"""
+from app.services.prompt_packer import pack_chunks, pack_lines, packing_stats, trim_to_tokens
+from app.services.token_counter import count_tokens
+
+
+def _render(index: int, chunk: dict, content: str) -> str:
+    return f"[{index}] {chunk['lender']}: {content}"
+
+
+def _chunk(lender: str, content: str, score: float | None = None) -> dict:
+    chunk = {"lender": lender, "filename": f"{lender}.pdf", "content": content}
+    if score is not None:
+        chunk["score"] = score
+    return chunk
+
+
+SENTENCES = " ".join(f"Sentence number {i} describes one guideline requirement in detail." for i in range(40))
+TABLE = "\n".join(f"| {700 + i} | {80 - i}% | $1,000,000 |" for i in range(30))
+
+
+class TestPromptPacker:
+
+    def test_stays_within_budget_and_reports_tokens(self):
+        chunks = [_chunk(f"Lender {i}", SENTENCES, score=1.0 - i / 10) for i in range(5)]
+
+        packed = pack_chunks(chunks, 300, _render, stage="test", max_item_tokens=120)
+
+        assert packed.tokens <= 300
+        assert packed.tokens == sum(count_tokens(part) for part in packed.text.split("\n"))
+        assert packed.items[0]["lender"] == "Lender 0"
+        assert packing_stats.stats()["test"]["packs"] == 1
+
+    def test_orders_by_relevance(self):
+        chunks = [_chunk("Low", "Low relevance text.", score=0.1), _chunk("High", "High relevance text.", score=0.9)]
+
+        packed = pack_chunks(chunks, 500, _render, stage="test")
+
+        assert [c["lender"] for c in packed.items] == ["High", "Low"]
+
+    def test_overlapping_chunks_are_deduplicated(self):
+        overlap = SENTENCES[:600]
+        chunks = [_chunk("A", overlap), _chunk("A", overlap[40:] + " Extra."), _chunk("B", TABLE)]
+
+        packed = pack_chunks(chunks, 5000, _render, stage="test")
+
+        assert [c["lender"] for c in packed.items] == ["A", "B"]
+        assert packed.dropped == 1
+
+    def test_trims_whole_sentences(self):
+        trimmed = trim_to_tokens(SENTENCES, 50)
+
+        assert count_tokens(trimmed) <= 50
+        assert trimmed.endswith("detail.")
+
+    def test_trims_whole_table_rows(self):
+        trimmed = trim_to_tokens(TABLE, 60)
+
+        assert count_tokens(trimmed) <= 60
+        assert all(line.startswith("|") and line.endswith("|") for line in trimmed.split("\n"))
+
+    def test_pack_lines_keeps_a_prefix(self):
+        lines = [f"- Program {i}, FICO 660+, Max LTV 80%" for i in range(50)]
+
+        packed = pack_lines(lines, 60, stage="test_rules")
+
+        assert [item["content"] for item in packed.items] == lines[:len(packed.items)]
+        assert packed.tokens <= 60
+        assert packed.dropped == 50 - len(packed.items)
@@ -0,0 +1,428 @@
+"""
+Tests for RetrievalService ingestion and ranking helpers.
+
+These tests verify that:
+1. Chunks are embedded in bounded batches, not one request per chunk
+2. A failed batch is retried without re-embedding completed batches
+3. Lender/document/archetype filters are pushed into the vector query,
+   with iterative scans on pgvector >= 0.8 and an exact scan before that
+4. Hybrid search fuses vector and lexical rankings with RRF
+5. The asyncpg fast path binds the same filters positionally and sets
+   the ANN recall knobs per query
+6. The specialist fan-out gets chunks and rules for all lenders in one query
+"""
+import json
+import pytest
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+import httpx
+import numpy as np
+import openai
+from tenacity import wait_none
+
+from app.config import settings
+from app import db as db_module
+from app.db import vector_search_params
+from app.services import retrieval_service as retrieval_module
+from app.services.retrieval_service import RetrievalService, reciprocal_rank_fusion, _to_positional
+from app.services.specialist_agent import SpecialistAgent
+from app.services.general_qa_service import GeneralQAService
+
+
+class TestBatchedEmbedding:
+    """embed_and_store should batch chunks into few concurrent API calls."""
+
+    @pytest.mark.asyncio
+    async def test_chunks_are_batched(self, mock_db, monkeypatch):
+        monkeypatch.setattr(settings, "embedding_batch_max_inputs", 2)
+        service = RetrievalService(mock_db)
+        chunks = [{"content": f"chunk {i}"} for i in range(5)]
+
+        with patch.object(service.client.embeddings, 'create', new_callable=AsyncMock) as mock_create:
+            mock_create.side_effect = _echo_embeddings
+            await service.embed_and_store("doc-1", chunks)
+
+        assert mock_create.call_count == 3
+        stored = [call.args[0] for call in mock_db.add.call_args_list]
+        assert [c.chunk_index for c in stored] == [0, 1, 2, 3, 4]
+        # Embeddings line up with their chunk, whatever order batches finished in
+        assert [c.embedding[0] for c in stored] == [float(len(f"chunk {i}")) for i in range(5)]
+
+    def test_batches_bounded_by_tokens(self, mock_db, monkeypatch):
+        monkeypatch.setattr(settings, "embedding_batch_max_tokens", 10)
+        monkeypatch.setattr(retrieval_module, "count_tokens", lambda text: 4)
+        service = RetrievalService(mock_db)
+
+        batches = service._make_batches(["a", "b", "c", "d", "e"])
+
+        assert batches == [[0, 1], [2, 3], [4]]
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_retried_alone(self, mock_db, monkeypatch):
+        monkeypatch.setattr(settings, "embedding_batch_max_inputs", 1)
+        monkeypatch.setattr(retrieval_module, "EMBED_RETRY_WAIT", wait_none())
+        service = RetrievalService(mock_db)
+        calls = []
+
+        async def flaky(model, input):
+            calls.append(tuple(input))
+            if input == ["second"] and calls.count(("second",)) == 1:
+                raise _rate_limit_error()
+            return _echo_embeddings(model=model, input=input)
+
+        with patch.object(service.client.embeddings, 'create', new_callable=AsyncMock) as mock_create:
+            mock_create.side_effect = flaky
+            embeddings = await service._embed_many(["first", "second", "third"])
+
+        assert len(embeddings) == 3
+        assert calls.count(("first",)) == 1
+        assert calls.count(("second",)) == 2
+        assert calls.count(("third",)) == 1
+
+
+class TestFilteredSearch:
+    """Filters must be applied inside SQL, with iterative index scans enabled."""
+
+    def test_filters_become_predicates(self, mock_db):
+        service = RetrievalService(mock_db)
+
+        where, params = service._build_filters("Angel Oak", ["doc-1"], ["A"])
+
+        assert "lower(d.lender) = lower(:lender)" in where
+        assert params == {"lender": "Angel Oak", "document_ids": ["doc-1"], "archetypes": ["A"]}
+
+    def test_partial_lender_match_is_escaped(self, mock_db):
+        where, params = RetrievalService(mock_db)._build_filters(
+            "A&D_Mortgage", None, None, lender_match="contains"
+        )
+
+        assert "d.lender ILIKE :lender" in where
+        assert params["lender"] == "%A&D\\_Mortgage%"
+
+    @pytest.mark.asyncio
+    async def test_general_qa_searches_by_question_text(self, mock_db):
+        service = GeneralQAService(mock_db)
+
+        with patch.object(service.retrieval, 'search', new_callable=AsyncMock) as mock_search:
+            mock_search.return_value = []
+            await service._search_chunks("Who offers DSCR 0.75?", limit=5, lender_filter="Acra")
+
+        mock_search.assert_called_once_with(
+            "Who offers DSCR 0.75?", top_k=5, lender="Acra", lender_match="contains"
+        )
+
+    def test_unfiltered_search_has_only_status_predicate(self, mock_db):
+        where, params = RetrievalService(mock_db)._build_filters(None, None, None)
+
+        assert where == ["d.status::text = 'active'"]
+        assert params == {}
+
+    def test_iterative_scan_only_when_filtered(self, monkeypatch):
+        monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+        monkeypatch.setattr(db_module, "pgvector_version", (0, 8, 0))
+        assert vector_search_params(top_k=10, filtered=True)["hnsw.iterative_scan"] == "relaxed_order"
+        assert "hnsw.iterative_scan" not in vector_search_params(top_k=10)
+
+        monkeypatch.setattr(settings, "vector_iterative_scan", "strict_order")
+        assert vector_search_params(top_k=10, filtered=True) == {
+            "hnsw.ef_search": str(settings.hnsw_ef_search), "hnsw.iterative_scan": "strict_order"
+        }
+        # ef_search never caps the requested top_k
+        assert vector_search_params(top_k=100)["hnsw.ef_search"] == "100"
+
+    def test_filtered_search_is_exact_without_iterative_scans(self, monkeypatch):
+        monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+        # pgvector < 0.8 (or not detected yet): a filtered ANN scan would drop small lenders
+        for version in [(0, 7, 4), None]:
+            monkeypatch.setattr(db_module, "pgvector_version", version)
+            params = vector_search_params(top_k=10, filtered=True)
+            assert params["enable_indexscan"] == "off"
+            assert "hnsw.iterative_scan" not in params
+            assert "enable_indexscan" not in vector_search_params(top_k=10)
+
+        monkeypatch.setattr(db_module, "pgvector_version", (0, 8, 0))
+        monkeypatch.setattr(settings, "vector_iterative_scan", "off")
+        assert vector_search_params(top_k=10, filtered=True)["enable_indexscan"] == "off"
+
+    @pytest.mark.asyncio
+    async def test_pgvector_version_read_at_connection_init(self, monkeypatch):
+        monkeypatch.setattr(db_module, "pgvector_version", None)
+        monkeypatch.setattr(db_module, "register_vector", AsyncMock())
+        conn = AsyncMock()
+        conn.fetchval.return_value = "0.8.0"
+
+        await db_module._init_vector_connection(conn)
+        await db_module._init_vector_connection(conn)
+
+        assert db_module.pgvector_version == (0, 8, 0)
+        conn.fetchval.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_specialist_uses_single_filtered_search(self, mock_db):
+        agent = SpecialistAgent(mock_db, "Angel Oak")
+
+        with patch.object(agent.retrieval, 'search', new_callable=AsyncMock) as mock_search:
+            mock_search.return_value = [{"content": "DSCR 0.75", "lender": "Angel Oak"}]
+            chunks = await agent._get_lender_chunks({"doc_type": "dscr"})
+
+        mock_search.assert_called_once()
+        assert mock_search.call_args.kwargs["lender"] == "Angel Oak"
+        assert chunks == mock_search.return_value
+
+
+class TestHybridSearch:
+    """Vector and lexical legs are merged with reciprocal-rank fusion."""
+
+    def test_rrf_prefers_chunks_found_by_both_legs(self):
+        vector = [{"id": "a", "similarity": 0.9}, {"id": "b", "similarity": 0.8}]
+        lexical = [{"id": "c", "text_rank": 0.5}, {"id": "b", "text_rank": 0.4}]
+
+        fused = reciprocal_rank_fusion([vector, lexical], top_k=3, k=60)
+
+        assert [c["id"] for c in fused] == ["b", "a", "c"]
+        assert fused[0]["similarity"] == 0.8
+        assert fused[0]["text_rank"] == 0.4
+        assert fused[2]["similarity"] == 0.0
+
+    def test_rrf_respects_top_k(self):
+        ranked = [{"id": str(i)} for i in range(10)]
+
+        assert len(reciprocal_rank_fusion([ranked], top_k=4)) == 4
+
+    @pytest.mark.asyncio
+    async def test_hybrid_runs_both_legs(self, mock_db):
+        service = RetrievalService(mock_db)
+        vector_hit = {"id": "v", "content": "DSCR ratio", "similarity": 0.7}
+        lexical_hit = {"id": "l", "content": "DSCR 0.75 allowed", "text_rank": 0.3}
+
+        with patch.object(service, '_vector_search', new_callable=AsyncMock) as mock_vector:
+            with patch.object(service, '_lexical_search', new_callable=AsyncMock) as mock_lexical:
+                mock_vector.return_value = [vector_hit]
+                mock_lexical.return_value = [lexical_hit]
+
+                results = await service.search("DSCR 0.75", top_k=5, mode="hybrid")
+
+        assert {c["id"] for c in results} == {"v", "l"}
+        # Each leg fetches extra candidates before fusion
+        assert mock_vector.call_args.args[1] == 5 * settings.hybrid_candidate_multiplier
+
+    @pytest.mark.asyncio
+    async def test_hybrid_degrades_when_one_leg_fails(self, mock_db):
+        service = RetrievalService(mock_db)
+
+        with patch.object(service, '_vector_search', new_callable=AsyncMock) as mock_vector:
+            with patch.object(service, '_lexical_search', new_callable=AsyncMock) as mock_lexical:
+                mock_vector.side_effect = RuntimeError("embedding API down")
+                mock_lexical.return_value = [{"id": "l", "content": "BK 7 seasoning"}]
+
+                results = await service.search("BK 7 seasoning", mode="hybrid")
+
+        assert [c["id"] for c in results] == ["l"]
+
+
+class TestFastPath:
+    """The fast path reuses the filter predicates with asyncpg $n placeholders."""
+
+    def test_named_params_become_positional(self):
+        sql, args = _to_positional(
+            "SELECT 1 - (e <=> :embedding) FROM t WHERE d.status::text = 'active' "
+            "AND lower(d.lender) = lower(:lender) ORDER BY e <=> :embedding LIMIT :limit",
+            {"embedding": "vec", "lender": "UWM", "limit": 8}
+        )
+
+        assert sql == (
+            "SELECT 1 - (e <=> $1) FROM t WHERE d.status::text = 'active' "
+            "AND lower(d.lender) = lower($2) ORDER BY e <=> $1 LIMIT $3"
+        )
+        assert args == ["vec", "UWM", 8]
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_orm_path(self, mock_db, monkeypatch):
+        monkeypatch.setattr(settings, "retrieval_fast_path", True)
+        service = RetrievalService(mock_db)
+
+        with patch.object(service, '_embed', new_callable=AsyncMock) as mock_embed:
+            with patch.object(service, '_vector_search_fast', new_callable=AsyncMock) as mock_fast:
+                with patch.object(service, '_vector_search_orm', new_callable=AsyncMock) as mock_orm:
+                    mock_embed.return_value = np.zeros(3, dtype=np.float32)
+                    mock_fast.side_effect = OSError("connection refused")
+                    mock_orm.return_value = [{"id": "a"}]
+
+                    results = await service.search("DSCR", mode="vector")
+
+        assert results == [{"id": "a"}]
+        mock_orm.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_recall_knobs_follow_each_query(self, mock_db, monkeypatch):
+        monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+        monkeypatch.setattr(settings, "vector_iterative_scan", "strict_order")
+        monkeypatch.setattr(db_module, "pgvector_version", (0, 8, 0))
+        pool = _FakePool([])
+        monkeypatch.setattr(retrieval_module, "get_vector_pool", AsyncMock(return_value=pool))
+        service = RetrievalService(mock_db)
+        embedding = np.zeros(3, dtype=np.float32)
+
+        await service._vector_search_fast(embedding, 100, ["d.status::text = 'active'"], {})
+        await service._vector_search_fast(
+            embedding, 5, ["d.status::text = 'active'", "lower(d.lender) = lower(:lender)"], {"lender": "UWM"}
+        )
+
+        assert pool.settings == [
+            {"hnsw.ef_search": "100"},
+            {"hnsw.ef_search": str(settings.hnsw_ef_search), "hnsw.iterative_scan": "strict_order"},
+        ]
+
+
+class TestMultiLenderSearch:
+    """search_by_lenders replaces the per-specialist vector and rules queries."""
+
+    @pytest.mark.asyncio
+    async def test_one_statement_for_all_lenders(self, mock_db, monkeypatch):
+        monkeypatch.setattr(settings, "retrieval_fast_path", True)
+        service = RetrievalService(mock_db)
+        rows = [
+            {
+                "lender": "UWM",
+                "vector_chunks": json.dumps([{"id": "u1", "content": "DSCR 1.0", "similarity": 0.8}]),
+                "lexical_chunks": json.dumps([{"id": "u1", "content": "DSCR 1.0", "text_rank": 0.2}]),
+                "rules": json.dumps([{"lender": "UWM", "program": "DSCR", "ltv_max": 80.0, "status": "active"}])
+            },
+            {"lender": "Acra", "vector_chunks": "[]", "lexical_chunks": "[]", "rules": "[]"},
+        ]
+        pool = _FakePool(rows)
+        monkeypatch.setattr(retrieval_module, "get_vector_pool", AsyncMock(return_value=pool))
+
+        with patch.object(service, '_embed', new_callable=AsyncMock) as mock_embed:
+            mock_embed.return_value = np.zeros(3, dtype=np.float32)
+            results = await service.search_by_lenders("dscr purchase eligibility", ["UWM", "Acra"], top_k=5)
+
+        mock_embed.assert_called_once()
+        assert len(pool.statements) == 1
+        assert pool.statements[0].count("LATERAL") == 3
+        # Chunks and rules both match the lender name case-insensitively
+        assert "lower(ru.lender) = lower(l.lender)" in pool.statements[0]
+        assert "lower(d.lender) = lower(l.lender)" in pool.statements[0]
+        assert ["UWM", "Acra"] in pool.args[0]
+        assert [c["id"] for c in results["UWM"]["chunks"]] == ["u1"]
+        assert results["UWM"]["rules"][0].program == "DSCR"
+        assert results["UWM"]["rules"][0].ltv_max == Decimal("80.0")
+        assert results["Acra"] == {"chunks": [], "rules": []}
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_per_lender_search(self, mock_db, monkeypatch):
+        monkeypatch.setattr(settings, "retrieval_fast_path", True)
+        service = RetrievalService(mock_db)
+
+        with patch.object(service, '_search_by_lenders_fast', new_callable=AsyncMock) as mock_fast:
+            with patch.object(service, 'search', new_callable=AsyncMock) as mock_search:
+                with patch.object(service, '_get_rules_for_lenders', new_callable=AsyncMock) as mock_rules:
+                    mock_fast.side_effect = OSError("connection refused")
+                    mock_search.side_effect = lambda query, top_k, lender, mode: [{"id": lender}]
+                    mock_rules.return_value = {"UWM": ["rule"]}
+
+                    results = await service.search_by_lenders("dscr eligibility", ["UWM", "Acra"])
+
+        assert results == {
+            "UWM": {"chunks": [{"id": "UWM"}], "rules": ["rule"]},
+            "Acra": {"chunks": [{"id": "Acra"}], "rules": []}
+        }
+        mock_rules.assert_called_once_with(["UWM", "Acra"])
+
+    @pytest.mark.asyncio
+    async def test_fallback_rules_match_lender_case_insensitively(self, mock_db, monkeypatch):
+        rules = [MagicMock(lender="uwm", program="DSCR"), MagicMock(lender="ACRA LENDING", program="Flex")]
+        session = AsyncMock()
+        session.execute.return_value = MagicMock(scalars=MagicMock(return_value=MagicMock(all=MagicMock(return_value=rules))))
+        session_factory = MagicMock()
+        session_factory.return_value.__aenter__ = AsyncMock(return_value=session)
+        session_factory.return_value.__aexit__ = AsyncMock(return_value=False)
+        monkeypatch.setattr(retrieval_module, "async_session", session_factory)
+
+        grouped = await RetrievalService(mock_db)._get_rules_for_lenders(["UWM", "Acra Lending"])
+
+        assert {lender: [r.program for r in found] for lender, found in grouped.items()} == {
+            "UWM": ["DSCR"], "Acra Lending": ["Flex"]
+        }
+        assert "lower(rules.lender)" in str(session.execute.call_args.args[0])
+
+    @pytest.mark.asyncio
+    async def test_error_leaves_context_to_the_specialists(self, mock_db, monkeypatch):
+        monkeypatch.setattr(settings, "retrieval_fast_path", False)
+        service = RetrievalService(mock_db)
+
+        with patch.object(service, '_search_by_lenders_fallback', new_callable=AsyncMock) as mock_fallback:
+            mock_fallback.side_effect = OSError("connection refused")
+            results = await service.search_by_lenders("dscr eligibility", ["UWM", "Acra"])
+
+        assert results == {}
+
+    @pytest.mark.asyncio
+    async def test_specialist_uses_prefetched_context(self, mock_db):
+        agent = SpecialistAgent(mock_db, "UWM")
+
+        with patch.object(agent, '_get_lender_chunks', new_callable=AsyncMock) as mock_chunks:
+            with patch.object(agent.rules, 'get_by_lender', new_callable=AsyncMock) as mock_rules:
+                with patch.object(agent, '_call_llm', new_callable=AsyncMock) as mock_llm:
+                    mock_llm.return_value = {"eligible_products": []}
+                    result = await agent.analyze(
+                        {"doc_type": "dscr"},
+                        context={"chunks": [{"content": "DSCR 1.0", "filename": "uwm.pdf"}], "rules": []}
+                    )
+
+        mock_chunks.assert_not_called()
+        mock_rules.assert_not_called()
+        assert "DSCR 1.0" in mock_llm.call_args.args[0]
+        assert result["lender"] == "UWM"
+
+
+class _FakePool:
+    """asyncpg pool stand-in recording prepared statements."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.args = []
+        self.timeouts = []
+        self.settings = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, sql, *args):
+        self.settings.append(dict(zip(args[::2], args[1::2])))
+
+    async def prepare(self, sql):
+        self.statements.append(sql)
+        statement = MagicMock()
+
+        async def fetch(*args, timeout=None):
+            self.args.append(list(args))
+            self.timeouts.append(timeout)
+            return self.rows
+
+        statement.fetch = fetch
+        return statement
+
+
+def _echo_embeddings(model, input):
+    """Fake embeddings response: one vector per input encoding its length."""
+    response = MagicMock()
+    # Return items out of order to check index-based reassembly
+    response.data = [
+        MagicMock(index=i, embedding=[float(len(text)), 0.0])
+        for i, text in reversed(list(enumerate(input)))
+    ]
+    return response
+
+
+def _rate_limit_error():
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    response = httpx.Response(429, request=request)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
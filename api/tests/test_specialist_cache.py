@@ -0,0 +1,108 @@
+"""
+Tests for the specialist analysis cache.
+
+These tests verify that:
+1. Scenarios on the same side of every lender threshold share a key
+2. Crossing a threshold, or changing an enum value, changes the key
+3. A cache hit skips retrieval and the LLM call
+4. Bumping the lender's corpus generation invalidates its entries
+5. Errors and analyses run without chunks or rules are not cached
+"""
+from unittest.mock import AsyncMock, patch
+import pytest
+
+from app.models.document import Rule
+from app.services.specialist_agent import SpecialistAgent
+from app.services.specialist_cache import canonical_scenario, specialist_cache
+
+
+RULES = [
+    Rule(lender="Angel Oak", program="DSCR", fico_min=660, fico_max=None, ltv_max=80, loan_min=100000, loan_max=1500000),
+    Rule(lender="Angel Oak", program="DSCR", fico_min=700, fico_max=None, ltv_max=85, loan_min=None, loan_max=3000000),
+]
+
+SCENARIO = {"state": "FL", "occupancy": "Investment", "doc_type": "dscr", "fico": 710, "ltv": 75, "loan_amount": 500000}
+
+
+class TestCanonicalScenario:
+
+    def test_same_bracket_same_canonical_form(self):
+        other = {**SCENARIO, "state": "florida", "fico": "735", "ltv": 70, "loan_amount": 900000}
+
+        assert canonical_scenario(SCENARIO, RULES) == canonical_scenario(other, RULES)
+
+    def test_crossing_a_threshold_changes_the_bracket(self):
+        assert canonical_scenario(SCENARIO, RULES) != canonical_scenario({**SCENARIO, "fico": 690}, RULES)
+        assert canonical_scenario(SCENARIO, RULES) != canonical_scenario({**SCENARIO, "ltv": 82}, RULES)
+        assert canonical_scenario(SCENARIO, RULES) != canonical_scenario({**SCENARIO, "occupancy": "primary"}, RULES)
+
+    def test_fixed_grid_without_thresholds(self):
+        assert canonical_scenario({"fico": 705}, [])["fico"] == canonical_scenario({"fico": 719}, [])["fico"]
+        assert canonical_scenario({"fico": 705}, [])["fico"] != canonical_scenario({"fico": 721}, [])["fico"]
+
+    def test_irrelevant_fields_are_ignored(self):
+        assert canonical_scenario({**SCENARIO, "borrower_name": "x"}, RULES) == canonical_scenario(SCENARIO, RULES)
+
+
+class TestSpecialistCache:
+
+    async def _analyze(self, agent: SpecialistAgent, scenario: dict):
+        with patch.object(agent, '_call_llm', new_callable=AsyncMock) as mock_llm:
+            mock_llm.return_value = {"eligible_products": [{"program": "DSCR"}]}
+            result = await agent.analyze(scenario, context={"chunks": [], "rules": RULES})
+        return result, mock_llm
+
+    @pytest.mark.asyncio
+    async def test_hit_skips_llm(self, mock_db):
+        agent = SpecialistAgent(mock_db, "Angel Oak")
+
+        first, first_llm = await self._analyze(agent, SCENARIO)
+        second, second_llm = await self._analyze(agent, {**SCENARIO, "fico": 725})
+
+        first_llm.assert_called_once()
+        second_llm.assert_not_called()
+        assert second == first
+        stats = specialist_cache.stats()
+        assert (stats["memory_hits"], stats["misses"]) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_generation_bump_invalidates(self, mock_db):
+        agent = SpecialistAgent(mock_db, "Angel Oak")
+        await self._analyze(agent, SCENARIO)
+
+        await specialist_cache.bump_generation("angel oak")
+        _, mock_llm = await self._analyze(agent, SCENARIO)
+
+        mock_llm.assert_called_once()
+        assert specialist_cache.stats()["invalidated_misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_other_lenders_unaffected_by_bump(self, mock_db):
+        agent = SpecialistAgent(mock_db, "UWM")
+        await self._analyze(agent, SCENARIO)
+
+        await specialist_cache.bump_generation("Angel Oak")
+        _, mock_llm = await self._analyze(agent, SCENARIO)
+
+        mock_llm.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self, mock_db):
+        agent = SpecialistAgent(mock_db, "UWM")
+        with patch.object(agent, '_call_llm', new_callable=AsyncMock) as mock_llm:
+            mock_llm.return_value = {"error": "timeout"}
+            await agent.analyze(SCENARIO, context={"chunks": [], "rules": RULES})
+
+        _, mock_llm = await self._analyze(agent, SCENARIO)
+
+        mock_llm.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_analysis_without_context_is_not_cached(self, mock_db):
+        agent = SpecialistAgent(mock_db, "UWM")
+        with patch.object(agent, '_call_llm', new_callable=AsyncMock) as mock_llm:
+            mock_llm.return_value = {"eligible_products": []}
+            await agent.analyze(SCENARIO, context={"chunks": [], "rules": []})
+            await agent.analyze(SCENARIO, context={"chunks": [], "rules": []})
+
+        assert mock_llm.await_count == 2
@@ -0,0 +1,99 @@
+"""
+Tests for speculative retrieval in the chat pipeline.
+
+These tests verify that:
+1. Eligibility turns reuse the search started during classification
+2. Turns that don't need chunks discard it and count it as wasted
+3. Short follow-up answers don't start a search at all
+4. A speculative search still running after the retrieval budget is dropped
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.config import settings
+from app.services.intent_classifier import IntentType
+from app.services.speculative_retrieval import speculative_retrieval
+
+
+CHUNKS = [{"id": str(i), "content": f"chunk {i}", "lender": "Lender A", "filename": "a.pdf"} for i in range(8)]
+
+
+def _intent(intent: str, **entities) -> dict:
+    return {"intent": intent, "confidence": 0.9, "extracted_entities": entities, "facts": {}}
+
+
+@pytest.fixture
+def speculating_chat(chat_service, monkeypatch):
+    """ChatService with retrieval and classification mocked out."""
+    monkeypatch.setattr(chat_service, "_get_last_assistant_message", AsyncMock(return_value=None))
+    monkeypatch.setattr(chat_service.retrieval, "search", AsyncMock(return_value=CHUNKS))
+    return chat_service
+
+
+class TestSpeculativeRetrieval:
+
+    @pytest.mark.asyncio
+    async def test_eligibility_uses_speculative_chunks(self, speculating_chat):
+        service = speculating_chat
+        with patch.object(service.intent_classifier, "understand", AsyncMock(return_value=_intent(IntentType.ELIGIBILITY_CHECK))), \
+             patch.object(service.general_qa, "answer_eligibility_check", new_callable=AsyncMock) as mock_answer:
+            mock_answer.return_value = {"response": "Yes", "citations": []}
+            await service.process_message("Does any DSCR lender do 5 units?")
+
+        service.retrieval.search.assert_called_once_with(
+            "Does any DSCR lender do 5 units?", top_k=8, lender_match="contains"
+        )
+        assert mock_answer.call_args.kwargs["prefetched_chunks"] == CHUNKS
+        assert speculative_retrieval.stats()["used"] == 1
+
+    @pytest.mark.asyncio
+    async def test_lender_filtered_product_search_searches_itself(self, speculating_chat):
+        service = speculating_chat
+        intent = _intent(IntentType.PRODUCT_SEARCH, lender_asked="Angel Oak")
+        with patch.object(service.intent_classifier, "understand", AsyncMock(return_value=intent)), \
+             patch.object(service.general_qa, "answer_product_search", new_callable=AsyncMock) as mock_answer:
+            mock_answer.return_value = {"response": "Angel Oak does", "citations": []}
+            await service.process_message("Does Angel Oak do bank statement loans?")
+
+        assert mock_answer.call_args.kwargs["prefetched_chunks"] is None
+        assert speculative_retrieval.stats()["wasted"] == 1
+
+    @pytest.mark.asyncio
+    async def test_summary_discards_speculation(self, speculating_chat):
+        await speculating_chat.process_message("summarize what you know")
+
+        stats = speculative_retrieval.stats()
+        assert stats["started"] == 1
+        assert stats["wasted"] == 1
+        assert stats["use_rate"] == 0.0
+
+    def test_short_answer_does_not_speculate(self, speculating_chat):
+        assert not speculating_chat._should_speculate("California", "state")
+        assert speculating_chat._should_speculate("California", None)
+
+    @pytest.mark.asyncio
+    async def test_hung_speculation_falls_back(self, speculating_chat, monkeypatch):
+        monkeypatch.setattr(settings, "retrieval_timeout_seconds", 0.01)
+        hung = asyncio.Event()
+
+        async def search(*args, **kwargs):
+            await hung.wait()
+
+        speculating_chat.retrieval.search.side_effect = search
+        service = speculating_chat
+        with patch.object(service.intent_classifier, "understand", AsyncMock(return_value=_intent(IntentType.ELIGIBILITY_CHECK))), \
+             patch.object(service.general_qa, "answer_eligibility_check", new_callable=AsyncMock) as mock_answer:
+            mock_answer.return_value = {"response": "Yes", "citations": []}
+            await service.process_message("Does any DSCR lender do 5 units?")
+
+        # The handler searches itself; the stuck search is cancelled
+        assert mock_answer.call_args.kwargs["prefetched_chunks"] is None
+        assert speculative_retrieval.stats()["wasted"] == 1
+
+    @pytest.mark.asyncio
+    async def test_empty_speculation_falls_back(self):
+        task = AsyncMock(return_value=[])()
+
+        assert await speculative_retrieval.use(task, limit=5) is None
+        assert speculative_retrieval.stats()["wasted"] == 1
@@ -0,0 +1,123 @@
+"""
+Tests for the chunks.embedding ANN index lifecycle.
+
+These tests verify that:
+1. vector_index_ddl builds the configured index type with its parameters
+2. status() reports the index as built, not the configured type
+3. The admin index endpoints return the status and surface rebuild failures
+"""
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+import httpx
+import pytest
+
+from app.config import settings
+from app.db import VECTOR_INDEX_NAME, vector_index_ddl
+from app.main import app
+from app.services import vector_index_service as vector_index_module
+from app.services.vector_index_service import VectorIndexService
+
+
+STATUS = {
+    "name": VECTOR_INDEX_NAME,
+    "method": "hnsw",
+    "exists": True,
+    "definition": "CREATE INDEX ix_chunks_embedding_ann ON public.chunks USING hnsw (embedding vector_cosine_ops)",
+    "size_bytes": 8192,
+    "size": "8192 bytes",
+    "chunks_count": 12,
+    "build_seconds": None
+}
+
+
+class TestVectorIndexDdl:
+
+    def test_hnsw(self, monkeypatch):
+        monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+        monkeypatch.setattr(settings, "hnsw_m", 24)
+        monkeypatch.setattr(settings, "hnsw_ef_construction", 128)
+
+        assert vector_index_ddl() == (
+            f"CREATE INDEX IF NOT EXISTS {VECTOR_INDEX_NAME} ON chunks USING hnsw "
+            "(embedding vector_cosine_ops) WITH (m = 24, ef_construction = 128)"
+        )
+
+    def test_ivfflat_concurrently(self, monkeypatch):
+        monkeypatch.setattr(settings, "vector_index_type", "ivfflat")
+        monkeypatch.setattr(settings, "ivfflat_lists", 200)
+
+        assert vector_index_ddl(name="ix_new", concurrently=True) == (
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_new ON chunks USING ivfflat "
+            "(embedding vector_cosine_ops) WITH (lists = 200)"
+        )
+
+
+def _fake_engine(index_row, chunks_count: int):
+    """engine stand-in whose connection answers the index query, then the count."""
+    conn = MagicMock()
+    conn.execute = AsyncMock(side_effect=[
+        MagicMock(first=MagicMock(return_value=index_row)),
+        MagicMock(scalar=MagicMock(return_value=chunks_count)),
+    ])
+
+    @asynccontextmanager
+    async def connect():
+        yield conn
+
+    return MagicMock(connect=connect)
+
+
+class TestVectorIndexStatus:
+
+    @pytest.mark.asyncio
+    async def test_reports_the_built_index(self, monkeypatch):
+        # Settings changed to HNSW, but the table still has the IVFFlat index
+        monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+        row = MagicMock(indexdef="CREATE INDEX ... USING ivfflat ...", method="ivfflat", size_bytes=4096, size="4096 bytes")
+        monkeypatch.setattr(vector_index_module, "engine", _fake_engine(row, 7))
+
+        status = await VectorIndexService().status()
+
+        assert status["method"] == "ivfflat"
+        assert (status["exists"], status["size_bytes"], status["chunks_count"]) == (True, 4096, 7)
+
+    @pytest.mark.asyncio
+    async def test_missing_index(self, monkeypatch):
+        monkeypatch.setattr(vector_index_module, "engine", _fake_engine(None, 0))
+
+        status = await VectorIndexService().status()
+
+        assert (status["exists"], status["method"], status["definition"]) == (False, None, None)
+
+
+class TestIndexEndpoints:
+
+    async def _request(self, method: str, path: str) -> httpx.Response:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.request(method, f"/api/admin{path}")
+
+    @pytest.mark.asyncio
+    async def test_get_index(self):
+        with patch.object(VectorIndexService, "status", AsyncMock(return_value=STATUS)):
+            response = await self._request("GET", "/index")
+
+        assert response.status_code == 200
+        assert response.json() == STATUS
+
+    @pytest.mark.asyncio
+    async def test_rebuild_index(self):
+        rebuilt = {**STATUS, "build_seconds": 1.25}
+        with patch.object(VectorIndexService, "rebuild", AsyncMock(return_value=rebuilt)) as mock_rebuild:
+            response = await self._request("POST", "/index/rebuild")
+
+        mock_rebuild.assert_called_once()
+        assert response.status_code == 200
+        assert response.json()["build_seconds"] == 1.25
+
+    @pytest.mark.asyncio
+    async def test_rebuild_failure_is_a_server_error(self):
+        with patch.object(VectorIndexService, "rebuild", AsyncMock(side_effect=RuntimeError("lock timeout"))):
+            response = await self._request("POST", "/index/rebuild")
+
+        assert response.status_code == 500
+        assert "lock timeout" in response.json()["detail"]